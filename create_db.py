@@ -1,5 +1,6 @@
 import psycopg2
 import os
+from migrate_db import mark_all_applied
 
 def create_database_if_needed(host, port, user, password, dbname):
     conn = psycopg2.connect(
@@ -65,10 +66,13 @@ def setup_schema():
     # If your psycopg2 version allows multiple statements in one go:
     cur.execute(sql_script)
 
+    # 4) The schema is already current, so no migration has to run on it
+    mark_all_applied(cur)
+
     conn.commit()
     cur.close()
     conn.close()
-    print("Schema created and tables converted to hypertables.")
+    print("Schema created, tables converted to hypertables and compression policies added.")
 
 if __name__ == "__main__":
     setup_schema()
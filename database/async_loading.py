@@ -0,0 +1,259 @@
+import asyncio
+import time
+import psycopg
+from connecting_db import DB_CONFIG
+from batch_writer import (
+    TABLE_COLUMNS,
+    TableBuffer,
+    build_insert_query,
+    DEFAULT_BATCH_SIZE,
+)
+from ingest_metrics import IngestMetrics
+from message_dispatcher import open_bag, DEFAULT_CHECKPOINT_INTERVAL
+from pipeline import RowCollector, READ_BATCH_SIZE
+from postgres_sink import (
+    CHECKPOINTS_QUERY,
+    SUMMARY_CREATE_QUERY,
+    SUMMARY_SELECT_QUERY,
+    SUMMARY_UPDATE_QUERY,
+    merge_stored_summary,
+)
+from run_summary import RunSummary, get_series_name
+from topic_registry import REGISTRY
+
+DEFAULT_QUEUE_SIZE = 64  # batches per table queue
+MAX_BATCHES_IN_FLIGHT = 8  # batches sent before waiting for the server to confirm them
+
+_STOP = None
+
+
+async def save_progress(cur, run_id, checkpoints, series):
+    """
+    Saves the checkpoints and run_summary statistics of a table writer in its
+    transaction, like save_checkpoints() and save_run_summary() do for psycopg2.
+    """
+    if checkpoints:
+        await cur.executemany(
+            CHECKPOINTS_QUERY,
+            [(run_id, topic, last_time) for topic, last_time in checkpoints.items()],
+        )
+    if not series:
+        return
+    await cur.execute("SELECT metric_id, metric_name FROM metrics")
+    metric_names = dict(await cur.fetchall())
+    for (series_run_id, table, metric_id, column), stats in sorted(
+        series.items(), key=lambda item: item[0]
+    ):
+        key = (series_run_id, table, get_series_name(metric_id, column, metric_names))
+        await cur.execute(SUMMARY_CREATE_QUERY, key)
+        await cur.execute(SUMMARY_SELECT_QUERY, key)
+        row = merge_stored_summary(stats, await cur.fetchone())
+        await cur.execute(SUMMARY_UPDATE_QUERY, row + list(key))
+
+
+async def write_table(
+    table,
+    table_queue,
+    run_id,
+    batch_size,
+    errors,
+    metrics,
+    checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+):
+    """
+    Writes the rows of one table over its own connection in pipeline mode.
+
+    Batches are sent without waiting for each result; the pipeline is synced every
+    MAX_BATCHES_IN_FLIGHT batches, which bounds the unconfirmed work and surfaces
+    errors. Every checkpoint_interval seconds, and once the reader is done, the
+    rows are committed together with the checkpoints of the topics loaded into
+    the table and the run_summary statistics of those rows, so an interrupted
+    load resumes from there. No connection is opened for a table that receives
+    no rows. Each batch is recorded in metrics with the time taken to send it,
+    including waiting for the server when the pipeline is synced.
+    """
+    item = await table_queue.get()
+    if item is _STOP:
+        return
+
+    query = build_insert_query(table, single_row=True)
+    summary = RunSummary()
+    checkpoints = {}
+    last_checkpoint = time.monotonic()
+    try:
+        # Leaving the connection block commits the transaction, or rolls it back on error.
+        async with await psycopg.AsyncConnection.connect(**DB_CONFIG) as conn:
+            async with conn.pipeline() as pipeline, conn.cursor() as cur:
+                pending = TableBuffer(table)
+                in_flight = 0
+
+                async def write_pending():
+                    nonlocal pending, in_flight
+                    if not len(pending):
+                        return
+                    started = time.perf_counter()
+                    await cur.executemany(query, pending.to_rows())
+                    summary.add_batch(table, pending.to_numeric_arrays())
+                    in_flight += 1
+                    if in_flight >= MAX_BATCHES_IN_FLIGHT:
+                        await pipeline.sync()
+                        in_flight = 0
+                    metrics.observe_write(
+                        table, len(pending), time.perf_counter() - started
+                    )
+                    pending = TableBuffer(table)
+
+                async def commit():
+                    nonlocal checkpoints, last_checkpoint, in_flight
+                    await write_pending()
+                    await save_progress(cur, run_id, checkpoints, summary.take())
+                    await conn.commit()
+                    checkpoints = {}
+                    in_flight = 0
+                    last_checkpoint = time.monotonic()
+
+                while item is not _STOP:
+                    rows, item_checkpoints = item
+                    for row in rows:
+                        pending.append(row)
+                    checkpoints.update(item_checkpoints)
+                    if len(pending) >= batch_size:
+                        await write_pending()
+                    if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                        await commit()
+                    item = await table_queue.get()
+                await commit()
+    except Exception as e:
+        errors.append((table, e))
+        print(f"Async writer for {table} failed: {e}")
+        # Keep draining so that the reader never blocks on a dead writer.
+        while item is not _STOP:
+            item = await table_queue.get()
+
+
+def read_and_extract(input_bag, run_id, loop, queues, metrics, checkpoints=None):
+    """
+    Reads and decodes the bag in a worker thread, handing rows to the table queues.
+
+    Every hand-over carries, per table, the timestamp of the last message read
+    from each of its topics, which its writer commits as that topic's checkpoint.
+    Messages at or before a topic's checkpoint in checkpoints are skipped
+    undecoded. Waiting on each put keeps the reader behind the writers when the
+    queues are full.
+    """
+    from rclpy.serialization import deserialize_message
+
+    clock = time.perf_counter
+    result = {"messages": 0, "start_time": None, "end_time": None}
+    reader, dispatch = open_bag(input_bag)
+    if reader is None:
+        return result
+    checkpoints = dict(checkpoints or {})
+    if checkpoints and all(topic in checkpoints for topic in dispatch):
+        reader.seek(min(checkpoints[topic] for topic in dispatch))
+
+    def hand_over(collector, high_water):
+        table_checkpoints = {}
+        for topic, timestamp in high_water.items():
+            table_checkpoints.setdefault(REGISTRY[topic].table, {})[topic] = timestamp
+        for table in set(collector.rows) | set(table_checkpoints):
+            item = (collector.rows.get(table, []), table_checkpoints.get(table, {}))
+            asyncio.run_coroutine_threadsafe(queues[table].put(item), loop).result()
+
+    collector = RowCollector()
+    high_water = {}
+    pending_messages = 0
+    while reader.has_next():
+        read_started = clock()
+        topic, data, timestamp = reader.read_next()
+        read_done = clock()
+        if result["start_time"] is None:
+            result["start_time"] = timestamp
+        result["end_time"] = timestamp
+        result["messages"] += 1
+        if timestamp <= checkpoints.get(topic, -1):
+            continue
+
+        high_water[topic] = timestamp
+        msg_type, fast_decoder, loader = dispatch[topic]
+        try:
+            msg = fast_decoder(data) if fast_decoder else None
+            if msg is None:
+                msg = deserialize_message(data, msg_type)
+            decoded = clock()
+            loader(collector, run_id, topic, msg, timestamp)
+            metrics.observe_message(
+                topic, read_done - read_started, decoded - read_done, clock() - decoded
+            )
+        except Exception as e:
+            metrics.errors.report(
+                ("process", topic, type(e).__name__),
+                f"Error processing topic {topic} at {timestamp}: {e}",
+            )
+        metrics.maybe_export()
+
+        pending_messages += 1
+        if pending_messages >= READ_BATCH_SIZE:
+            hand_over(collector, high_water)
+            collector = RowCollector()
+            high_water = {}
+            pending_messages = 0
+
+    hand_over(collector, high_water)
+    return result
+
+
+async def process_rosbag_async(
+    input_bag,
+    run_id,
+    batch_size=DEFAULT_BATCH_SIZE,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    checkpoints=None,
+    metrics=None,
+):
+    """
+    Loads a bag with asynchronous, pipelined writes to every table at once.
+
+    The bag is read in a worker thread while one writer task per table keeps
+    batched INSERTs in flight on its own connection, which hides the round-trip
+    latency of a remote database. Each writer commits its table's rows with the
+    checkpoints of the topics loaded into it and their run_summary statistics,
+    so a failed load leaves every table at a checkpoint it can be resumed from.
+
+    :param input_bag: Path to the rosbag file.
+    :param run_id: The run ID associated with the data.
+    :param batch_size: Rows per executemany() batch.
+    :param queue_size: Capacity of each table queue, in batches.
+    :param checkpoints: Dict mapping topic to the last timestamp (ns) already
+        loaded by an earlier, interrupted load of this run.
+    :param metrics: The IngestMetrics the reader and writers record into
+        (default: new ones).
+    :return: Dict with the number of messages read and the first and last
+        message timestamps in nanoseconds, as returned by process_rosbag.
+    """
+    metrics = metrics or IngestMetrics()
+    loop = asyncio.get_running_loop()
+    queues = {table: asyncio.Queue(queue_size) for table in TABLE_COLUMNS}
+    errors = []
+    writers = [
+        asyncio.create_task(
+            write_table(table, table_queue, run_id, batch_size, errors, metrics)
+        )
+        for table, table_queue in queues.items()
+    ]
+
+    try:
+        result = await asyncio.to_thread(
+            read_and_extract, input_bag, run_id, loop, queues, metrics, checkpoints
+        )
+    finally:
+        for table_queue in queues.values():
+            await table_queue.put(_STOP)
+        await asyncio.gather(*writers)
+    metrics.print_summary()
+
+    if errors:
+        raise RuntimeError(
+            f"Async writers failed for: {', '.join(table for table, _ in errors)}"
+        )
+    return result
@@ -0,0 +1,304 @@
+import io
+import time
+from array import array
+import numpy as np
+from psycopg2.extras import execute_values
+from connecting_db import savepoint
+from ingest_metrics import IngestMetrics
+from run_summary import RunSummary
+from topic_registry import TABLE_COLUMNS, INTEGER_COLUMNS, UPDATE_ON_CONFLICT
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+
+
+def build_conflict_clause(table):
+    """Builds the ON CONFLICT clause that keeps the loaders' original behaviour."""
+    keys, values = TABLE_COLUMNS[table]
+    clause = f"ON CONFLICT ({', '.join(keys)}) "
+    if table in UPDATE_ON_CONFLICT:
+        return clause + "DO UPDATE SET " + ", ".join(
+            f"{column} = EXCLUDED.{column}" for column in values
+        )
+    return clause + "DO NOTHING"
+
+
+def build_insert_query(table, single_row=False):
+    """
+    Builds the INSERT for a table, keeping its ON CONFLICT behaviour.
+
+    By default the query takes all rows through one execute_values() placeholder;
+    with single_row it has one placeholder per column instead.
+    """
+    keys, values = TABLE_COLUMNS[table]
+    placeholder = "%s"
+    if single_row:
+        placeholder = f"({', '.join(['%s'] * (len(keys) + len(values)))})"
+    return f"INSERT INTO {table} ({', '.join(keys + values)}) VALUES {placeholder} {build_conflict_clause(table)}"
+
+
+def build_merge_query(table, source):
+    """Builds the INSERT ... SELECT that moves rows from a staging table into table."""
+    columns = ", ".join(TABLE_COLUMNS[table][0] + TABLE_COLUMNS[table][1])
+    return f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {source} {build_conflict_clause(table)}"
+
+
+def build_bulk_merge_query(table, source):
+    """
+    Builds the INSERT ... SELECT that deduplicates a bulk staging table into table.
+
+    Staged rows are numbered in insertion order (bulk_seq), so that per key the first
+    row is kept, or the last one for tables that update on conflict, the same
+    outcome as inserting them one batch at a time. Rows are inserted in primary
+    key order.
+    """
+    keys, values = TABLE_COLUMNS[table]
+    columns = ", ".join(keys + values)
+    key_list = ", ".join(keys)
+    order = "DESC" if table in UPDATE_ON_CONFLICT else "ASC"
+    return (
+        f"INSERT INTO {table} ({columns}) SELECT DISTINCT ON ({key_list}) {columns} FROM {source} "
+        f"ORDER BY {key_list}, bulk_seq {order} {build_conflict_clause(table)}"
+    )
+
+
+def format_times(timestamps):
+    """Converts int64 nanosecond timestamps to UTC timestamp strings in one step."""
+    # Round to the microsecond precision of TIMESTAMPTZ, as datetime.fromtimestamp did.
+    microseconds = (timestamps + 500) // 1000
+    return np.datetime_as_string(
+        microseconds.astype("datetime64[us]"), unit="us", timezone="UTC"
+    )
+
+
+class TableBuffer:
+    """
+    Columnar buffer of one table's rows.
+
+    Timestamps and IDs are kept in int64 arrays and values in float64 arrays,
+    so a batch is converted with a few vectorized NumPy operations instead of one
+    Python object per field.
+    """
+
+    def __init__(self, table):
+        keys, values = TABLE_COLUMNS[table]
+        self.table = table
+        self.columns = [
+            array("q") if column in INTEGER_COLUMNS else array("d")
+            for column in keys + values
+        ]
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+
+    def to_numeric_arrays(self, leave_out=()):
+        """
+        Returns the buffered columns as NumPy arrays, timestamps in nanoseconds.
+
+        :param leave_out: Converted rows, as returned by to_rows(), whose keys are
+            left out of the arrays.
+        """
+        arrays = [np.frombuffer(column, dtype=column.typecode) for column in self.columns]
+        if leave_out:
+            key_length = len(TABLE_COLUMNS[self.table][0])
+            left_out = {tuple(row[:key_length]) for row in leave_out}
+            keys = zip(
+                format_times(arrays[0]).tolist(),
+                *(column.tolist() for column in arrays[1:key_length]),
+            )
+            keep = np.fromiter(
+                (key not in left_out for key in keys), dtype=bool, count=len(arrays[0])
+            )
+            arrays = [column[keep] for column in arrays]
+        return arrays
+
+    def to_arrays(self):
+        """Returns the buffered columns as NumPy arrays, timestamps converted to strings."""
+        arrays = self.to_numeric_arrays()
+        arrays[0] = format_times(arrays[0])
+        if self.table in UPDATE_ON_CONFLICT:
+            arrays = self._keep_last_per_key(arrays)
+        return arrays
+
+    def _keep_last_per_key(self, arrays):
+        # A single statement cannot update the same row twice; keep the last one.
+        key_length = len(TABLE_COLUMNS[self.table][0])
+        last = {key: i for i, key in enumerate(zip(*arrays[:key_length]))}
+        if len(last) == len(arrays[0]):
+            return arrays
+        index = np.fromiter(sorted(last.values()), dtype=np.int64, count=len(last))
+        return [column[index] for column in arrays]
+
+    def to_copy_text(self, arrays):
+        """
+        Formats the converted columns as COPY text rows.
+
+        Values are converted column by column with map(str) over the column's
+        Python values, which is faster than NumPy's astype(str) for floats, and
+        the rows are joined by str.join over map(), so no Python code runs per
+        row or value.
+        """
+        if not len(arrays[0]):
+            return ""
+        text_columns = [map(str, column.tolist()) for column in arrays]
+        return "\n".join(map("\t".join, zip(*text_columns))) + "\n"
+
+    def to_rows(self, arrays=None):
+        """Returns the converted columns as row tuples of plain Python values."""
+        if arrays is None:
+            arrays = self.to_arrays()
+        return list(zip(*(column.tolist() for column in arrays)))
+
+
+class BatchWriter:
+    """
+    Buffers rows per table in columnar form and writes them in COPY batches.
+
+    A table is flushed once it holds batch_size rows, and every table is flushed
+    when flush_interval seconds have passed since the last full flush. Each batch
+    is converted in one vectorized step, copied into a temporary table and merged
+    into the target table with the table's ON CONFLICT clause. Batches are
+    written inside the caller's transaction on conn, each in its own savepoint;
+    committing is left to the caller (see connecting_db.run_transaction). Flush
+    latencies, row counts and errors are recorded in metrics, and the statistics
+    of every batch in a RunSummary that subclasses save with save_summary().
+
+    The statistics are added once a batch is written and leave out the rows that
+    failed to insert. Rows that an ON CONFLICT clause skips or overwrites are
+    still counted; loading a run again from the start resets its statistics
+    first (see Sink.reset_run_summary).
+    """
+
+    def __init__(
+        self,
+        conn,
+        batch_size=DEFAULT_BATCH_SIZE,
+        flush_interval=DEFAULT_FLUSH_INTERVAL,
+        metrics=None,
+    ):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.metrics = metrics or IngestMetrics()
+        self.summary = RunSummary()
+        self.buffers = {table: TableBuffer(table) for table in TABLE_COLUMNS}
+        self.queries = {table: build_insert_query(table) for table in TABLE_COLUMNS}
+        self.staging_tables = {}
+        self.last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+            self.save_summary()
+
+    def add(self, table, row):
+        """
+        Queues one row for a table.
+
+        :param table: The destination table.
+        :param row: The row values in TABLE_COLUMNS order, starting with the
+            message timestamp in nanoseconds.
+        """
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush_table(table)
+        elif time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Writes every buffered row."""
+        for table in self.buffers:
+            self.flush_table(table)
+        self.last_flush = time.monotonic()
+
+    def save_summary(self):
+        """
+        Merges the statistics gathered since the last call into the run_summary
+        table, in the caller's transaction; writers of sinks without one drop them.
+        """
+        self.summary.take()
+
+    def get_staging_table(self, table):
+        """Creates, once per connection, the temporary table a batch is copied into."""
+        if table not in self.staging_tables:
+            staging_table = f"{table}_batch"
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    f"CREATE TEMP TABLE IF NOT EXISTS {staging_table} (LIKE {table} INCLUDING DEFAULTS)"
+                )
+            self.staging_tables[table] = staging_table
+        return self.staging_tables[table]
+
+    def flush_table(self, table):
+        """Writes the buffered rows of one table and records the flush in metrics."""
+        buffer = self.buffers[table]
+        if not len(buffer):
+            return
+        self.buffers[table] = TableBuffer(table)
+        started = time.perf_counter()
+        rows, failed_rows = self.write_batch(table, buffer)
+        self.summary.add_batch(table, buffer.to_numeric_arrays(failed_rows))
+        self.metrics.observe_write(table, rows, time.perf_counter() - started)
+
+    def write_batch(self, table, buffer):
+        """
+        Writes one table's batch with a single COPY and merge.
+
+        :return: Tuple of (number of rows written, list of the rows that failed
+            to insert).
+        """
+        arrays = buffer.to_arrays()
+        staging_table = self.get_staging_table(table)
+        columns = ", ".join(TABLE_COLUMNS[table][0] + TABLE_COLUMNS[table][1])
+
+        cur = self.conn.cursor()
+        try:
+            with savepoint(self.conn):
+                cur.copy_expert(
+                    f"COPY {staging_table} ({columns}) FROM STDIN",
+                    io.StringIO(buffer.to_copy_text(arrays)),
+                )
+                cur.execute(build_merge_query(table, staging_table))
+                cur.execute(f"TRUNCATE {staging_table}")
+            return len(arrays[0]), []
+        except Exception as e:
+            self.metrics.errors.report(
+                ("write", table, type(e).__name__),
+                f"Batch insert error for {table}, retrying {len(arrays[0])} rows one by one: {e}",
+            )
+            return self._insert_one_by_one(table, buffer.to_rows(arrays))
+        finally:
+            cur.close()
+
+    def _insert_one_by_one(self, table, rows, query=None):
+        """
+        Inserts rows in separate savepoints so that a bad row only loses itself.
+
+        :param query: The execute_values INSERT to use instead of the table's own.
+        :return: Tuple of (number of rows written, list of the rows that failed).
+        """
+        query = query or self.queries[table]
+        cur = self.conn.cursor()
+        failed_rows = []
+        try:
+            for row in rows:
+                try:
+                    with savepoint(self.conn, "batch_row"):
+                        execute_values(cur, query, [row])
+                except Exception as e:
+                    failed_rows.append(row)
+                    self.metrics.errors.report(
+                        ("write row", table, type(e).__name__),
+                        f"Database insert error for {table} at {row[0]}: {e}",
+                    )
+        finally:
+            cur.close()
+        return len(rows) - len(failed_rows), failed_rows
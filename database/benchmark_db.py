@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+import numpy as np
+from batch_writer import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+from generate_bag import generate_bag, DEFAULT_DURATION
+from message_dispatcher import open_bag, process_rosbag
+from runs_loading import insert_run
+from sinks import get_sink, NullSink, NullWriter, DEFAULT_SINK
+
+# Benchmark sink name -> --sink target; "sqlite" gets a fresh file per measurement.
+BENCHMARK_SINKS = {"null": "null", "sqlite": None, "postgres": "postgres"}
+DEFAULT_BENCHMARK_SINKS = ["null", "sqlite"]
+DEFAULT_REPEAT = 3
+
+
+def get_peak_memory():
+    """Peak resident memory of this process in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_loaders(input_bag):
+    """
+    Times decoding and extraction of every message, per topic, into a NullWriter.
+
+    :return: Dict mapping topic to its message count, msgs/sec and per-message
+        latency percentiles in microseconds.
+    """
+    from rclpy.serialization import deserialize_message
+
+    reader, dispatch = open_bag(input_bag, sink=NullSink())
+    if reader is None:
+        return {}
+    writer = NullWriter()
+    durations = {topic: [] for topic in dispatch}
+
+    while reader.has_next():
+        topic, data, timestamp = reader.read_next()
+        msg_type, fast_decoder, loader = dispatch[topic]
+        started = time.perf_counter_ns()
+        msg = fast_decoder(data) if fast_decoder else None
+        if msg is None:
+            msg = deserialize_message(data, msg_type)
+        loader(writer, 0, topic, msg, timestamp)
+        durations[topic].append(time.perf_counter_ns() - started)
+
+    results = {}
+    for topic, values in durations.items():
+        if not values:
+            continue
+        values = np.array(values) / 1000
+        results[topic] = {
+            "messages": len(values),
+            "msgs_per_sec": len(values) / values.sum() * 1e6,
+            "latency_p50_us": float(np.percentile(values, 50)),
+            "latency_p99_us": float(np.percentile(values, 99)),
+            "latency_max_us": float(values.max()),
+        }
+    return results
+
+
+def measure_sink(input_bag, target, batch_size, flush_interval):
+    """
+    Loads the bag end to end into one sink; run in a fresh process so that the
+    peak memory is the load's own. A run loaded into PostgreSQL is deleted again
+    afterwards.
+
+    :return: Dict with the message count, elapsed seconds and peak memory (MB).
+    """
+    sink = get_sink(target)
+    run_id = insert_run(sink, input_bag, slam_type="benchmark")
+    try:
+        started = time.perf_counter()
+        stats = process_rosbag(input_bag, run_id, batch_size, flush_interval, sink=sink)
+        sink.complete_run(run_id, stats["end_time"])
+        elapsed = time.perf_counter() - started
+    finally:
+        # The synthetic run must not stay in the database it was loaded into.
+        if target == DEFAULT_SINK and run_id is not None:
+            from postgres_sink import delete_run
+
+            delete_run(run_id)
+    return {
+        "messages": stats["messages"],
+        "elapsed_s": elapsed,
+        "peak_memory_mb": get_peak_memory(),
+    }
+
+
+def run_isolated(function, *args):
+    """Runs a measurement in a new process and returns its result."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(function, *args).result()
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(
+    input_bag,
+    sinks=DEFAULT_BENCHMARK_SINKS,
+    repeat=DEFAULT_REPEAT,
+    batch_size=DEFAULT_BATCH_SIZE,
+    flush_interval=DEFAULT_FLUSH_INTERVAL,
+):
+    """
+    Measures per-loader and end-to-end ingestion performance of a bag.
+
+    Every end-to-end load runs repeat times, each in its own process; the median
+    elapsed time is reported.
+
+    :param input_bag: The bag to load, e.g. one written by generate_bag.
+    :param sinks: Names from BENCHMARK_SINKS to load into.
+    :return: Dict of results, ready to be written as JSON.
+    """
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "bag": os.path.abspath(input_bag),
+        "batch_size": batch_size,
+        "flush_interval": flush_interval,
+        "loaders": run_isolated(measure_loaders, input_bag),
+        "sinks": {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in sinks:
+            measurements = []
+            for attempt in range(repeat):
+                target = BENCHMARK_SINKS[name] or os.path.join(
+                    directory, f"benchmark_{attempt}.db"
+                )
+                measurements.append(
+                    run_isolated(
+                        measure_sink, input_bag, target, batch_size, flush_interval
+                    )
+                )
+            elapsed = statistics.median(m["elapsed_s"] for m in measurements)
+            messages = measurements[0]["messages"]
+            results["sinks"][name] = {
+                "messages": messages,
+                "elapsed_s": elapsed,
+                "msgs_per_sec": messages / elapsed if elapsed else None,
+                "peak_memory_mb": max(m["peak_memory_mb"] for m in measurements),
+                "runs_s": [m["elapsed_s"] for m in measurements],
+            }
+            print(
+                f"{name}: {messages} messages in {elapsed:.2f} s ({messages / elapsed:.0f} msgs/s), peak memory {results['sinks'][name]['peak_memory_mb']:.0f} MB"
+            )
+    return results
+
+
+def compare_results(baseline, results):
+    """Prints the msgs/sec of every sink and loader against a baseline run."""
+    print(f"Compared with {baseline.get('commit')} ({baseline.get('created')}):")
+    for section in ("sinks", "loaders"):
+        for name, current in results[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous or not previous.get("msgs_per_sec"):
+                continue
+            change = current["msgs_per_sec"] / previous["msgs_per_sec"] - 1
+            print(
+                f"  {name}: {previous['msgs_per_sec']:.0f} -> {current['msgs_per_sec']:.0f} msgs/s ({change:+.1%})"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rosbag ingestion")
+    parser.add_argument(
+        "--bag",
+        help="Bag to load (default: a synthetic bag generated for the run)",
+        default=None,
+    )
+    parser.add_argument(
+        "--duration",
+        help=f"Length of the synthetic bag in seconds (default: {DEFAULT_DURATION})",
+        type=float,
+        default=DEFAULT_DURATION,
+    )
+    parser.add_argument(
+        "--reference_bag",
+        help="Recorded bag to take the message types of our own packages from",
+        default=None,
+    )
+    parser.add_argument(
+        "--sinks",
+        help=f"Sinks to load into (default: {' '.join(DEFAULT_BENCHMARK_SINKS)})",
+        nargs="+",
+        choices=list(BENCHMARK_SINKS),
+        default=DEFAULT_BENCHMARK_SINKS,
+    )
+    parser.add_argument(
+        "--repeat",
+        help=f"Loads per sink (default: {DEFAULT_REPEAT})",
+        type=int,
+        default=DEFAULT_REPEAT,
+    )
+    parser.add_argument(
+        "--batch_size",
+        help=f"Rows buffered per table before writing (default: {DEFAULT_BATCH_SIZE})",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--flush_interval",
+        help=f"Seconds between forced flushes (default: {DEFAULT_FLUSH_INTERVAL})",
+        type=float,
+        default=DEFAULT_FLUSH_INTERVAL,
+    )
+    parser.add_argument(
+        "--output", help="JSON file for the results", default="benchmark_results.json"
+    )
+    parser.add_argument(
+        "--compare", help="Results JSON of an earlier version to compare with", default=None
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_bag = args.bag
+        if input_bag is None:
+            input_bag = os.path.join(directory, "Benchmark_synthetic")
+            generate_bag(input_bag, args.duration, args.reference_bag)
+        results = run_benchmarks(
+            input_bag, args.sinks, args.repeat, args.batch_size, args.flush_interval
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
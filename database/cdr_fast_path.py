@@ -0,0 +1,148 @@
+import re
+import struct
+from types import SimpleNamespace
+
+# CDR primitive type -> struct format; the size of each is also its alignment.
+PRIMITIVE_FORMATS = {
+    "boolean": "?",
+    "byte": "B",
+    "char": "B",
+    "octet": "B",
+    "int8": "b",
+    "uint8": "B",
+    "int16": "h",
+    "uint16": "H",
+    "int32": "i",
+    "uint32": "I",
+    "int64": "q",
+    "uint64": "Q",
+    "float": "f",
+    "double": "d",
+}
+
+CDR_HEADER_SIZE = 4
+ENDIANNESS = {0: ">", 1: "<"}  # encapsulation kind CDR_BE / CDR_LE
+
+SEQUENCE_PATTERN = re.compile(r"^sequence<([^,>]+)(?:,\s*\d+)?>$")
+ARRAY_PATTERN = re.compile(r"^(.+)\[(\d+)\]$")
+STRING_PATTERN = re.compile(r"^string(?:<=\d+)?$")
+
+
+def _skip_ops(type_name, ops):
+    """
+    Appends the operations needed to step over one field of type_name.
+
+    Returns False if the type cannot be skipped without decoding it, e.g. a
+    sequence of messages.
+    """
+    if type_name in PRIMITIVE_FORMATS:
+        ops.append(("fixed", struct.calcsize(PRIMITIVE_FORMATS[type_name]), 1))
+        return True
+
+    if STRING_PATTERN.match(type_name):
+        ops.append(("string",))
+        return True
+
+    sequence = SEQUENCE_PATTERN.match(type_name)
+    if sequence:
+        element = sequence.group(1)
+        if element not in PRIMITIVE_FORMATS:
+            return False
+        ops.append(("sequence", struct.calcsize(PRIMITIVE_FORMATS[element])))
+        return True
+
+    array = ARRAY_PATTERN.match(type_name)
+    if array:
+        element, length = array.group(1), int(array.group(2))
+        if element in PRIMITIVE_FORMATS:
+            ops.append(("fixed", struct.calcsize(PRIMITIVE_FORMATS[element]), length))
+            return True
+        element_ops = []
+        if not _skip_ops(element, element_ops):
+            return False
+        ops.extend(element_ops * length)
+        return True
+
+    if "/" in type_name:
+        from rosidl_runtime_py.utilities import get_message
+
+        package, name = type_name.split("/", 1)
+        try:
+            nested = get_message(f"{package}/msg/{name}")
+        except Exception:
+            return False
+        for field_type in nested.get_fields_and_field_types().values():
+            if not _skip_ops(field_type, ops):
+                return False
+        return True
+
+    return False
+
+
+def _align(offset, size):
+    # Alignment is relative to the start of the payload, after the encapsulation header.
+    return offset + (-(offset - CDR_HEADER_SIZE) % size)
+
+
+def build_fast_decoder(msg_type, field):
+    """
+    Builds a decoder that reads a single top-level field straight from a CDR buffer.
+
+    Scalar primitive fields are returned as their value; sequence fields are returned
+    as range(length), so len() works without building the elements. The decoder
+    returns a SimpleNamespace carrying only that field, or None if the buffer is not
+    plain CDR, in which case the caller should fully deserialize the message.
+
+    :param msg_type: The ROS message class.
+    :param field: The name of the top-level field to read.
+    :return: The decoder, or None if the field cannot be reached without decoding.
+    """
+    fields = msg_type.get_fields_and_field_types()
+    if field not in fields:
+        return None
+
+    ops = []
+    for name, field_type in fields.items():
+        if name == field:
+            break
+        if not _skip_ops(field_type, ops):
+            return None
+
+    field_type = fields[field]
+    if field_type in PRIMITIVE_FORMATS:
+        target_format = PRIMITIVE_FORMATS[field_type]
+    elif SEQUENCE_PATTERN.match(field_type):
+        target_format = None
+    else:
+        return None
+
+    def decode(data):
+        if len(data) < CDR_HEADER_SIZE or data[1] not in ENDIANNESS:
+            return None
+        endian = ENDIANNESS[data[1]]
+        offset = CDR_HEADER_SIZE
+        try:
+            for op in ops:
+                if op[0] == "fixed":
+                    offset = _align(offset, op[1]) + op[1] * op[2]
+                elif op[0] == "string":
+                    offset = _align(offset, 4)
+                    offset += 4 + struct.unpack_from(endian + "I", data, offset)[0]
+                else:
+                    offset = _align(offset, 4)
+                    length = struct.unpack_from(endian + "I", data, offset)[0]
+                    offset += 4
+                    if length:
+                        offset = _align(offset, op[1]) + op[1] * length
+
+            if target_format is None:
+                offset = _align(offset, 4)
+                value = range(struct.unpack_from(endian + "I", data, offset)[0])
+            else:
+                offset = _align(offset, struct.calcsize(target_format))
+                value = struct.unpack_from(endian + target_format, data, offset)[0]
+        except struct.error:
+            return None
+        return SimpleNamespace(**{field: value})
+
+    return decode
@@ -1,4 +1,10 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import pool
 
 DB_CONFIG = {
     "dbname": "autonomous_db",
@@ -8,6 +14,145 @@ DB_CONFIG = {
     "port": 5432,
 }
 
+POOL_MIN_CONNECTIONS = 1
+# Enough for a pipelined load, which keeps one connection per destination table.
+POOL_MAX_CONNECTIONS = 16
+CONNECT_RETRIES = 3
+RETRY_DELAY = 1.0  # seconds, doubled after every failed attempt
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        # A pool inherited through fork() shares sockets with the parent; start a new one.
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = pool.ThreadedConnectionPool(
+                POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, **DB_CONFIG
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def close_pool():
+    """Closes every pooled connection of this process."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+
+atexit.register(close_pool)
+
+
+def is_healthy(conn):
+    """Checks that a pooled connection is still open and answering queries."""
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
 
 def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    """
+    Takes a healthy connection from the pool, reconnecting if needed.
+
+    Return it with release_db_connection() once done.
+    """
+    delay = RETRY_DELAY
+    for attempt in range(CONNECT_RETRIES):
+        try:
+            conn = get_pool().getconn()
+        except psycopg2.OperationalError as e:
+            if attempt == CONNECT_RETRIES - 1:
+                raise
+            print(f"Database connection failed, retrying in {delay:.0f}s: {e}")
+            time.sleep(delay)
+            delay *= 2
+            continue
+
+        if is_healthy(conn):
+            return conn
+        # Drop the broken connection; the pool opens a fresh one on the next getconn().
+        get_pool().putconn(conn, close=True)
+
+    raise psycopg2.OperationalError("Could not get a healthy database connection")
+
+
+def release_db_connection(conn):
+    """Returns a connection to the pool, discarding it if it was closed."""
+    if conn.closed:
+        get_pool().putconn(conn, close=True)
+        return
+    if conn.status != psycopg2.extensions.STATUS_READY:
+        conn.rollback()
+    get_pool().putconn(conn)
+
+
+@contextmanager
+def db_connection():
+    """Borrows a pooled connection for the duration of a with block."""
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        release_db_connection(conn)
+
+
+@contextmanager
+def run_transaction():
+    """
+    Holds one pooled connection and one transaction for a whole run.
+
+    The transaction is committed when the block exits normally and rolled back
+    if it raises. Use savepoint() to isolate the batches written inside it.
+    """
+    with db_connection() as conn:
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+@contextmanager
+def savepoint(conn, name="batch"):
+    """
+    Wraps a block in a savepoint of the open transaction.
+
+    If the block raises, only the work done since the savepoint is undone and the
+    exception is re-raised; the surrounding transaction stays usable.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"SAVEPOINT {name}")
+        try:
+            yield
+        except BaseException:
+            cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            raise
+        cur.execute(f"RELEASE SAVEPOINT {name}")
+
+
+@contextmanager
+def autocommit_connection():
+    """
+    Borrows a pooled connection in autocommit mode, for statements that cannot
+    run inside a transaction block (e.g. refresh_continuous_aggregate).
+    """
+    with db_connection() as conn:
+        conn.autocommit = True
+        try:
+            yield conn
+        finally:
+            conn.autocommit = False
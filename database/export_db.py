@@ -0,0 +1,224 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from connecting_db import db_connection, POOL_MAX_CONNECTIONS
+from topic_registry import TABLE_COLUMNS
+from query_db import build_select_query, iter_column_chunks
+
+DEFAULT_ROW_GROUP_SIZE = 100000
+DEFAULT_EXPORT_WORKERS = 4
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+# SQL type of a value column -> its Arrow type, so that no precision is lost.
+ARROW_TYPES = {"real": pa.float32(), "double precision": pa.float64()}
+
+
+def get_export_name(table):
+    """Tables keyed by metric are exported under their view name, with metric names."""
+    return table[: -len("_values")] if table.endswith("_values") else table
+
+
+def get_metric_names(conn):
+    """Returns the metric names as an Arrow dictionary indexed by metric_id."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT metric_id, metric_name FROM metrics")
+        rows = dict(cur.fetchall())
+    names = [rows.get(metric_id) for metric_id in range(max(rows, default=0) + 1)]
+    return pa.array(names, type=pa.string())
+
+
+def get_column_types(conn, table):
+    """Returns the SQL type of every column of a table."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s",
+            (table,),
+        )
+        return dict(cur.fetchall())
+
+
+def build_schema(table, column_types):
+    keys, values = TABLE_COLUMNS[table]
+    fields = [pa.field("time", pa.timestamp("us", tz="UTC"), nullable=False)]
+    if "metric_id" in keys:
+        fields.append(
+            pa.field("metric", pa.dictionary(pa.int32(), pa.string()), nullable=False)
+        )
+    fields += [pa.field(column, ARROW_TYPES[column_types[column]]) for column in values]
+    return pa.schema(fields)
+
+
+def to_record_batch(chunk, schema, metric_names):
+    """Converts one chunk of query_db columns into an Arrow record batch."""
+    columns = [pa.array(chunk["time"], type=schema.field("time").type)]
+    if "metric_id" in chunk:
+        columns.append(
+            pa.DictionaryArray.from_arrays(
+                pa.array(chunk["metric_id"].astype(np.int32)), metric_names
+            )
+        )
+    for name in schema.names[len(columns) :]:
+        field_type = schema.field(name).type
+        columns.append(pa.array(chunk[name].astype(field_type.to_pandas_dtype()), type=field_type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def open_writer(path, schema, file_format):
+    if file_format == "parquet":
+        return pq.ParquetWriter(path, schema, compression="zstd")
+    return pa.ipc.new_file(path, schema)
+
+
+def export_table(run_id, table, output_dir, file_format, row_group_size):
+    """
+    Streams one table of a run into a file under output_dir/<table>/run_id=<run_id>/.
+
+    Rows are fetched row_group_size at a time and each chunk becomes one row group
+    (one record batch for Arrow), so memory use does not depend on the run length.
+    The file is written under a temporary name and only renamed once complete.
+
+    :return: Number of rows written; no file is created for a table without rows.
+    """
+    name = get_export_name(table)
+    keys, values = TABLE_COLUMNS[table]
+    columns = (("metric_id",) if "metric_id" in keys else ()) + values
+    directory = os.path.join(output_dir, name, f"run_id={run_id}")
+    path = os.path.join(directory, f"part-0{EXPORT_FORMATS[file_format]}")
+
+    query, params = build_select_query(table, columns, None, None, None)
+    rows = 0
+    writer = None
+    with db_connection() as conn:
+        schema = build_schema(table, get_column_types(conn, table))
+        metric_names = get_metric_names(conn) if "metric_id" in keys else None
+        try:
+            for chunk in iter_column_chunks(
+                conn, query, [run_id] + params, ("time",) + columns, row_group_size
+            ):
+                if writer is None:
+                    os.makedirs(directory, exist_ok=True)
+                    writer = open_writer(path + ".tmp", schema, file_format)
+                batch = to_record_batch(chunk, schema, metric_names)
+                if file_format == "parquet":
+                    writer.write_batch(batch, row_group_size=row_group_size)
+                else:
+                    writer.write_batch(batch)
+                rows += batch.num_rows
+            if writer is not None:
+                writer.close()
+        except BaseException:
+            # Leave no partial file behind.
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+                os.remove(path + ".tmp")
+            raise
+
+    if writer is not None:
+        os.replace(path + ".tmp", path)
+    return rows
+
+
+def export_runs(
+    run_ids,
+    output_dir,
+    tables=None,
+    file_format="parquet",
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    workers=DEFAULT_EXPORT_WORKERS,
+):
+    """
+    Exports runs to columnar files laid out as <table>/run_id=<run_id>/part-0.
+
+    Tables are exported in parallel, each over its own pooled connection.
+
+    :param run_ids: The run IDs to export.
+    :param output_dir: Root directory of the export.
+    :param tables: Tables to export; every time-series table by default.
+    :param file_format: "parquet" or "arrow" (Arrow IPC / Feather v2).
+    :param row_group_size: Rows per fetched chunk and per row group.
+    :param workers: Number of tables exported at once.
+    :return: Dict mapping (run_id, table) to the number of rows written.
+    """
+    if tables is None:
+        tables = list(TABLE_COLUMNS)
+    workers = min(workers, POOL_MAX_CONNECTIONS)
+    results = {}
+    failures = []
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                export_table, run_id, table, output_dir, file_format, row_group_size
+            ): (run_id, table)
+            for run_id in run_ids
+            for table in tables
+        }
+        for future in as_completed(futures):
+            run_id, table = futures[future]
+            try:
+                results[(run_id, table)] = future.result()
+            except Exception as e:
+                failures.append((run_id, table))
+                print(f"Error: Could not export {table} of run {run_id}: {e}")
+                continue
+            print(f"Exported {results[(run_id, table)]} rows of {table} for run {run_id}")
+
+    rows = sum(results.values())
+    print(f"Exported {rows} rows in {time.monotonic() - started:.1f} s to {output_dir}")
+    if failures:
+        raise RuntimeError(f"{len(failures)} table exports failed")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export runs from TimescaleDB to Parquet or Arrow files"
+    )
+    parser.add_argument("run_ids", help="Run IDs to export", type=int, nargs="+")
+    parser.add_argument("--output", help="Output directory", required=True)
+    parser.add_argument(
+        "--format",
+        help="File format (default: parquet)",
+        choices=list(EXPORT_FORMATS),
+        default="parquet",
+    )
+    parser.add_argument(
+        "--tables",
+        help="Tables to export (default: all time-series tables)",
+        nargs="+",
+        choices=list(TABLE_COLUMNS),
+        default=None,
+    )
+    parser.add_argument(
+        "--row_group_size",
+        help=f"Rows per row group (default: {DEFAULT_ROW_GROUP_SIZE})",
+        type=int,
+        default=DEFAULT_ROW_GROUP_SIZE,
+    )
+    parser.add_argument(
+        "--workers",
+        help=f"Tables exported in parallel (default: {DEFAULT_EXPORT_WORKERS})",
+        type=int,
+        default=DEFAULT_EXPORT_WORKERS,
+    )
+    args = parser.parse_args()
+
+    export_runs(
+        args.run_ids,
+        args.output,
+        args.tables,
+        args.format,
+        args.row_group_size,
+        args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
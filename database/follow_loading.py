@@ -0,0 +1,276 @@
+import glob
+import io
+import os
+import struct
+import time
+from mcap.exceptions import EndOfFile
+from mcap.opcode import Opcode
+from mcap.records import Channel, Message, Schema
+from mcap.stream_reader import StreamReader
+from batch_writer import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+from ingest_metrics import IngestMetrics
+from message_dispatcher import resolve_topic
+from runs_loading import create_run, get_bag_fingerprint, get_split_index
+from sinks import get_sink
+
+DEFAULT_POLL_INTERVAL = 0.5  # seconds between two reads of the growing file
+DEFAULT_IDLE_TIMEOUT = 30.0  # seconds without new data after which recording is over
+MCAP_MAGIC = b"\x89MCAP0\r\n"
+RECORD_HEADER = struct.Struct("<BQ")  # opcode, record length
+# Records after which a file holds no more messages.
+END_OPCODES = {Opcode.DATA_END, Opcode.FOOTER}
+# A followed run is fingerprinted by its bag's path until recording stops, when
+# the bag's content fingerprint replaces it.
+FOLLOW_FINGERPRINT_PREFIX = "follow:"
+
+
+class McapTail:
+    """
+    Reads the records appended to an MCAP file that is still being written.
+
+    Only whole records are parsed; the offset after the last one is kept, so
+    every poll reads just the bytes written since the previous one. A chunk is
+    only decoded once the recorder has written all of it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.schemas = {}
+        self.channels = {}
+        self.ended = False
+
+    def poll(self):
+        """
+        Returns the messages of the records completed since the last poll.
+
+        :return: List of (topic, message type, CDR data, log time in ns) tuples.
+        """
+        if self.ended:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+
+        start = 0
+        if self.offset == 0:
+            if len(data) < len(MCAP_MAGIC):
+                return []
+            if not data.startswith(MCAP_MAGIC):
+                raise ValueError(f"{self.path} is not an MCAP file")
+            start = len(MCAP_MAGIC)
+
+        end = start
+        while end + RECORD_HEADER.size <= len(data):
+            opcode, length = RECORD_HEADER.unpack_from(data, end)
+            if end + RECORD_HEADER.size + length > len(data):
+                break
+            end += RECORD_HEADER.size + length
+            if opcode in END_OPCODES:
+                self.ended = True
+                break
+        self.offset += end
+        if end == start:
+            return []
+
+        messages = []
+        try:
+            for record in StreamReader(
+                io.BytesIO(data[start:end]), skip_magic=True
+            ).records:
+                if isinstance(record, Message):
+                    topic, schema_id = self.channels[record.channel_id]
+                    messages.append(
+                        (topic, self.schemas.get(schema_id), record.data, record.log_time)
+                    )
+                elif isinstance(record, Channel):
+                    self.channels[record.id] = (record.topic, record.schema_id)
+                elif isinstance(record, Schema):
+                    self.schemas[record.id] = record.name
+        except EndOfFile:
+            pass  # the slice ends on a record boundary
+        return messages
+
+
+def find_next_file(input_bag, current):
+    """
+    Returns the next file of a bag being recorded, or None if there is none yet.
+
+    A bag given as a file is that file only. For a rosbag2 directory, the recorder
+    starts a new _<n>.mcap file at every split.
+    """
+    if not os.path.isdir(input_bag):
+        return input_bag if current is None else None
+    files = sorted(
+        glob.glob(os.path.join(input_bag, "*.mcap")), key=get_split_index
+    )
+    if current is None:
+        return files[0] if files else None
+    later = [path for path in files if get_split_index(path) > get_split_index(current)]
+    return later[0] if later else None
+
+
+def get_follow_fingerprint(input_bag):
+    return FOLLOW_FINGERPRINT_PREFIX + os.path.abspath(input_bag)
+
+
+def find_followed_run(sink, input_bag):
+    """
+    Returns (run_id, completed) of an earlier load of a bag, or None.
+
+    A follow interrupted while the bag was recorded is found by the bag's path,
+    a bag loaded after recording by its content fingerprint.
+    """
+    existing = sink.find_run(get_follow_fingerprint(input_bag))
+    if existing is not None:
+        return existing
+    try:
+        return sink.find_run(get_bag_fingerprint(input_bag))
+    except OSError:
+        return None  # nothing recorded yet
+
+
+def follow_rosbag(
+    input_bag,
+    slam_type=None,
+    doc_url=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    flush_interval=DEFAULT_FLUSH_INTERVAL,
+    poll_interval=DEFAULT_POLL_INTERVAL,
+    idle_timeout=DEFAULT_IDLE_TIMEOUT,
+    sink=None,
+    metrics=None,
+):
+    """
+    Loads a bag while it is being recorded, until recording stops.
+
+    The run is created when the first message arrives. Every poll_interval
+    seconds the newly completed records are decoded, loaded and committed
+    together with the per-topic checkpoints, so rows become visible within
+    about one poll interval of their chunk being written. The recorder's chunk
+    size bounds that latency from below; record with small chunks (or the
+    rosbag2 "fastwrite" storage preset) for the lowest latency.
+
+    Recording is considered over when a bag given as a file ends, when the last
+    file of a rosbag2 directory ends and no new split file follows within
+    idle_timeout, or when no data arrives for idle_timeout seconds.
+    The run is then completed with the last message time as its end time and
+    given the bag's content fingerprint, so loading the finished bag again finds
+    it, unless another run already holds that fingerprint. Following a bag again after an interruption resumes its run from the
+    checkpoints: messages at or before a topic's checkpoint are skipped undecoded.
+
+    :param input_bag: The .mcap file or the rosbag2 directory being recorded.
+    :param poll_interval: Seconds between two reads of the growing file.
+    :param idle_timeout: Seconds without new data after which loading stops.
+    :param sink: The Sink the rows are written to (default: PostgreSQL).
+    :param metrics: The IngestMetrics to record into (default: new ones).
+    :return: Dict with the run_id, the number of messages read and the first and
+        last message timestamps in nanoseconds.
+    """
+    from rclpy.serialization import deserialize_message
+
+    sink = sink or get_sink()
+    metrics = metrics or IngestMetrics()
+    clock = time.perf_counter
+    result = {"run_id": None, "messages": 0, "start_time": None, "end_time": None}
+    dispatch = {}
+    high_water = {}
+    tail = None
+    last_data = time.monotonic()
+
+    checkpoints = {}
+    existing = find_followed_run(sink, input_bag)
+    if existing is not None:
+        run_id, completed = existing
+        if completed:
+            print(f"Bag {input_bag} is already loaded as run {run_id}, skipping.")
+            return dict(result, run_id=run_id)
+        checkpoints = sink.load_checkpoints(run_id)
+        if not checkpoints:
+            sink.reset_run_summary(run_id)
+        result["run_id"] = run_id
+        print(
+            f"Resuming run {run_id} for {input_bag} from checkpoints of {len(checkpoints)} topics."
+        )
+
+    with sink.open_writer(batch_size, flush_interval, metrics) as writer:
+        while True:
+            if tail is None or tail.ended:
+                path = find_next_file(input_bag, tail.path if tail else None)
+                if path is not None:
+                    print(f"Following {path}")
+                    tail = McapTail(path)
+            messages = tail.poll() if tail and os.path.exists(tail.path) else []
+
+            for topic, type_name, data, timestamp in messages:
+                if result["run_id"] is None:
+                    result["run_id"] = create_run(
+                        sink,
+                        input_bag,
+                        timestamp,
+                        None,
+                        slam_type,
+                        doc_url,
+                        get_follow_fingerprint(input_bag),
+                    )
+                if result["start_time"] is None:
+                    result["start_time"] = timestamp
+                result["end_time"] = timestamp
+                result["messages"] += 1
+                if timestamp <= checkpoints.get(topic, -1):
+                    continue
+                if topic not in dispatch:
+                    dispatch[topic] = resolve_topic(topic, type_name, sink)
+                if dispatch[topic] is None:
+                    continue
+
+                # Advanced before decoding, like process_rosbag(), so that a message that
+                # fails to load is reported once and not retried on resume.
+                high_water[topic] = timestamp
+                msg_type, fast_decoder, loader = dispatch[topic]
+                decode_started = clock()
+                try:
+                    msg = fast_decoder(data) if fast_decoder else None
+                    if msg is None:
+                        msg = deserialize_message(data, msg_type)
+                    decoded = clock()
+                    write_seconds = metrics.write_seconds
+                    loader(writer, result["run_id"], topic, msg, timestamp)
+                    extracted = clock() - (metrics.write_seconds - write_seconds)
+                except Exception as e:
+                    metrics.errors.report(
+                        ("process", topic, type(e).__name__),
+                        f"Error processing topic {topic} at {timestamp}: {e}",
+                    )
+                    continue
+                metrics.observe_stage("deserialize", topic, decoded - decode_started)
+                metrics.observe_stage("extract", topic, extracted - decoded)
+
+            now = time.monotonic()
+            if messages:
+                last_data = now
+                writer.checkpoint(result["run_id"], high_water)
+                metrics.maybe_export()
+            if tail is not None and tail.ended and not os.path.isdir(input_bag):
+                break
+            if not messages:
+                if now - last_data >= idle_timeout:
+                    break
+                time.sleep(poll_interval)
+
+    if result["run_id"] is None:
+        print(f"Warning: No messages arrived in {input_bag} within {idle_timeout:.0f} s.")
+    else:
+        fingerprint = get_bag_fingerprint(input_bag)
+        existing = sink.find_run(fingerprint)
+        if existing is not None and existing[0] != result["run_id"]:
+            # bag_fingerprint is unique; the finished bag was already loaded as another run.
+            print(
+                f"Warning: {input_bag} is already loaded as run {existing[0]}, "
+                f"run {result['run_id']} keeps its follow fingerprint."
+            )
+            fingerprint = None
+        sink.complete_run(result["run_id"], result["end_time"], fingerprint)
+        print(f"Recording of {input_bag} stopped, completed run {result['run_id']}")
+    metrics.print_summary()
+    return result
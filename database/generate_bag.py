@@ -0,0 +1,197 @@
+import argparse
+import heapq
+import random
+from topic_registry import REGISTRY, LENGTH_PATTERN
+
+DEFAULT_DURATION = 60.0  # seconds
+
+# Topic -> (message type, publish rate in Hz), following the rates on the car.
+# The types of our own packages that the loaders never name are None; they are
+# taken from a reference bag, since the synthetic messages must use the exact
+# definitions the loaders are run against.
+BENCHMARK_TOPICS = {
+    "/perception/execution_time": ("std_msgs/msg/Float64", 20),
+    "/perception/cones": ("custom_interfaces/msg/ConeArray", 20),
+    "/state_estimation/execution_time/correction_step": ("std_msgs/msg/Float64", 100),
+    "/state_estimation/execution_time/prediction_step": ("std_msgs/msg/Float64", 200),
+    "/state_estimation/vehicle_state": ("custom_interfaces/msg/VehicleState", 200),
+    "/path_planning/execution_time": ("std_msgs/msg/Float64", 10),
+    "/path_planning/yellow_cones": ("visualization_msgs/msg/MarkerArray", 10),
+    "/path_planning/blue_cones": ("visualization_msgs/msg/MarkerArray", 10),
+    "/path_planning/after_rem_yellow_cones": ("visualization_msgs/msg/MarkerArray", 10),
+    "/path_planning/after_rem_blue_cones": ("visualization_msgs/msg/MarkerArray", 10),
+    "/control/evaluator_data": (None, 50),
+    "/as_msgs/controls": (None, 50),
+    "/vehicle/rl_rpm": (None, 100),
+    "/vehicle/rr_rpm": (None, 100),
+    "/vehicle/bosch_steering_angle": (None, 100),
+    "/imu/acceleration": ("geometry_msgs/msg/Vector3Stamped", 1000),
+    "/imu/angular_velocity": ("geometry_msgs/msg/Vector3Stamped", 1000),
+    "/filter/euler": ("geometry_msgs/msg/Vector3Stamped", 400),
+    "/filter/quaternion": ("geometry_msgs/msg/QuaternionStamped", 400),
+}
+
+SEQUENCE_LENGTHS = (5, 60)  # cones or markers per message
+VALUE_RANGE = (-100.0, 100.0)
+START_TIME = 1700000000 * 10**9  # ns
+
+
+def get_reference_types(reference_bag):
+    """Returns the topic types recorded in a reference bag."""
+    from rosbag2_py import SequentialReader, StorageOptions, ConverterOptions
+
+    reader = SequentialReader()
+    reader.open(
+        StorageOptions(uri=reference_bag, storage_id="mcap"),
+        ConverterOptions(
+            input_serialization_format="cdr", output_serialization_format="cdr"
+        ),
+    )
+    return {
+        topic_type.name: topic_type.type
+        for topic_type in reader.get_all_topics_and_types()
+    }
+
+
+def resolve_topics(reference_bag=None):
+    """
+    Returns the topics to generate as a dict of topic -> (message class, type
+    name, rate), leaving out, with a warning, those whose type is unknown or not
+    installed.
+    """
+    from rosidl_runtime_py.utilities import get_message
+
+    reference_types = get_reference_types(reference_bag) if reference_bag else {}
+    topics = {}
+    for topic, (type_name, rate) in BENCHMARK_TOPICS.items():
+        type_name = reference_types.get(topic, type_name)
+        if type_name is None:
+            print(f"Warning: Skipping topic {topic}: its type needs --reference_bag")
+            continue
+        try:
+            topics[topic] = (get_message(type_name), type_name, rate)
+        except Exception as e:
+            print(f"Warning: Skipping topic {topic} ({type_name}): {e}")
+    return topics
+
+
+def get_element_class(parent, name):
+    """Returns the message class of the elements of a sequence field."""
+    from rosidl_runtime_py.utilities import get_message
+
+    field_type = parent.get_fields_and_field_types()[name]
+    element = field_type[field_type.index("<") + 1 :].split(",")[0].rstrip(">")
+    package, message = element.split("/")
+    return get_message(f"{package}/msg/{message}")
+
+
+def fill_message(msg, path, rng):
+    """Sets the field a registry path reads to a random value of its type."""
+    match = LENGTH_PATTERN.match(path)
+    *parents, name = (match.group(1) if match else path).split(".")
+    parent = msg
+    for attribute in parents:
+        parent = getattr(parent, attribute)
+
+    if match:
+        element_class = get_element_class(parent, name)
+        setattr(
+            parent,
+            name,
+            [element_class() for _ in range(rng.randint(*SEQUENCE_LENGTHS))],
+        )
+    else:
+        current = getattr(parent, name)
+        setattr(parent, name, type(current)(rng.uniform(*VALUE_RANGE)))
+
+
+def generate_message(msg_class, spec, rng):
+    msg = msg_class()
+    for path in spec.fields:
+        fill_message(msg, path, rng)
+    return msg
+
+
+def iter_schedule(topics, duration):
+    """Yields (timestamp, topic) of every message in time order."""
+    end_time = START_TIME + int(duration * 1e9)
+    heap = [(START_TIME, topic) for topic in topics]
+    heapq.heapify(heap)
+    while heap:
+        timestamp, topic = heapq.heappop(heap)
+        if timestamp >= end_time:
+            continue
+        yield timestamp, topic
+        heapq.heappush(heap, (timestamp + int(1e9 / topics[topic][2]), topic))
+
+
+def generate_bag(output_bag, duration=DEFAULT_DURATION, reference_bag=None, seed=0):
+    """
+    Writes a synthetic MCAP bag with the topic mix and rates of a real run.
+
+    Every field the registry loads is filled with a random value, so each message
+    goes through the same decoding and extraction as a recorded one.
+
+    :param output_bag: Directory of the bag to create.
+    :param duration: Length of the run in seconds.
+    :param reference_bag: Recorded bag to take the message types of our own
+        packages from.
+    :param seed: Seed of the random values, so a bag can be regenerated identically.
+    :return: Dict mapping topic to its number of messages.
+    """
+    from rclpy.serialization import serialize_message
+    from rosbag2_py import (
+        SequentialWriter,
+        StorageOptions,
+        ConverterOptions,
+        TopicMetadata,
+    )
+
+    rng = random.Random(seed)
+    topics = resolve_topics(reference_bag)
+    writer = SequentialWriter()
+    writer.open(
+        StorageOptions(uri=output_bag, storage_id="mcap"),
+        ConverterOptions(
+            input_serialization_format="cdr", output_serialization_format="cdr"
+        ),
+    )
+    for topic, (_, type_name, _) in topics.items():
+        writer.create_topic(
+            TopicMetadata(name=topic, type=type_name, serialization_format="cdr")
+        )
+
+    counts = dict.fromkeys(topics, 0)
+    for timestamp, topic in iter_schedule(topics, duration):
+        msg = generate_message(topics[topic][0], REGISTRY[topic], rng)
+        writer.write(topic, serialize_message(msg), timestamp)
+        counts[topic] += 1
+    del writer  # closes the bag
+    print(f"Generated {sum(counts.values())} messages on {len(counts)} topics in {output_bag}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic MCAP bag for ingestion benchmarks"
+    )
+    parser.add_argument("output_bag", help="Directory of the bag to create")
+    parser.add_argument(
+        "--duration",
+        help=f"Length of the run in seconds (default: {DEFAULT_DURATION})",
+        type=float,
+        default=DEFAULT_DURATION,
+    )
+    parser.add_argument(
+        "--reference_bag",
+        help="Recorded bag to take the message types of our own packages from",
+        default=None,
+    )
+    parser.add_argument("--seed", help="Random seed (default: 0)", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_bag(args.output_bag, args.duration, args.reference_bag, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Upper bounds (seconds) of the latency histogram buckets, from 1 µs to 10 s.
+LATENCY_BUCKETS = tuple(
+    factor * 10.0**exponent for exponent in range(-6, 1) for factor in (1, 2.5, 5)
+) + (10.0,)
+MESSAGE_STAGES = ("read", "deserialize", "extract")  # per topic
+WRITE_STAGE = "write"  # per table, one observation per flushed batch
+MERGE_STAGE = "merge"  # per table, one observation per bulk-load merge
+DEFAULT_EXPORT_INTERVAL = 5.0  # seconds
+ERROR_LOG_INTERVAL = 10.0  # seconds between two reports of the same kind of error
+EXPORT_FORMATS = {".prom": "prometheus", ".json": "json", ".jsonl": "json"}
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, as exposed by Prometheus."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class ErrorLog:
+    """
+    Aggregates errors by kind and prints each kind at most once per interval.
+
+    The first error of a kind is printed right away; repeats within the interval
+    are only counted and reported with the next line printed for that kind.
+    """
+
+    def __init__(self, interval=ERROR_LOG_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.suppressed = Counter()
+        self.last_printed = {}
+        self.lock = threading.Lock()
+
+    def report(self, kind, message):
+        """
+        Counts one error and prints it unless its kind was printed recently.
+
+        :param kind: Tuple identifying the kind of error, e.g. (stage, topic,
+            exception class name).
+        :param message: The line to print.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.counts[kind] += 1
+            last = self.last_printed.get(kind)
+            if last is not None and now - last < self.interval:
+                self.suppressed[kind] += 1
+                return
+            self.last_printed[kind] = now
+            suppressed = self.suppressed.pop(kind, 0)
+        if suppressed:
+            message += f" ({suppressed} more since the last report)"
+        print(message)
+
+    def total(self):
+        return sum(self.counts.values())
+
+
+class IngestMetrics:
+    """
+    Counters and latency histograms of one ingestion.
+
+    Every message is timed through the read, deserialize and extract stages of
+    its topic, and every batch flush through the write stage of its table. The
+    metrics can be written periodically to a Prometheus textfile (.prom) or
+    appended as JSON lines (.json/.jsonl) while the load runs, and are printed as
+    a summary at the end. Safe to share between threads.
+    """
+
+    def __init__(self, export_path=None, export_interval=DEFAULT_EXPORT_INTERVAL):
+        if export_path is not None:
+            extension = os.path.splitext(export_path)[1]
+            if extension not in EXPORT_FORMATS:
+                raise ValueError(
+                    f"Unknown metrics file type {export_path}: use {', '.join(EXPORT_FORMATS)}"
+                )
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.started = time.monotonic()
+        self.last_export = self.started
+        self.histograms = {}
+        self.messages = Counter()
+        self.rows = Counter()
+        self.write_seconds = 0.0
+        self.errors = ErrorLog()
+        self.lock = threading.Lock()
+
+    def get_histogram(self, stage, name):
+        key = (stage, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        return histogram
+
+    def observe_stage(self, stage, topic, seconds):
+        """Records the time (seconds) one message of a topic spent in one stage."""
+        with self.lock:
+            self.get_histogram(stage, topic).observe(seconds)
+            if stage == MESSAGE_STAGES[-1]:
+                self.messages[topic] += 1
+
+    def observe_message(self, topic, read, deserialize, extract):
+        """Records the time (seconds) one message of a topic spent in every stage."""
+        with self.lock:
+            self.messages[topic] += 1
+            for stage, seconds in zip(MESSAGE_STAGES, (read, deserialize, extract)):
+                self.get_histogram(stage, topic).observe(seconds)
+
+    def observe_write(self, table, rows, seconds):
+        """Records one batch of rows written to a table and how long the flush took."""
+        with self.lock:
+            self.rows[table] += rows
+            self.write_seconds += seconds
+            self.get_histogram(WRITE_STAGE, table).observe(seconds)
+
+    def maybe_export(self):
+        """Writes the metrics file if export_interval has passed since the last write."""
+        if self.export_path is None:
+            return
+        now = time.monotonic()
+        if now - self.last_export >= self.export_interval:
+            self.last_export = now
+            self.export()
+
+    def export(self):
+        if self.export_path is None:
+            return
+        try:
+            if EXPORT_FORMATS[os.path.splitext(self.export_path)[1]] == "prometheus":
+                # The textfile collector may read at any time, so replace the file whole.
+                with open(self.export_path + ".tmp", "w") as f:
+                    f.write(self.to_prometheus())
+                os.replace(self.export_path + ".tmp", self.export_path)
+            else:
+                with open(self.export_path, "a") as f:
+                    f.write(json.dumps(self.snapshot()) + "\n")
+        except OSError as e:
+            self.errors.report(
+                ("metrics", self.export_path, type(e).__name__),
+                f"Warning: Could not write metrics to {self.export_path}: {e}",
+            )
+
+    def snapshot(self):
+        """Returns the current metrics as a JSON-serializable dict."""
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            rows = sum(self.rows.values())
+            return {
+                "time": time.time(),
+                "elapsed_s": elapsed,
+                "messages": dict(self.messages),
+                "rows": dict(self.rows),
+                "rows_per_sec": rows / elapsed if elapsed else 0.0,
+                "stages": {
+                    f"{stage}:{name}": {
+                        "count": histogram.count,
+                        "sum_s": histogram.sum,
+                        "p50_s": histogram.quantile(0.5),
+                        "p99_s": histogram.quantile(0.99),
+                    }
+                    for (stage, name), histogram in self.histograms.items()
+                },
+                "errors": {
+                    ":".join(map(str, kind)): count
+                    for kind, count in self.errors.counts.items()
+                },
+            }
+
+    def to_prometheus(self):
+        """Formats the metrics in the Prometheus text exposition format."""
+        lines = ["# TYPE fs_ingest_stage_seconds histogram"]
+        with self.lock:
+            for (stage, name), histogram in sorted(self.histograms.items()):
+                label_name = "topic" if stage in MESSAGE_STAGES else "table"
+                labels = f'stage="{stage}",{label_name}="{name}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'fs_ingest_stage_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'fs_ingest_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}'
+                )
+                lines.append(f"fs_ingest_stage_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"fs_ingest_stage_seconds_count{{{labels}}} {histogram.count}")
+
+            lines.append("# TYPE fs_ingest_messages_total counter")
+            for topic, count in sorted(self.messages.items()):
+                lines.append(f'fs_ingest_messages_total{{topic="{topic}"}} {count}')
+            lines.append("# TYPE fs_ingest_rows_total counter")
+            for table, count in sorted(self.rows.items()):
+                lines.append(f'fs_ingest_rows_total{{table="{table}"}} {count}')
+        lines.append("# TYPE fs_ingest_errors_total counter")
+        lines.append(f"fs_ingest_errors_total {self.errors.total()}")
+        return "\n".join(lines) + "\n"
+
+    def print_summary(self):
+        """Prints message and row rates, stage latencies and error counts."""
+        self.export()
+        snapshot = self.snapshot()
+        elapsed = snapshot["elapsed_s"]
+        messages = sum(snapshot["messages"].values())
+        rows = sum(snapshot["rows"].values())
+        print(
+            f"Ingestion summary after {elapsed:.1f} s: {messages} messages ({messages / elapsed if elapsed else 0:.0f}/s), "
+            f"{rows} rows ({snapshot['rows_per_sec']:.0f}/s)"
+        )
+        print(f"  {'stage':<12} {'topic / table':<48} {'count':>9} {'total s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for key, stage in sorted(snapshot["stages"].items()):
+            stage_name, name = key.split(":", 1)
+            print(
+                f"  {stage_name:<12} {name:<48} {stage['count']:>9} {stage['sum_s']:>9.2f} "
+                f"{stage['p50_s'] * 1000:>8.3f} {stage['p99_s'] * 1000:>8.3f}"
+            )
+        for kind, count in sorted(snapshot["errors"].items()):
+            print(f"  {count} errors: {kind}")
@@ -1,24 +1,211 @@
-from runs_loading import insert_run
+from runs_loading import prepare_run
+from sinks import get_sink, DEFAULT_SINK
 from message_dispatcher import process_rosbag
+from batch_writer import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+from pipeline import process_rosbag_pipelined, DEFAULT_DECODE_WORKERS
+from ingest_metrics import IngestMetrics
+from follow_loading import follow_rosbag, DEFAULT_POLL_INTERVAL, DEFAULT_IDLE_TIMEOUT
+from parallel_loading import find_bags, ingest_bags, ingest_bag_partitioned
 import argparse
+import asyncio
+import sys
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="Read rosbag and populate TimescaleDB tables"
     )
-    parser.add_argument("input", help="Path to input rosbag file")
+    parser.add_argument(
+        "input",
+        help="Path to input rosbag file, a directory of bags, or a glob pattern (quoted)",
+    )
     parser.add_argument(
         "--slam_type", help="Specify SLAM type (default: None)", default=None
     )
     parser.add_argument("--doc_url", help="Documentation URL (optional)", default=None)
+    parser.add_argument(
+        "--batch_size",
+        help=f"Rows buffered per table before writing (default: {DEFAULT_BATCH_SIZE})",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--flush_interval",
+        help=f"Seconds between forced flushes (default: {DEFAULT_FLUSH_INTERVAL})",
+        type=float,
+        default=DEFAULT_FLUSH_INTERVAL,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Worker processes when loading several bags (default: number of CPUs)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--partitions",
+        help="Split a single bag into this many time ranges loaded in parallel (default: 1)",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--backend",
+        help="sync: psycopg2 writes; async: pipelined asyncio writes for remote databases (default: sync)",
+        choices=["sync", "async"],
+        default="sync",
+    )
+    parser.add_argument(
+        "--pipeline",
+        help="Run reading, decoding and writing as concurrent stages and report each stage",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--decode_workers",
+        help=f"Decode/extract processes in --pipeline mode (default: {DEFAULT_DECODE_WORKERS})",
+        type=int,
+        default=DEFAULT_DECODE_WORKERS,
+    )
+    parser.add_argument(
+        "--sink",
+        help=f"Where to load: postgres, a .db/.sqlite file for a local load without a server, or null to discard the rows (default: {DEFAULT_SINK})",
+        default=DEFAULT_SINK,
+    )
+    parser.add_argument(
+        "--metrics_file",
+        help="Write ingestion metrics while loading to a Prometheus textfile (.prom) or JSON lines (.jsonl)",
+        default=None,
+    )
+    parser.add_argument(
+        "--bulk",
+        help="Load new runs through temporary staging tables merged once at the end (PostgreSQL only)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--follow",
+        help="Load a bag that is still being recorded (an .mcap file or rosbag2 directory) until recording stops",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--poll_interval",
+        help=f"Seconds between reads of the growing bag in --follow mode (default: {DEFAULT_POLL_INTERVAL})",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+    )
+    parser.add_argument(
+        "--idle_timeout",
+        help=f"Seconds without new data after which --follow stops (default: {DEFAULT_IDLE_TIMEOUT})",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+    )
 
     args = parser.parse_args()
+    sink = get_sink(args.sink)
+
+    if not sink.concurrent_writers:
+        if args.pipeline or args.partitions > 1 or args.workers not in (None, 1):
+            print(f"Warning: {args.sink} takes one writer at a time, loading serially.")
+        args.pipeline, args.partitions, args.workers = False, 1, 1
+    if args.backend == "async" and args.sink != DEFAULT_SINK:
+        print("Error: The async backend only writes to PostgreSQL.")
+        return
+    if args.bulk:
+        if args.sink != DEFAULT_SINK or args.backend == "async" or args.follow:
+            print("Warning: --bulk only applies to sync PostgreSQL loads of finished bags, ignoring it.")
+        else:
+            sink.bulk = True
+
+    if args.follow:
+        if args.backend == "async" or args.pipeline or args.partitions > 1:
+            print("Warning: --follow loads serially with the sync backend.")
+        follow_rosbag(
+            args.input,
+            args.slam_type,
+            args.doc_url,
+            args.batch_size,
+            args.flush_interval,
+            args.poll_interval,
+            args.idle_timeout,
+            sink,
+            IngestMetrics(args.metrics_file),
+        )
+        return
+
+    bags = find_bags(args.input)
+    if not bags:
+        print(f"Error: No rosbag found at {args.input}.")
+        return
+
+    if args.metrics_file and (len(bags) > 1 or args.partitions > 1):
+        print("Warning: --metrics_file is only written for a single bag loaded in one process.")
+    metrics = IngestMetrics(args.metrics_file)
+
+    if len(bags) > 1:
+        if args.backend == "async" or args.pipeline or args.partitions > 1:
+            print("Warning: Several bags are loaded serially with the sync backend, one per worker.")
+        _, failures = ingest_bags(
+            bags,
+            args.workers,
+            args.slam_type,
+            args.doc_url,
+            args.batch_size,
+            args.flush_interval,
+            sink,
+        )
+        if failures:
+            sys.exit(1)
+        return
+
+    run_id, checkpoints, completed = prepare_run(
+        sink, bags[0], args.slam_type, args.doc_url
+    )
+
+    if run_id is not None and not completed:
+        # Only the serial and async loads skip what the checkpoints of an interrupted load cover.
+        if checkpoints and (args.pipeline or args.partitions > 1):
+            print(f"Warning: Resuming run {run_id} serially from its checkpoints.")
+            args.backend, args.pipeline, args.partitions = "sync", False, 1
 
-    run_id = insert_run(args.input, args.slam_type, args.doc_url)
+        if args.backend == "async":
+            from async_loading import process_rosbag_async
 
-    if run_id is not None:
-        process_rosbag(args.input, run_id)
+            stats = asyncio.run(
+                process_rosbag_async(
+                    bags[0],
+                    run_id,
+                    args.batch_size,
+                    checkpoints=checkpoints,
+                    metrics=metrics,
+                )
+            )
+        elif args.pipeline:
+            stats = process_rosbag_pipelined(
+                bags[0],
+                run_id,
+                args.batch_size,
+                args.flush_interval,
+                args.decode_workers,
+                sink=sink,
+                metrics=metrics,
+            )
+        elif args.partitions > 1:
+            stats = ingest_bag_partitioned(
+                bags[0],
+                run_id,
+                args.partitions,
+                args.batch_size,
+                args.flush_interval,
+                sink,
+            )
+        else:
+            stats = process_rosbag(
+                bags[0],
+                run_id,
+                args.batch_size,
+                args.flush_interval,
+                checkpoints=checkpoints,
+                sink=sink,
+                metrics=metrics,
+            )
+        sink.complete_run(run_id, stats["end_time"])
 
 
 if __name__ == "__main__":
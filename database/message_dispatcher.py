@@ -1,47 +1,79 @@
-from perception_loading import load_perception_data
-from state_est_loading import (
-    load_state_estimation_pred_corr_data,
-    load_state_estimation_state_data,
-)
-from planning_loading import load_planning_data
-from control_loading import load_control_metrics_data, load_control_data
-from sensor_loading import load_sensor_data
-from imu_loading import load_imu_data
-
-TOPIC_TO_LOADER = {
-    "/perception/execution_time": load_perception_data,
-    "/perception/cones": load_perception_data,
-    "/state_estimation/execution_time/correction_step": load_state_estimation_pred_corr_data,
-    "/state_estimation/execution_time/prediction_step": load_state_estimation_pred_corr_data,
-    "/state_estimation/vehicle_state": load_state_estimation_state_data,
-    "/path_planning/execution_time": load_planning_data,
-    "/path_planning/yellow_cones": load_planning_data,
-    "/path_planning/blue_cones": load_planning_data,
-    "/path_planning/after_rem_yellow_cones": load_planning_data,
-    "/path_planning/after_rem_blue_cones": load_planning_data,
-    "/control/evaluator_data": load_control_metrics_data,
-    "/as_msgs/controls": load_control_data,
-    "/vehicle/rl_rpm": load_sensor_data,
-    "/vehicle/rr_rpm": load_sensor_data,
-    "/vehicle/bosch_steering_angle": load_sensor_data,
-    "/imu/acceleration": load_imu_data,
-    "/imu/angular_velocity": load_imu_data,
-    "/filter/euler": load_imu_data,
-    "/filter/quaternion": load_imu_data,
-}
-
-
-def process_rosbag(input_bag, run_id):
+import time
+from batch_writer import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+from cdr_fast_path import build_fast_decoder
+from ingest_metrics import IngestMetrics
+from topic_registry import REGISTRY, compile_loader, get_fast_path_field
+from sinks import get_sink
+
+DEFAULT_CHECKPOINT_INTERVAL = 10.0  # seconds
+
+
+def resolve_topic(topic, type_name, sink):
     """
-    Reads messages from the rosbag and routes them to the correct loader.
+    Resolves the message class, fast-path decoder and loader of a mapped topic.
 
-    :param input_bag: Path to the rosbag file.
-    :param run_id: The run ID associated with the data.
+    :param topic: The topic name.
+    :param type_name: The message type, e.g. "std_msgs/msg/Float64".
+    :param sink: The Sink that resolves metric IDs.
+    :return: A (message class, fast decoder or None, loader) tuple, or None if the
+        topic is not in the registry or its message type is not installed.
     """
-    from rosbag2_py import SequentialReader, StorageOptions, ConverterOptions
-    from rclpy.serialization import deserialize_message
     from rosidl_runtime_py.utilities import get_message
 
+    spec = REGISTRY.get(topic)
+    if spec is None:
+        return None
+    try:
+        msg_type = get_message(type_name)
+    except Exception as e:
+        print(f"Warning: Skipping topic {topic} ({type_name}): {e}")
+        return None
+    fast_decoder = None
+    field = get_fast_path_field(spec)
+    if field is not None:
+        fast_decoder = build_fast_decoder(msg_type, field)
+    metric_id = sink.get_metric_id(spec.metric) if spec.metric else None
+    return msg_type, fast_decoder, compile_loader(spec, metric_id)
+
+
+def build_dispatch_table(reader, sink):
+    """
+    Resolves the message class, fast-path decoder and loader of every mapped topic
+    present in the bag.
+
+    Loaders are compiled from the topic registry with their metric IDs resolved,
+    and message packages are only imported for the topics the bag actually contains.
+
+    :param reader: An open rosbag2_py reader.
+    :param sink: The Sink that resolves metric IDs.
+    :return: Dict mapping topic name to a (message class, fast decoder or None,
+        loader) tuple.
+    """
+    dispatch = {}
+    for topic_type in reader.get_all_topics_and_types():
+        entry = resolve_topic(topic_type.name, topic_type.type, sink)
+        if entry is not None:
+            dispatch[topic_type.name] = entry
+    return dispatch
+
+
+def open_bag(input_bag, start_time=None, sink=None):
+    """
+    Opens a bag so that only the mapped topics it contains are read from storage.
+
+    :param input_bag: Path to the rosbag file.
+    :param start_time: Timestamp (ns) to seek to before reading, if any.
+    :param sink: The Sink that resolves metric IDs (default: PostgreSQL).
+    :return: Tuple of (reader, dispatch table from build_dispatch_table); the
+        reader is None if none of the mapped topics are present.
+    """
+    from rosbag2_py import (
+        SequentialReader,
+        StorageOptions,
+        ConverterOptions,
+        StorageFilter,
+    )
+
     reader = SequentialReader()
     reader.open(
         StorageOptions(uri=input_bag, storage_id="mcap"),
@@ -50,20 +82,129 @@ def process_rosbag(input_bag, run_id):
         ),
     )
 
-    topic_types = reader.get_all_topics_and_types()
+    dispatch = build_dispatch_table(reader, sink or get_sink())
+    if not dispatch:
+        # An empty StorageFilter means "no filter", so stop before reading anything.
+        print(f"Warning: None of the mapped topics are present in {input_bag}.")
+        return None, dispatch
 
-    def get_msg_type(topic_name):
-        for topic_type in topic_types:
-            if topic_type.name == topic_name:
-                return topic_type.type
-        return None
+    reader.set_filter(StorageFilter(topics=list(dispatch)))
+    if start_time is not None:
+        reader.seek(start_time)
+    return reader, dispatch
 
-    while reader.has_next():
-        topic, data, timestamp = reader.read_next()
-        if topic in TOPIC_TO_LOADER:
+
+def process_rosbag(
+    input_bag,
+    run_id,
+    batch_size=DEFAULT_BATCH_SIZE,
+    flush_interval=DEFAULT_FLUSH_INTERVAL,
+    start_time=None,
+    end_time=None,
+    checkpoints=None,
+    checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+    sink=None,
+    metrics=None,
+):
+    """
+    Reads messages from the rosbag and routes them to the correct loader.
+
+    Only topics in the registry are read from storage, and their message types
+    and loaders are resolved once when the bag is opened. The run is written in a
+    transaction that is committed every checkpoint_interval seconds together
+    with the last loaded timestamp of every topic, so an interrupted load can resume
+    from there: messages at or before a topic's checkpoint are skipped undecoded.
+    Every message is timed per stage in metrics, and a summary is printed at the end.
+
+    :param input_bag: Path to the rosbag file.
+    :param run_id: The run ID associated with the data.
+    :param batch_size: Rows buffered per table before they are written.
+    :param flush_interval: Seconds after which all buffered rows are written.
+    :param start_time: Only load messages at or after this timestamp (ns).
+    :param end_time: Only load messages before this timestamp (ns).
+    :param checkpoints: Dict mapping topic to the last timestamp (ns) already
+        loaded by an earlier, interrupted load of this run.
+    :param checkpoint_interval: Seconds between checkpoint commits, or None to
+        commit once at the end without checkpoints (e.g. for partial time ranges).
+    :param sink: The Sink the rows are written to (default: PostgreSQL).
+    :param metrics: The IngestMetrics to record into (default: new ones).
+    :return: Dict with the number of messages read and the first and last
+        message timestamps in nanoseconds.
+    """
+    from rclpy.serialization import deserialize_message
+
+    metrics = metrics or IngestMetrics()
+    clock = time.perf_counter
+
+    message_count = 0
+    first_timestamp = last_timestamp = None
+
+    sink = sink or get_sink()
+    reader, dispatch = open_bag(input_bag, start_time, sink)
+    if reader is None:
+        return {"messages": 0, "start_time": None, "end_time": None}
+
+    checkpoints = dict(checkpoints or {})
+    if checkpoints and all(topic in checkpoints for topic in dispatch):
+        reader.seek(min(checkpoints[topic] for topic in dispatch))
+    high_water = {}
+    last_checkpoint = time.monotonic()
+
+    with sink.open_writer(batch_size, flush_interval, metrics) as writer:
+        while reader.has_next():
+            read_started = clock()
+            topic, data, timestamp = reader.read_next()
+            read_done = clock()
+            if end_time is not None and timestamp >= end_time:
+                break
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            last_timestamp = timestamp
+            message_count += 1
+            if timestamp <= checkpoints.get(topic, -1):
+                continue
+
+            if (
+                checkpoint_interval is not None
+                and time.monotonic() - last_checkpoint >= checkpoint_interval
+            ):
+                writer.checkpoint(run_id, high_water)
+                last_checkpoint = time.monotonic()
+
+            high_water[topic] = timestamp
+            msg_type, fast_decoder, loader = dispatch[topic]
+            decode_started = clock()
             try:
-                msg_type = get_message(get_msg_type(topic))
-                msg = deserialize_message(data, msg_type)
-                TOPIC_TO_LOADER[topic](run_id, topic, msg, timestamp)
+                msg = fast_decoder(data) if fast_decoder else None
+                if msg is None:
+                    msg = deserialize_message(data, msg_type)
+                decoded = clock()
+                # Batches flushed by this row are timed as writes, not extraction.
+                write_seconds = metrics.write_seconds
+                loader(writer, run_id, topic, msg, timestamp)
+                extracted = clock() - (metrics.write_seconds - write_seconds)
             except Exception as e:
-                print(f"Error processing topic {topic} at {timestamp}: {e}")
+                metrics.errors.report(
+                    ("process", topic, type(e).__name__),
+                    f"Error processing topic {topic} at {timestamp}: {e}",
+                )
+                continue
+            metrics.observe_message(
+                topic,
+                read_done - read_started,
+                decoded - decode_started,
+                extracted - decoded,
+            )
+            metrics.maybe_export()
+
+        if checkpoint_interval is not None:
+            writer.checkpoint(run_id, high_water)
+        else:
+            writer.flush()
+
+    metrics.print_summary()
+    return {
+        "messages": message_count,
+        "start_time": first_timestamp,
+        "end_time": last_timestamp,
+    }
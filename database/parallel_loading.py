@@ -0,0 +1,249 @@
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from runs_loading import prepare_run, read_mcap_summaries
+from message_dispatcher import process_rosbag
+from sinks import get_sink
+from batch_writer import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+
+
+def find_bags(input_path):
+    """
+    Expands a bag file, a directory of bags or a glob pattern into a list of bags.
+
+    A directory holding a rosbag2 metadata.yaml is a single bag; any other directory
+    is searched recursively for .mcap files.
+    """
+    if os.path.isdir(input_path):
+        if os.path.exists(os.path.join(input_path, "metadata.yaml")):
+            return [input_path]
+        return sorted(
+            glob.glob(os.path.join(input_path, "**", "*.mcap"), recursive=True)
+        )
+    if os.path.exists(input_path):
+        return [input_path]
+    return sorted(glob.glob(input_path))
+
+
+def ingest_bag(
+    input_bag,
+    slam_type=None,
+    doc_url=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    flush_interval=DEFAULT_FLUSH_INTERVAL,
+    sink=None,
+):
+    """
+    Creates a run for one bag, or resumes its interrupted run, and loads its data.
+
+    Runs inside a worker process, which keeps its own connection pool. Bags that
+    are already completely loaded are skipped.
+
+    :param sink: The Sink the bag is loaded into (default: PostgreSQL).
+    :return: Dict with the bag, its run_id, the number of messages and the elapsed seconds.
+    """
+    started = time.monotonic()
+    sink = sink or get_sink()
+    run_id, checkpoints, completed = prepare_run(sink, input_bag, slam_type, doc_url)
+    if run_id is None:
+        raise RuntimeError("Could not create a run for the bag")
+    if completed:
+        return {"bag": input_bag, "run_id": run_id, "messages": 0, "elapsed": 0.0}
+
+    stats = process_rosbag(
+        input_bag,
+        run_id,
+        batch_size,
+        flush_interval,
+        checkpoints=checkpoints,
+        sink=sink,
+    )
+    sink.complete_run(run_id, stats["end_time"])
+    return {
+        "bag": input_bag,
+        "run_id": run_id,
+        "messages": stats["messages"],
+        "elapsed": time.monotonic() - started,
+    }
+
+
+def ingest_bags(
+    bags,
+    workers=None,
+    slam_type=None,
+    doc_url=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    flush_interval=DEFAULT_FLUSH_INTERVAL,
+    sink=None,
+):
+    """
+    Loads several bags at once across a process pool, one run per bag.
+
+    A failing bag is reported and does not stop the others.
+
+    :param bags: Paths of the bags to load.
+    :param workers: Number of worker processes (default: number of CPUs).
+    :param sink: The Sink the bags are loaded into (default: PostgreSQL); it is
+        pickled into every worker.
+    :return: Tuple of (results of the loaded bags, list of (bag, error) failures).
+    """
+    results = []
+    failures = []
+    started = time.monotonic()
+
+    # spawn gives every worker a clean interpreter instead of a copy of our state.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(
+                ingest_bag,
+                bag,
+                slam_type,
+                doc_url,
+                batch_size,
+                flush_interval,
+                sink,
+            ): bag
+            for bag in bags
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            bag = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failures.append((bag, e))
+                print(f"[{done}/{len(bags)}] Failed to load {bag}: {e}")
+                continue
+            results.append(result)
+            print(
+                f"[{done}/{len(bags)}] Loaded {bag} as run {result['run_id']}: "
+                f"{result['messages']} messages in {result['elapsed']:.1f} s"
+            )
+
+    print_report(results, failures, time.monotonic() - started)
+    return results, failures
+
+
+def print_report(results, failures, elapsed):
+    """Prints the combined progress and throughput of a multi-bag load."""
+    messages = sum(result["messages"] for result in results)
+    print(f"Loaded {len(results)} of {len(results) + len(failures)} bags in {elapsed:.1f} s")
+    print(
+        f"Total: {messages} messages, {messages / elapsed if elapsed else 0:.0f} msgs/s overall"
+    )
+    for result in sorted(results, key=lambda result: result["bag"]):
+        rate = result["messages"] / result["elapsed"] if result["elapsed"] else 0
+        print(
+            f"  run {result['run_id']}: {result['bag']} ({result['messages']} messages, {rate:.0f} msgs/s)"
+        )
+    for bag, error in failures:
+        print(f"  FAILED: {bag}: {error}")
+
+
+def get_partition_bounds(input_bag, partitions):
+    """
+    Splits a bag into time ranges that hold roughly the same amount of data.
+
+    Boundaries are placed on MCAP chunk start times, over every file of a split
+    bag, so that each range covers a group of whole chunks of similar uncompressed
+    size. Bags without chunk indexes are split into equal time ranges.
+
+    :return: List of [start, end) timestamp pairs in nanoseconds, with the first
+        start and last end left open as None, or None if the bag has no summary.
+    """
+    summaries = read_mcap_summaries(input_bag)
+    if summaries is None:
+        return None
+
+    chunks = sorted(
+        (chunk for summary in summaries for chunk in summary.chunk_indexes),
+        key=lambda chunk: chunk.message_start_time,
+    )
+    if len(chunks) >= partitions:
+        total_size = sum(chunk.uncompressed_size for chunk in chunks)
+        boundaries = []
+        size = 0
+        for chunk in chunks:
+            if size >= total_size * (len(boundaries) + 1) / partitions:
+                boundaries.append(chunk.message_start_time)
+            size += chunk.uncompressed_size
+    else:
+        start = min(summary.statistics.message_start_time for summary in summaries)
+        duration = (
+            max(summary.statistics.message_end_time for summary in summaries) - start
+        )
+        boundaries = [start + duration * i // partitions for i in range(1, partitions)]
+
+    boundaries = sorted(set(boundaries))
+    return list(zip([None] + boundaries, boundaries + [None]))
+
+
+def ingest_bag_partitioned(
+    input_bag,
+    run_id,
+    partitions,
+    batch_size=DEFAULT_BATCH_SIZE,
+    flush_interval=DEFAULT_FLUSH_INTERVAL,
+    sink=None,
+):
+    """
+    Loads one bag with a process per time range, all under the same run_id.
+
+    The ranges do not overlap, so partitions never write the same (time, run_id)
+    key; each one commits its own transaction. Partitions do not checkpoint, so an
+    interrupted partitioned load is redone in full on the same run, where the
+    ON CONFLICT clauses make it idempotent. Bags without a summary are loaded
+    serially.
+
+    :param input_bag: Path to the rosbag file.
+    :param run_id: The run ID associated with the data.
+    :param partitions: Number of time ranges, and of worker processes.
+    :param sink: The Sink the bag is loaded into (default: PostgreSQL).
+    :return: Dict with the number of messages read and the first and last
+        message timestamps in nanoseconds, as returned by process_rosbag.
+    """
+    bounds = get_partition_bounds(input_bag, partitions)
+    if bounds is None or len(bounds) < 2:
+        print("Warning: Cannot partition this bag, loading it in a single process.")
+        return process_rosbag(input_bag, run_id, batch_size, flush_interval, sink=sink)
+
+    stats = []
+    failures = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(bounds), mp_context=context) as executor:
+        futures = {
+            executor.submit(
+                process_rosbag,
+                input_bag,
+                run_id,
+                batch_size,
+                flush_interval,
+                start_time,
+                end_time,
+                None,
+                None,
+                sink,
+            ): (start_time, end_time)
+            for start_time, end_time in bounds
+        }
+        for future in as_completed(futures):
+            try:
+                stats.append(future.result())
+            except Exception as e:
+                failures.append((futures[future], e))
+                print(f"Failed to load partition {futures[future]} of {input_bag}: {e}")
+
+    if failures:
+        raise RuntimeError(
+            f"{len(failures)} of {len(bounds)} partitions of {input_bag} failed"
+        )
+
+    start_times = [stat["start_time"] for stat in stats if stat["start_time"]]
+    end_times = [stat["end_time"] for stat in stats if stat["end_time"]]
+    return {
+        "messages": sum(stat["messages"] for stat in stats),
+        "start_time": min(start_times) if start_times else None,
+        "end_time": max(end_times) if end_times else None,
+    }
@@ -0,0 +1,336 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from batch_writer import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+from ingest_metrics import IngestMetrics
+from message_dispatcher import open_bag, resolve_topic
+from sinks import get_sink
+
+DEFAULT_DECODE_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 64  # batches per queue
+READ_BATCH_SIZE = 256  # messages handed from the reader to a decode worker at once
+REPORT_INTERVAL = 5.0  # seconds
+
+_STOP = None
+
+# Dispatch table and run_id of a decode worker process, set by init_decode_worker.
+_decoder = {}
+
+
+class StageStats:
+    """Counts the items a pipeline stage handled and the time it spent busy."""
+
+    def __init__(self, name, input_queues=()):
+        self.name = name
+        self.input_queues = list(input_queues)
+        self.items = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, items, busy):
+        with self.lock:
+            self.items += items
+            self.busy += busy
+
+    def queue_depth(self):
+        return sum(q.qsize() for q in self.input_queues)
+
+    def queue_capacity(self):
+        return sum(q.maxsize for q in self.input_queues)
+
+    def report(self, elapsed):
+        rate = self.items / elapsed if elapsed else 0
+        line = f"  {self.name:<32} {self.items:>10} items {rate:>10.0f}/s  busy {self.busy:>7.1f} s"
+        if self.input_queues:
+            line += f"  queue {self.queue_depth()}/{self.queue_capacity()}"
+        return line
+
+
+class RowCollector:
+    """Writer stand-in for the loaders in a decode worker: groups rows per table."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, table, row):
+        self.rows.setdefault(table, []).append(row)
+
+
+def init_decode_worker(topic_types, run_id, sink):
+    """
+    Resolves the message classes, fast decoders and loaders of the bag's topics
+    in a decode worker process.
+
+    :param topic_types: Dict mapping each mapped topic to its message type name.
+    """
+    dispatch = {}
+    for topic, type_name in topic_types.items():
+        entry = resolve_topic(topic, type_name, sink)
+        if entry is not None:
+            dispatch[topic] = entry
+    _decoder.update(dispatch=dispatch, run_id=run_id)
+
+
+def decode_batch(batch):
+    """
+    Decodes a batch of messages in a decode worker process and extracts their rows.
+
+    :param batch: List of (topic, serialized data, timestamp) in bag order.
+    :return: Tuple of (dict mapping table to its rows in bag order, list of
+        (topic, deserialize seconds, extract seconds) of the decoded messages,
+        list of (error kind, error message) of the failed ones, busy seconds).
+    """
+    from rclpy.serialization import deserialize_message
+
+    clock = time.perf_counter
+    started = clock()
+    dispatch, run_id = _decoder["dispatch"], _decoder["run_id"]
+    collector = RowCollector()
+    timings = []
+    errors = []
+    for topic, data, timestamp in batch:
+        decode_started = clock()
+        try:
+            msg_type, fast_decoder, loader = dispatch[topic]
+            msg = fast_decoder(data) if fast_decoder else None
+            if msg is None:
+                msg = deserialize_message(data, msg_type)
+            decoded = clock()
+            loader(collector, run_id, topic, msg, timestamp)
+        except Exception as e:
+            errors.append(
+                (
+                    ("process", topic, type(e).__name__),
+                    f"Error processing topic {topic} at {timestamp}: {e}",
+                )
+            )
+            continue
+        timings.append((topic, decoded - decode_started, clock() - decoded))
+    return collector.rows, timings, errors, clock() - started
+
+
+class WriterStage:
+    """One writer thread per destination table, each with its own sink writer."""
+
+    def __init__(self, sink, batch_size, flush_interval, queue_size, metrics):
+        self.sink = sink
+        self.metrics = metrics
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.queues = {}
+        self.threads = []
+        self.stats = {}
+        self.errors = []
+        self.lock = threading.Lock()
+
+    def get_queue(self, table):
+        """Returns the queue of a table's writer, starting the writer on first use."""
+        table_queue = self.queues.get(table)
+        if table_queue is not None:
+            return table_queue
+        with self.lock:
+            if table not in self.queues:
+                table_queue = queue.Queue(self.queue_size)
+                self.stats[table] = StageStats(f"write {table}", [table_queue])
+                thread = threading.Thread(
+                    target=self._run, args=(table, table_queue), daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+                self.queues[table] = table_queue
+            return self.queues[table]
+
+    def _run(self, table, table_queue):
+        stats = self.stats[table]
+        failed = False
+        try:
+            with self.sink.open_writer(
+                self.batch_size, self.flush_interval, self.metrics
+            ) as writer:
+                while True:
+                    rows = table_queue.get()
+                    if rows is _STOP:
+                        break
+                    started = time.monotonic()
+                    for row in rows:
+                        writer.add(table, row)
+                    stats.record(len(rows), time.monotonic() - started)
+        except Exception as e:
+            failed = True
+            self.errors.append((table, e))
+            print(f"Writer for {table} failed: {e}")
+
+        # Keep draining so that the decode workers never block on a dead writer.
+        while failed and table_queue.get() is not _STOP:
+            pass
+
+    def stop(self):
+        for table_queue in list(self.queues.values()):
+            table_queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+
+def process_rosbag_pipelined(
+    input_bag,
+    run_id,
+    batch_size=DEFAULT_BATCH_SIZE,
+    flush_interval=DEFAULT_FLUSH_INTERVAL,
+    decode_workers=DEFAULT_DECODE_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    sink=None,
+    metrics=None,
+):
+    """
+    Loads a bag through reader, decode and per-table writer stages running concurrently.
+
+    The reader hands batches of raw messages to a pool of decode worker processes,
+    so that decoding, which holds the GIL, runs in parallel. Decoded batches are
+    collected in the order they were read, so every table's writer receives its
+    rows in bag order and the last-wins ON CONFLICT DO UPDATE tables keep the
+    same row as a serial load. The stages are connected by bounded queues, so a
+    slow stage holds back the ones before it instead of letting memory grow.
+    Every REPORT_INTERVAL seconds, and once at the end, each stage's throughput,
+    busy time and input queue depth are printed; the stage with a full input
+    queue is the bottleneck.
+
+    :param input_bag: Path to the rosbag file.
+    :param run_id: The run ID associated with the data.
+    :param batch_size: Rows buffered per table before they are written.
+    :param flush_interval: Seconds after which all buffered rows are written.
+    :param decode_workers: Number of decode/extract worker processes.
+    :param queue_size: Capacity of each queue, in batches.
+    :param sink: The Sink the rows are written to (default: PostgreSQL); it must
+        allow concurrent writers, and is pickled into every decode worker.
+    :param metrics: The IngestMetrics every stage records into (default: new ones).
+    :return: Dict with the number of messages read and the first and last
+        message timestamps in nanoseconds, as returned by process_rosbag.
+    """
+    sink = sink or get_sink()
+    metrics = metrics or IngestMetrics()
+    clock = time.perf_counter
+    reader, dispatch = open_bag(input_bag, sink=sink)
+    if reader is None:
+        return {"messages": 0, "start_time": None, "end_time": None}
+    topic_types = {
+        topic_type.name: topic_type.type
+        for topic_type in reader.get_all_topics_and_types()
+        if topic_type.name in dispatch
+    }
+
+    # Futures of the batches handed to the decode workers, in the order they were read.
+    decode_queue = queue.Queue(queue_size)
+    writers = WriterStage(sink, batch_size, flush_interval, queue_size, metrics)
+    read_stats = StageStats("read")
+    decode_stats = StageStats("decode/extract", [decode_queue])
+    result = {"messages": 0, "start_time": None, "end_time": None}
+    reader_errors = []
+    decode_errors = []
+
+    # spawn gives every worker a clean interpreter instead of a copy of our threads.
+    executor = ProcessPoolExecutor(
+        max_workers=decode_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_decode_worker,
+        initargs=(topic_types, run_id, sink),
+    )
+
+    def read():
+        batch = []
+        started = time.monotonic()
+        try:
+            while reader.has_next():
+                read_started = clock()
+                message = reader.read_next()
+                metrics.observe_stage("read", message[0], clock() - read_started)
+                if result["start_time"] is None:
+                    result["start_time"] = message[2]
+                result["end_time"] = message[2]
+                batch.append(message)
+                if len(batch) >= READ_BATCH_SIZE:
+                    read_stats.record(len(batch), time.monotonic() - started)
+                    decode_queue.put(executor.submit(decode_batch, batch))
+                    batch = []
+                    started = time.monotonic()
+            if batch:
+                read_stats.record(len(batch), time.monotonic() - started)
+                decode_queue.put(executor.submit(decode_batch, batch))
+        except Exception as e:
+            reader_errors.append(e)
+            print(f"Reading {input_bag} failed: {e}")
+        finally:
+            result["messages"] = read_stats.items
+            decode_queue.put(_STOP)
+
+    def collect():
+        while True:
+            future = decode_queue.get()
+            if future is _STOP:
+                return
+            try:
+                rows, timings, errors, busy = future.result()
+            except Exception as e:
+                # A batch lost as a whole (e.g. a dead worker) fails the load.
+                if not decode_errors:
+                    print(f"Decoding a batch of {input_bag} failed: {e}")
+                decode_errors.append(e)
+                continue
+            for topic, deserialize, extract in timings:
+                metrics.observe_stage("deserialize", topic, deserialize)
+                metrics.observe_stage("extract", topic, extract)
+            for kind, message in errors:
+                metrics.errors.report(kind, message)
+            decode_stats.record(len(timings) + len(errors), busy)
+            for table, table_rows in rows.items():
+                writers.get_queue(table).put(table_rows)
+
+    def all_stats():
+        with writers.lock:
+            return [read_stats, decode_stats] + list(writers.stats.values())
+
+    started = time.monotonic()
+    done = threading.Event()
+
+    def monitor():
+        while not done.wait(REPORT_INTERVAL):
+            print_stage_report(all_stats(), time.monotonic() - started)
+            metrics.export()
+
+    threads = [
+        threading.Thread(target=read, daemon=True),
+        threading.Thread(target=collect, daemon=True),
+    ]
+    monitor_thread = threading.Thread(target=monitor, daemon=True)
+    monitor_thread.start()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        executor.shutdown(cancel_futures=True)
+    writers.stop()
+    done.set()
+    monitor_thread.join()
+
+    print_stage_report(all_stats(), time.monotonic() - started)
+    metrics.print_summary()
+    if reader_errors:
+        raise reader_errors[0]
+    if decode_errors:
+        raise decode_errors[0]
+    if writers.errors:
+        raise RuntimeError(
+            f"Writers failed for: {', '.join(table for table, _ in writers.errors)}"
+        )
+    return result
+
+
+def print_stage_report(stats, elapsed):
+    """Prints throughput, busy time and input queue depth of every stage."""
+    print(f"Pipeline after {elapsed:.1f} s:")
+    for stage in stats:
+        print(stage.report(elapsed))
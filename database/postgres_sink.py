@@ -0,0 +1,527 @@
+import io
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from connecting_db import (
+    db_connection,
+    run_transaction,
+    autocommit_connection,
+    savepoint,
+)
+from batch_writer import BatchWriter, build_bulk_merge_query
+from ingest_metrics import MERGE_STAGE
+from run_summary import SUMMARY_COLUMNS, SeriesStats, get_series_name
+from topic_registry import TABLE_COLUMNS
+from trajectory_index import TrajectoryIndex, TRAJECTORY_TABLE, TRAJECTORY_COLUMNS
+from query_db import build_select_query, iter_column_chunks
+from sinks import Sink
+
+# Continuous aggregates refreshed over a run once it is loaded; each 1-minute
+# aggregate is built on its 1-second one, so those come first.
+CONTINUOUS_AGGREGATES = [
+    "perception_values_1s",
+    "state_estimation_pred_corr_values_1s",
+    "planning_values_1s",
+    "control_metrics_1s",
+    "perception_values_1m",
+    "state_estimation_pred_corr_values_1m",
+    "planning_values_1m",
+    "control_metrics_1m",
+]
+
+
+def to_datetime(timestamp):
+    """Converts a nanosecond timestamp to a TIMESTAMPTZ value; None stays None."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp / 1e9, tz=timezone.utc)
+
+
+def from_datetime(value):
+    """Converts a TIMESTAMPTZ value back to a nanosecond timestamp; None stays None."""
+    if value is None:
+        return None
+    return int(value.timestamp()) * 10**9 + value.microsecond * 1000
+
+
+CHECKPOINTS_QUERY = """
+    INSERT INTO run_checkpoints (run_id, topic, last_time)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (run_id, topic) DO UPDATE
+    SET last_time = GREATEST(run_checkpoints.last_time, EXCLUDED.last_time)
+"""
+
+# Statements that merge one series into run_summary: create its row if needed,
+# lock and read it, then store the merged statistics.
+SUMMARY_CREATE_QUERY = """
+    INSERT INTO run_summary (run_id, table_name, series, row_count, value_count, sketch)
+    VALUES (%s, %s, %s, 0, 0, '{"positive": {}, "negative": {}, "zero": 0}')
+    ON CONFLICT (run_id, table_name, series) DO NOTHING
+"""
+SUMMARY_SELECT_QUERY = f"""
+    SELECT {', '.join(SUMMARY_COLUMNS)} FROM run_summary
+    WHERE run_id = %s AND table_name = %s AND series = %s
+    FOR UPDATE
+"""
+SUMMARY_UPDATE_QUERY = f"""
+    UPDATE run_summary SET {', '.join(f"{column} = %s" for column in SUMMARY_COLUMNS)}
+    WHERE run_id = %s AND table_name = %s AND series = %s
+"""
+
+
+def save_checkpoints(conn, run_id, checkpoints):
+    """
+    Records per-topic high-water marks in the caller's transaction.
+
+    Commit them together with the rows they cover, so that a checkpoint never
+    points past data that was lost.
+
+    :param conn: The connection holding the ingestion transaction.
+    :param run_id: The run ID the checkpoints belong to.
+    :param checkpoints: Dict mapping topic to its last loaded timestamp (ns).
+    """
+    if not checkpoints:
+        return
+    with conn.cursor() as cur:
+        cur.executemany(
+            CHECKPOINTS_QUERY,
+            [(run_id, topic, last_time) for topic, last_time in checkpoints.items()],
+        )
+
+
+def merge_stored_summary(stats, stored):
+    """
+    Merges the stored run_summary row of a series into its statistics.
+
+    :param stats: The SeriesStats gathered since the last save.
+    :param stored: The row read with SUMMARY_SELECT_QUERY.
+    :return: The SUMMARY_COLUMNS values to store with SUMMARY_UPDATE_QUERY.
+    """
+    stored = list(stored)
+    stored[2], stored[3] = from_datetime(stored[2]), from_datetime(stored[3])
+    stats.merge(SeriesStats.from_row(stored))
+    row = list(stats.to_row())
+    row[2], row[3] = to_datetime(row[2]), to_datetime(row[3])
+    return row
+
+
+def save_run_summary(conn, series):
+    """
+    Merges series statistics into run_summary in the caller's transaction.
+
+    Each row is created empty if needed and then locked, so that writers loading
+    parts of the same run (pipeline stages, partitions) merge their statistics
+    instead of overwriting each other's. Rows are locked in key order to avoid
+    deadlocks between them.
+
+    :param series: Dict of RunSummary series key to SeriesStats, from RunSummary.take().
+    """
+    if not series:
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT metric_id, metric_name FROM metrics")
+        metric_names = dict(cur.fetchall())
+        for (run_id, table, metric_id, column), stats in sorted(
+            series.items(), key=lambda item: item[0]
+        ):
+            key = (run_id, table, get_series_name(metric_id, column, metric_names))
+            cur.execute(SUMMARY_CREATE_QUERY, key)
+            cur.execute(SUMMARY_SELECT_QUERY, key)
+            row = merge_stored_summary(stats, cur.fetchone())
+            cur.execute(SUMMARY_UPDATE_QUERY, row + list(key))
+
+
+def save_trajectory_index(conn, run_id, visits, crossings):
+    """
+    Replaces the trajectory visits and lap crossings of a run in the caller's
+    transaction.
+
+    :param visits: List of (cell_x, cell_y, start_time, end_time), from
+        TrajectoryIndex.finish().
+    :param crossings: List of crossing times, from TrajectoryIndex.finish().
+    """
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM trajectory_cells WHERE run_id = %s", (run_id,))
+        cur.execute("DELETE FROM lap_crossings WHERE run_id = %s", (run_id,))
+        execute_values(
+            cur,
+            """
+            INSERT INTO trajectory_cells (run_id, cell_x, cell_y, start_time, end_time)
+            VALUES %s ON CONFLICT DO NOTHING
+        """,
+            [
+                (run_id, cell_x, cell_y, to_datetime(start_time), to_datetime(end_time))
+                for cell_x, cell_y, start_time, end_time in visits
+            ],
+        )
+        execute_values(
+            cur,
+            "INSERT INTO lap_crossings (run_id, time) VALUES %s ON CONFLICT DO NOTHING",
+            [(run_id, to_datetime(time)) for time in crossings],
+        )
+
+
+def index_trajectory(conn, run_id):
+    """
+    Builds the trajectory index of a loaded run, in the caller's transaction.
+
+    The run's poses are read back ordered by time, so the index does not depend
+    on the order in which batches were written (pipeline, partitioned and async
+    loads write them out of order).
+
+    :param conn: The connection whose transaction the index is written in.
+    :param run_id: The run ID whose trajectory is indexed.
+    """
+    index = TrajectoryIndex()
+    query, params = build_select_query(
+        TRAJECTORY_TABLE, TRAJECTORY_COLUMNS, None, None, None
+    )
+    for chunk in iter_column_chunks(
+        conn, query, [run_id] + params, ("time",) + TRAJECTORY_COLUMNS
+    ):
+        # Time is read in microseconds.
+        index.add(chunk["time"] * 1000, chunk["x"], chunk["y"], chunk["theta"])
+    save_trajectory_index(conn, run_id, *index.finish())
+
+
+def refresh_run_aggregates(run_id):
+    """
+    Materializes the continuous aggregates over the time range of a run.
+
+    The refresh policies would get there on their next run; doing it right away
+    means the overview views serve a freshly loaded run from the aggregates. The
+    range is widened to whole minutes so that no bucket of the run is left out.
+
+    :param run_id: The run ID whose time range is refreshed.
+    """
+    try:
+        with autocommit_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT date_trunc('minute', start_time),
+                       date_trunc('minute', end_time) + INTERVAL '1 minute'
+                FROM runs WHERE run_id = %s
+            """,
+                (run_id,),
+            )
+            start_time, end_time = cur.fetchone()
+            if end_time is None:
+                return
+            for aggregate in CONTINUOUS_AGGREGATES:
+                cur.execute(
+                    "CALL refresh_continuous_aggregate(%s, %s, %s)",
+                    (aggregate, start_time, end_time),
+                )
+    except Exception as e:
+        print(f"Warning: Could not refresh the aggregates of run {run_id}: {e}")
+
+
+def compress_run_chunks(run_id):
+    """
+    Compresses the hypertable chunks of a completely loaded run.
+
+    Chunks are only compressed once no incomplete run overlaps them, so that no
+    load, resume or row-by-row fallback writes into a compressed chunk; such
+    chunks are compressed when the last run overlapping them completes.
+
+    :param run_id: The run ID whose chunks are compressed.
+    """
+    try:
+        with autocommit_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT format('%%I.%%I', c.chunk_schema, c.chunk_name)
+                FROM timescaledb_information.chunks c
+                JOIN timescaledb_information.hypertables h
+                  ON h.hypertable_schema = c.hypertable_schema
+                 AND h.hypertable_name = c.hypertable_name
+                JOIN runs r ON r.run_id = %s
+                WHERE h.compression_enabled AND NOT c.is_compressed
+                  AND c.hypertable_schema = current_schema()
+                  AND c.range_start <= COALESCE(r.end_time, r.start_time)
+                  AND c.range_end > r.start_time
+                  AND NOT EXISTS (
+                      SELECT 1 FROM runs o
+                      WHERE NOT o.completed
+                        AND c.range_end > o.start_time
+                        AND (o.end_time IS NULL OR c.range_start <= o.end_time)
+                  )
+            """,
+                (run_id,),
+            )
+            for (chunk,) in cur.fetchall():
+                cur.execute("SELECT compress_chunk(%s, if_not_compressed => TRUE)", (chunk,))
+    except Exception as e:
+        print(f"Warning: Could not compress the chunks of run {run_id}: {e}")
+
+
+def delete_run(run_id):
+    """
+    Deletes a run with its rows in every table that references it, e.g. a run
+    loaded for a benchmark.
+
+    The continuous aggregates are refreshed over the run's time range before the
+    run itself is deleted, so that they drop its buckets as well.
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            # Every table with a foreign key to runs, leaving out hypertable chunks.
+            cur.execute(
+                """
+                SELECT c.relname FROM pg_constraint f
+                JOIN pg_class c ON c.oid = f.conrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE f.contype = 'f' AND f.confrelid = 'runs'::regclass
+                  AND n.nspname = current_schema()
+            """
+            )
+            for table in sorted({row[0] for row in cur.fetchall()}):
+                cur.execute(f"DELETE FROM {table} WHERE run_id = %s", (run_id,))
+        conn.commit()
+    refresh_run_aggregates(run_id)
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM runs WHERE run_id = %s", (run_id,))
+        conn.commit()
+
+
+class PostgresWriter(BatchWriter):
+    """BatchWriter that also commits checkpoints of the load it writes."""
+
+    def checkpoint(self, run_id, checkpoints):
+        """
+        Writes the buffered rows and commits them together with the checkpoints
+        and the run_summary statistics of those rows.
+        """
+        self.flush()
+        save_checkpoints(self.conn, run_id, checkpoints)
+        self.save_summary()
+        self.conn.commit()
+
+    def save_summary(self):
+        save_run_summary(self.conn, self.summary.take())
+
+
+class BulkWriter(PostgresWriter):
+    """
+    Writer for new runs that leaves index and constraint maintenance to the end.
+
+    Batches are copied into temporary staging tables without indexes or foreign
+    keys, so loading writes neither WAL nor B-tree entries. When the writer
+    closes, each staging table is deduplicated and merged into its hypertable
+    with one INSERT ... SELECT, and the primary keys, foreign keys and ON CONFLICT
+    clauses are applied then, all in one transaction with the checkpoints.
+    Staging tables are dropped by the merge, or when the load fails; being
+    temporary, they also go with the session if the process is killed.
+    """
+
+    def __init__(self, conn, batch_size, flush_interval, metrics=None):
+        super().__init__(conn, batch_size, flush_interval, metrics)
+        self.bulk_tables = {}
+        self.run_id = None
+        self.checkpoints = {}
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.flush()
+                self.save_summary()
+                self.merge()
+        finally:
+            if exc_type is not None:
+                self.conn.rollback()
+            self.drop_bulk_tables()
+
+    def get_bulk_table(self, table):
+        """Creates, once per writer, the temporary staging table of a table."""
+        if table not in self.bulk_tables:
+            bulk_table = f"bulk_{table}_{uuid.uuid4().hex[:8]}"
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    f"CREATE TEMP TABLE {bulk_table} (LIKE {table} INCLUDING DEFAULTS)"
+                )
+                cur.execute(f"ALTER TABLE {bulk_table} ADD COLUMN bulk_seq BIGSERIAL")
+            self.bulk_tables[table] = bulk_table
+        return self.bulk_tables[table]
+
+    def write_batch(self, table, buffer):
+        """
+        Copies a batch into the staging table. A failing batch is staged row by
+        row, keeping its place in the bulk_seq order that the merge resolves
+        conflicts by.
+        """
+        arrays = buffer.to_arrays()
+        bulk_table = self.get_bulk_table(table)
+        columns = ", ".join(TABLE_COLUMNS[table][0] + TABLE_COLUMNS[table][1])
+        try:
+            with savepoint(self.conn), self.conn.cursor() as cur:
+                cur.copy_expert(
+                    f"COPY {bulk_table} ({columns}) FROM STDIN",
+                    io.StringIO(buffer.to_copy_text(arrays)),
+                )
+            return len(arrays[0]), []
+        except Exception as e:
+            self.metrics.errors.report(
+                ("bulk copy", table, type(e).__name__),
+                f"Bulk copy error for {table}, staging {len(arrays[0])} rows one by one: {e}",
+            )
+            return self._insert_one_by_one(
+                table,
+                buffer.to_rows(arrays),
+                f"INSERT INTO {bulk_table} ({columns}) VALUES %s",
+            )
+
+    def checkpoint(self, run_id, checkpoints):
+        """
+        Commits the staged rows; the checkpoints and run statistics are only saved
+        with the merge, since until then they would cover rows that are not in the
+        hypertables.
+        """
+        self.flush()
+        self.run_id = run_id
+        self.checkpoints.update(checkpoints)
+        self.conn.commit()
+
+    def merge(self):
+        """Merges every staging table into its hypertable and commits with the checkpoints."""
+        with self.conn.cursor() as cur:
+            for table, bulk_table in self.bulk_tables.items():
+                started = time.perf_counter()
+                cur.execute(build_bulk_merge_query(table, bulk_table))
+                cur.execute(f"DROP TABLE {bulk_table}")
+                self.metrics.observe_stage(
+                    MERGE_STAGE, table, time.perf_counter() - started
+                )
+        self.bulk_tables = {}
+        if self.run_id is not None:
+            save_checkpoints(self.conn, self.run_id, self.checkpoints)
+        self.conn.commit()
+
+    def drop_bulk_tables(self):
+        """Drops the staging tables left behind by a failed load."""
+        if not self.bulk_tables:
+            return
+        try:
+            with self.conn.cursor() as cur:
+                for bulk_table in self.bulk_tables.values():
+                    cur.execute(f"DROP TABLE IF EXISTS {bulk_table}")
+            self.conn.commit()
+        except Exception as e:
+            print(f"Warning: Could not drop the bulk staging tables: {e}")
+        self.bulk_tables = {}
+
+
+class PostgresSink(Sink):
+    """
+    Loads into the TimescaleDB database of connecting_db.DB_CONFIG.
+
+    With bulk, rows go through a BulkWriter. It pays off for runs loaded from
+    scratch; resumed loads stay correct, since the merge keeps the ON CONFLICT clauses.
+    """
+
+    def __init__(self, bulk=False):
+        self.bulk = bulk
+        # Metric name -> metric_id, filled as metrics are first looked up.
+        self.metric_ids = {}
+
+    def find_run(self, fingerprint):
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT run_id, completed FROM runs WHERE bag_fingerprint = %s",
+                (fingerprint,),
+            )
+            return cur.fetchone()
+
+    def insert_run(self, run):
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO runs (run_name, start_time, end_time, slam_type, rosbag_path, run_type, doc_url, bag_fingerprint)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING run_id
+            """,
+                (
+                    run["run_name"],
+                    to_datetime(run["start_time"]),
+                    to_datetime(run["end_time"]),
+                    run["slam_type"],
+                    run["rosbag_path"],
+                    run["run_type"],
+                    run["doc_url"],
+                    run["bag_fingerprint"],
+                ),
+            )
+            run_id = cur.fetchone()[0]
+            conn.commit()
+        return run_id
+
+    def load_checkpoints(self, run_id):
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT topic, last_time FROM run_checkpoints WHERE run_id = %s",
+                (run_id,),
+            )
+            return dict(cur.fetchall())
+
+    def complete_run(self, run_id, end_time, fingerprint=None):
+        """
+        Also indexes the run's trajectory in the same transaction, so a run whose
+        indexing fails stays incomplete and is indexed when resumed, then refreshes
+        the continuous aggregates over the run and compresses its chunks.
+        """
+        with db_connection() as conn, conn.cursor() as cur:
+            index_trajectory(conn, run_id)
+            cur.execute(
+                """
+                UPDATE runs SET end_time = COALESCE(end_time, %s), completed = TRUE,
+                    bag_fingerprint = COALESCE(%s, bag_fingerprint)
+                WHERE run_id = %s
+            """,
+                (to_datetime(end_time), fingerprint, run_id),
+            )
+            conn.commit()
+        refresh_run_aggregates(run_id)
+        compress_run_chunks(run_id)
+
+    def reset_run_summary(self, run_id):
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM run_summary WHERE run_id = %s", (run_id,))
+            conn.commit()
+
+    def get_metric_id(self, metric_name):
+        """Each name is looked up in the database only once per sink."""
+        metric_id = self.metric_ids.get(metric_name)
+        if metric_id is not None:
+            return metric_id
+
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO metrics (metric_name) VALUES (%s)
+                ON CONFLICT (metric_name) DO NOTHING
+                RETURNING metric_id
+            """,
+                (metric_name,),
+            )
+            row = cur.fetchone()
+            if row is None:
+                cur.execute(
+                    "SELECT metric_id FROM metrics WHERE metric_name = %s",
+                    (metric_name,),
+                )
+                row = cur.fetchone()
+            conn.commit()
+
+        self.metric_ids[metric_name] = row[0]
+        return row[0]
+
+    @contextmanager
+    def open_writer(self, batch_size, flush_interval, metrics=None):
+        """Writes through one pooled connection and one transaction per checkpoint."""
+        writer_class = BulkWriter if self.bulk else PostgresWriter
+        with run_transaction() as conn, writer_class(
+            conn, batch_size, flush_interval, metrics
+        ) as writer:
+            yield writer
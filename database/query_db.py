@@ -0,0 +1,556 @@
+import os
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+from connecting_db import db_connection
+from topic_registry import TABLE_COLUMNS
+from trajectory_index import TRAJECTORY_TABLE, get_cell_range
+
+FETCH_SIZE = 50000  # rows per round trip of the server-side cursor
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+DEFAULT_DISK_CACHE_BYTES = 4 * 1024 * 1024 * 1024
+# Seconds of rows read around a time range, so that its first and last grid
+# points have samples to align to.
+ALIGN_LOOKBACK = 1.0
+AREA_VISIT_GAP = 1.0  # seconds between two visits of an area that are joined into one
+
+
+class RunCache:
+    """
+    Size-bounded LRU cache of query results, in memory and optionally on disk.
+
+    Only results of completely loaded runs are stored, since those never change.
+    Each result is a dict of NumPy arrays; its size is the sum of their nbytes.
+    Keys start with the run key of get_run_key(), which the cache also keeps per
+    run_id.
+    """
+
+    def __init__(
+        self,
+        max_bytes=DEFAULT_CACHE_BYTES,
+        cache_dir=None,
+        max_disk_bytes=DEFAULT_DISK_CACHE_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.run_keys = {}
+        self.lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key):
+        """Returns the cached arrays of a key, or None."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        path = self.get_path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except Exception as e:
+            print(f"Warning: Could not read cache file {path}: {e}")
+            return None
+        os.utime(path)
+        self.put_memory(key, arrays)
+        return arrays
+
+    def put(self, key, arrays):
+        """Stores the arrays of a key in memory and, if configured, on disk."""
+        self.put_memory(key, arrays)
+        path = self.get_path(key)
+        if path is None:
+            return
+        try:
+            with open(path + ".tmp", "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            print(f"Warning: Could not write cache file {path}: {e}")
+            return
+        self.evict_disk()
+
+    def put_memory(self, key, arrays):
+        # Results are shared between callers, so they must not be modified in place.
+        for array in arrays.values():
+            array.flags.writeable = False
+        size = sum(array.nbytes for array in arrays.values())
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                replaced = self.entries.pop(key)
+                self.size -= sum(array.nbytes for array in replaced.values())
+            self.entries[key] = arrays
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sum(array.nbytes for array in evicted.values())
+
+    def get_path(self, key):
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.npz")
+
+    def evict_disk(self):
+        """Deletes the least recently used cache files above max_disk_bytes."""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npz"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Empties the in-memory cache; files on disk are kept."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.run_keys.clear()
+
+
+_cache = RunCache()
+
+
+def configure_cache(
+    max_bytes=DEFAULT_CACHE_BYTES,
+    cache_dir=None,
+    max_disk_bytes=DEFAULT_DISK_CACHE_BYTES,
+):
+    """
+    Replaces the cache shared by the fetch functions.
+
+    :param max_bytes: Memory budget of the cache.
+    :param cache_dir: Directory for the on-disk cache, or None to keep results
+        in memory only.
+    :param max_disk_bytes: Disk budget of the cache directory.
+    """
+    global _cache
+    _cache = RunCache(max_bytes, cache_dir, max_disk_bytes)
+    return _cache
+
+
+def resolve_table(table):
+    """Maps a table or compatibility view name (e.g. "perception") to its table."""
+    if table in TABLE_COLUMNS:
+        return table
+    if f"{table}_values" in TABLE_COLUMNS:
+        return f"{table}_values"
+    raise ValueError(f"Unknown table {table}")
+
+
+def to_timestamp(value):
+    """Converts a nanosecond timestamp to a UTC datetime; other values pass through."""
+    if isinstance(value, (int, np.integer)):
+        return datetime.fromtimestamp(value / 1e9, tz=timezone.utc)
+    return value
+
+
+def build_select_query(table, columns, metric, start_time, end_time):
+    """
+    Builds the SELECT of one run's rows, ordered by time.
+
+    Time is returned as integer microseconds since the epoch so that it converts
+    to datetime64 without a Python datetime per row.
+    """
+    select = ["(EXTRACT(EPOCH FROM time) * 1000000)::BIGINT"] + list(columns)
+    query = f"SELECT {', '.join(select)} FROM {table} WHERE run_id = %s"
+    params = []
+    if metric is not None:
+        query += " AND metric_id = (SELECT metric_id FROM metrics WHERE metric_name = %s)"
+        params.append(metric)
+    if start_time is not None:
+        query += " AND time >= %s"
+        params.append(to_timestamp(start_time))
+    if end_time is not None:
+        query += " AND time < %s"
+        params.append(to_timestamp(end_time))
+    return query + " ORDER BY time", params
+
+
+def column_dtype(name):
+    return np.int64 if name in ("time", "metric_id") else np.float64
+
+
+def iter_column_chunks(conn, query, params, names, fetch_size=FETCH_SIZE):
+    """
+    Runs a query through a server-side cursor and yields its rows in chunks.
+
+    Each chunk is a dict mapping column name to an array of at most fetch_size
+    values; "time" stays in integer microseconds. Only one chunk of Python
+    tuples is held in memory at once.
+    """
+    with conn.cursor(name=f"fetch_{uuid.uuid4().hex}") as cur:
+        cur.itersize = fetch_size
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield {
+                name: np.array(values, dtype=column_dtype(name))
+                for name, values in zip(names, zip(*rows))
+            }
+
+
+def stream_columns(conn, query, params, names):
+    """Runs a query through a server-side cursor and returns its columns as arrays."""
+    chunks = {name: [] for name in names}
+    for chunk in iter_column_chunks(conn, query, params, names):
+        for name, values in chunk.items():
+            chunks[name].append(values)
+
+    arrays = {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=column_dtype(name))
+        for name, parts in chunks.items()
+    }
+    arrays["time"] = arrays["time"].astype("datetime64[us]")
+    return arrays
+
+
+def get_run_key(run_id):
+    """
+    Returns what identifies a completely loaded run in cache keys, or None if the
+    run is not completely loaded.
+
+    run_ids start again at 1 when the database is recreated, so the key also holds
+    the run's bag fingerprint and start time; a cache directory kept across
+    databases then never serves the arrays of another run. Completed runs never
+    change, so their key is looked up once per cache.
+    """
+    run_key = _cache.run_keys.get(run_id)
+    if run_key is not None:
+        return run_key
+    with db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT bag_fingerprint, start_time, completed FROM runs WHERE run_id = %s",
+            (run_id,),
+        )
+        row = cur.fetchone()
+    if not row or not row[2]:
+        return None
+    run_key = (run_id, row[0], row[1].isoformat())
+    with _cache.lock:
+        _cache.run_keys[run_id] = run_key
+    return run_key
+
+
+def fetch_table(
+    run_id,
+    table,
+    columns=None,
+    metric=None,
+    start_time=None,
+    end_time=None,
+    use_cache=True,
+):
+    """
+    Fetches the rows of one table of a run into NumPy arrays.
+
+    :param run_id: The run ID to read.
+    :param table: Table name, or the name of its compatibility view (e.g. "planning").
+    :param columns: Value columns to read; all of them by default.
+    :param metric: For tables keyed by metric, only read this metric (e.g.
+        "execution_time"); the metric_id column is then left out.
+    :param start_time: Only rows at or after this time (ns or datetime).
+    :param end_time: Only rows before this time (ns or datetime).
+    :param use_cache: Whether to look up and store the result in the run cache.
+    :return: Dict mapping "time" (datetime64[us]) and every column to an array.
+    """
+    table = resolve_table(table)
+    keys, values = TABLE_COLUMNS[table]
+    if columns is None:
+        columns = values
+    unknown = set(columns) - set(values)
+    if unknown:
+        raise ValueError(f"Unknown columns of {table}: {', '.join(sorted(unknown))}")
+    if "metric_id" in keys and metric is None:
+        columns = ("metric_id",) + tuple(columns)
+
+    # Looked up before reading, so that a run completed meanwhile is not cached partially.
+    run_key = get_run_key(run_id) if use_cache else None
+    key = (run_key, table, tuple(columns), metric, start_time, end_time)
+    if run_key is not None:
+        arrays = _cache.get(key)
+        if arrays is not None:
+            return arrays
+
+    query, params = build_select_query(table, columns, metric, start_time, end_time)
+    with db_connection() as conn:
+        arrays = stream_columns(
+            conn, query, [run_id] + params, ("time",) + tuple(columns)
+        )
+
+    if run_key is not None:
+        _cache.put(key, arrays)
+    return arrays
+
+
+def fetch_run(run_id, tables=None, start_time=None, end_time=None, use_cache=True):
+    """
+    Fetches several tables of a run.
+
+    :param run_id: The run ID to read.
+    :param tables: Table names to read; every time-series table by default.
+    :return: Dict mapping table name to the arrays returned by fetch_table.
+    """
+    if tables is None:
+        tables = list(TABLE_COLUMNS)
+    return {
+        table: fetch_table(
+            run_id,
+            table,
+            start_time=start_time,
+            end_time=end_time,
+            use_cache=use_cache,
+        )
+        for table in tables
+    }
+
+
+def parse_column(name):
+    """
+    Splits a "table.column" name into (table, column, metric).
+
+    For tables keyed by metric the part after the dot is the metric, e.g.
+    "planning.execution_time" reads metric_value of the execution_time metric.
+    """
+    table, _, column = name.partition(".")
+    if not column:
+        raise ValueError(f"Column {name} must be given as table.column")
+    table = resolve_table(table)
+    keys, values = TABLE_COLUMNS[table]
+    if "metric_id" in keys:
+        return table, values[0], column
+    return table, column, None
+
+
+def to_microseconds(value):
+    """Converts a nanosecond timestamp or a datetime to integer microseconds."""
+    if isinstance(value, (int, np.integer)):
+        return int(value) // 1000
+    return round(value.timestamp() * 1e6)
+
+
+def align_asof(times, values, grid, tolerance):
+    """Takes the last sample at or before every grid time (NaN if none)."""
+    if not len(times):
+        return np.full(len(grid), np.nan)
+    before = np.searchsorted(times, grid, side="right") - 1
+    valid = before >= 0
+    if tolerance is not None:
+        valid &= grid - times[np.maximum(before, 0)] <= tolerance
+    return np.where(valid, values[np.maximum(before, 0)], np.nan)
+
+
+def align_linear(times, values, grid, tolerance):
+    """
+    Interpolates linearly between the samples around every grid time (NaN
+    outside the samples).
+    """
+    if not len(times):
+        return np.full(len(grid), np.nan)
+    aligned = np.interp(grid, times, values)
+    before = np.searchsorted(times, grid, side="right") - 1
+    after = np.searchsorted(times, grid, side="left")
+    valid = (before >= 0) & (after < len(times))
+    if tolerance is not None:
+        valid &= grid - times[np.maximum(before, 0)] <= tolerance
+        valid &= times[np.minimum(after, len(times) - 1)] - grid <= tolerance
+    aligned[~valid] = np.nan
+    return aligned
+
+
+ALIGN_METHODS = {"asof": align_asof, "linear": align_linear}
+
+
+def fetch_aligned(
+    run_id,
+    columns,
+    rate,
+    method="asof",
+    start_time=None,
+    end_time=None,
+    tolerance=None,
+    use_cache=True,
+):
+    """
+    Resamples columns of several tables of a run onto one common time grid.
+
+    Every table is read once through fetch_table and aligned to the grid with a
+    binary search over its sorted times, so topics published at different rates
+    and times can be compared row by row without joining on exact timestamps.
+    NaN samples are skipped, so a missing value never hides an earlier one.
+
+    :param run_id: The run ID to read.
+    :param columns: "table.column" names, e.g. ["control.throttle",
+        "imu_acceleration.x_acceleration"]; for tables keyed by metric, name the
+        metric instead of the column, e.g. "planning.execution_time".
+    :param rate: Rate of the grid in Hz.
+    :param method: "asof" for the last value at or before every grid time, or
+        "linear" to interpolate between the samples around it.
+    :param start_time: First grid time (ns or datetime); the earliest sample of
+        the columns by default.
+    :param end_time: End of the grid, exclusive (ns or datetime); the latest
+        sample of the columns by default.
+    :param tolerance: Seconds a sample may be away from a grid time before the
+        value becomes NaN; unlimited by default. With a time range, rows up to
+        tolerance (or ALIGN_LOOKBACK) seconds outside it are read as well.
+    :param use_cache: Whether to look up and store the result in the run cache.
+    :return: Dict mapping "time" (datetime64[us]) and every name in columns to an
+        array, one value per grid time; np.column_stack of the columns gives the
+        aligned matrix.
+    """
+    if method not in ALIGN_METHODS:
+        raise ValueError(f"Unknown alignment method {method}: use {', '.join(ALIGN_METHODS)}")
+    if rate <= 0:
+        raise ValueError(f"Rate must be positive, got {rate}")
+    columns = list(dict.fromkeys(columns))
+    parsed = {name: parse_column(name) for name in columns}
+
+    # Looked up before reading, so that a run completed meanwhile is not cached partially.
+    run_key = get_run_key(run_id) if use_cache else None
+    key = ("aligned", run_key, tuple(columns), rate, method, start_time, end_time, tolerance)
+    if run_key is not None:
+        arrays = _cache.get(key)
+        if arrays is not None:
+            return arrays
+
+    # Read every table (and metric) once, with all its requested columns.
+    requests = {}
+    for table, column, metric in parsed.values():
+        requests.setdefault((table, metric), []).append(column)
+    margin = round((tolerance or ALIGN_LOOKBACK) * 1e6)
+    fetched = {
+        (table, metric): fetch_table(
+            run_id,
+            table,
+            columns=tuple(dict.fromkeys(table_columns)),
+            metric=metric,
+            start_time=None if start_time is None else (to_microseconds(start_time) - margin) * 1000,
+            end_time=None if end_time is None else (to_microseconds(end_time) + margin) * 1000,
+            use_cache=use_cache,
+        )
+        for (table, metric), table_columns in requests.items()
+    }
+
+    series = {}
+    for name, (table, column, metric) in parsed.items():
+        arrays = fetched[(table, metric)]
+        finite = np.isfinite(arrays[column])
+        series[name] = (arrays["time"].astype(np.int64)[finite], arrays[column][finite])
+
+    starts = [times[0] for times, _ in series.values() if len(times)]
+    ends = [times[-1] for times, _ in series.values() if len(times)]
+    start = to_microseconds(start_time) if start_time is not None else min(starts, default=0)
+    if end_time is not None:
+        count = int(np.ceil((to_microseconds(end_time) - start) * rate / 1e6))
+    elif ends:
+        count = int((max(ends) - start) * rate // 1e6) + 1
+    else:
+        count = 0
+    grid = start + np.round(np.arange(max(count, 0)) * 1e6 / rate).astype(np.int64)
+
+    tolerance_us = None if tolerance is None else tolerance * 1e6
+    arrays = {"time": grid.astype("datetime64[us]")}
+    for name, (times, values) in series.items():
+        arrays[name] = ALIGN_METHODS[method](times, values, grid, tolerance_us)
+
+    if run_key is not None:
+        _cache.put(key, arrays)
+    return arrays
+
+
+def find_runs_in_area(x_min, y_min, x_max, y_max, run_ids=None):
+    """
+    Finds the runs whose trajectory passes through a rectangle of the map, and
+    when, from the trajectory grid built when the run was loaded.
+
+    The time ranges cover every grid cell overlapping the rectangle, so they may
+    start or end slightly outside it; fetch the rows of a range with fetch_table
+    and filter by x/y for the exact points.
+
+    :param run_ids: Only search these runs; all runs by default.
+    :return: Dict mapping run_id to a list of (start_time, end_time) datetimes,
+        end_time exclusive, one per pass through the rectangle.
+    """
+    cell_x_min, cell_x_max = get_cell_range(x_min, x_max)
+    cell_y_min, cell_y_max = get_cell_range(y_min, y_max)
+    query = """
+        SELECT run_id, start_time, end_time + INTERVAL '1 microsecond'
+        FROM trajectory_cells
+        WHERE cell_x BETWEEN %s AND %s AND cell_y BETWEEN %s AND %s
+    """
+    params = [cell_x_min, cell_x_max, cell_y_min, cell_y_max]
+    if run_ids is not None:
+        query += " AND run_id = ANY(%s)"
+        params.append(list(run_ids))
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query + " ORDER BY run_id, start_time", params)
+            rows = cur.fetchall()
+
+    runs = {}
+    for run_id, start_time, end_time in rows:
+        passes = runs.setdefault(run_id, [])
+        if passes and (start_time - passes[-1][1]).total_seconds() <= AREA_VISIT_GAP:
+            passes[-1] = (passes[-1][0], max(passes[-1][1], end_time))
+        else:
+            passes.append((start_time, end_time))
+    return runs
+
+
+def get_laps(run_id):
+    """
+    Returns the laps of a run, from the start/finish line crossings found while
+    loading.
+
+    :return: List of (lap, start_time, end_time, lap time in seconds).
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT lap, start_time, end_time, lap_time FROM run_laps WHERE run_id = %s ORDER BY lap",
+                (run_id,),
+            )
+            return cur.fetchall()
+
+
+def fetch_lap(run_id, lap, table=TRAJECTORY_TABLE, columns=None, metric=None, use_cache=True):
+    """
+    Fetches the rows of one table of a run that fall within one lap.
+
+    :param lap: Lap number, starting at 1.
+    :param table: Table name, or the name of its compatibility view.
+    :return: The arrays returned by fetch_table for the lap's time range.
+    """
+    laps = {number: (start_time, end_time) for number, start_time, end_time, _ in get_laps(run_id)}
+    if lap not in laps:
+        raise ValueError(f"Run {run_id} has no lap {lap} ({len(laps)} laps)")
+    start_time, end_time = laps[lap]
+    return fetch_table(run_id, table, columns, metric, start_time, end_time, use_cache)
+
+
+def to_dataframe(arrays):
+    """Wraps the arrays of a fetch in a pandas DataFrame indexed by time."""
+    import pandas as pd
+
+    return pd.DataFrame(arrays).set_index("time")
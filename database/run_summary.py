@@ -0,0 +1,255 @@
+import json
+import math
+import numpy as np
+from topic_registry import TABLE_COLUMNS
+
+SKETCH_ACCURACY = 0.01  # relative error of the quantiles
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+SKETCH_MIN_VALUE = 1e-9  # smaller magnitudes count as zero
+SUMMARY_QUANTILES = (0.5, 0.95, 0.99)
+
+# run_summary columns after the (run_id, table_name, series) key, in insert order.
+SUMMARY_COLUMNS = (
+    "row_count",
+    "value_count",
+    "first_time",
+    "last_time",
+    "rate_hz",
+    "min_value",
+    "max_value",
+    "mean_value",
+    "variance",
+    "p50",
+    "p95",
+    "p99",
+    "sketch",
+)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a bounded relative error (DDSketch).
+
+    Values are counted in logarithmic buckets, gamma wide, separately for
+    positive and negative values; any quantile is then within SKETCH_ACCURACY of
+    the exact value. Two sketches merge by adding their bucket counts, so a run's
+    sketch can be built from batches and from the partial loads of a run.
+    """
+
+    def __init__(self, positive=None, negative=None, zero=0):
+        self.positive = positive or {}
+        self.negative = negative or {}
+        self.zero = zero
+
+    def add(self, values):
+        """Counts an array of finite values."""
+        magnitudes = np.abs(values)
+        small = magnitudes < SKETCH_MIN_VALUE
+        self.zero += int(small.sum())
+        for buckets, mask in (
+            (self.positive, (values > 0) & ~small),
+            (self.negative, (values < 0) & ~small),
+        ):
+            if not mask.any():
+                continue
+            indexes = np.ceil(np.log(magnitudes[mask]) / math.log(SKETCH_GAMMA))
+            for index, count in zip(*np.unique(indexes.astype(np.int64), return_counts=True)):
+                buckets[int(index)] = buckets.get(int(index), 0) + int(count)
+
+    def merge(self, other):
+        for buckets, other_buckets in (
+            (self.positive, other.positive),
+            (self.negative, other.negative),
+        ):
+            for index, count in other_buckets.items():
+                buckets[index] = buckets.get(index, 0) + count
+        self.zero += other.zero
+
+    def quantile(self, q):
+        """Returns the approximate q-quantile, or None for an empty sketch."""
+        total = self.zero + sum(self.positive.values()) + sum(self.negative.values())
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        # From the most negative value up: negative buckets by decreasing magnitude.
+        for sign, buckets, indexes in (
+            (-1, self.negative, sorted(self.negative, reverse=True)),
+            (0, None, [None]),
+            (1, self.positive, sorted(self.positive)),
+        ):
+            for index in indexes:
+                seen += self.zero if buckets is None else buckets[index]
+                if seen > rank:
+                    if buckets is None:
+                        return 0.0
+                    return sign * 2 * SKETCH_GAMMA**index / (SKETCH_GAMMA + 1)
+
+    def to_json(self):
+        return json.dumps(
+            {"positive": self.positive, "negative": self.negative, "zero": self.zero}
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text) if isinstance(text, str) else text
+        return cls(
+            {int(index): count for index, count in data["positive"].items()},
+            {int(index): count for index, count in data["negative"].items()},
+            data["zero"],
+        )
+
+
+class SeriesStats:
+    """
+    Streaming statistics of one value column of one run: counts, time range,
+    min/max, mean and variance (merged with Chan et al.'s parallel formula) and
+    a quantile sketch. Non-finite values are counted as rows but not as values.
+    """
+
+    def __init__(self):
+        self.row_count = 0
+        self.value_count = 0
+        self.first_time = None
+        self.last_time = None
+        self.min_value = math.inf
+        self.max_value = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch()
+
+    def add(self, times, values):
+        """Adds one batch: int64 timestamps (ns) and float64 values."""
+        self.row_count += len(times)
+        self.first_time = min_or(self.first_time, int(times.min()))
+        self.last_time = max_or(self.last_time, int(times.max()))
+        values = values[np.isfinite(values)]
+        if len(values):
+            other = SeriesStats()
+            other.value_count = len(values)
+            other.min_value = float(values.min())
+            other.max_value = float(values.max())
+            other.mean = float(values.mean())
+            other.m2 = float(((values - other.mean) ** 2).sum())
+            self.merge_values(other)
+            self.sketch.add(values)
+
+    def merge(self, other):
+        self.row_count += other.row_count
+        self.first_time = min_or(self.first_time, other.first_time)
+        self.last_time = max_or(self.last_time, other.last_time)
+        self.merge_values(other)
+        self.sketch.merge(other.sketch)
+
+    def merge_values(self, other):
+        if not other.value_count:
+            return
+        count = self.value_count + other.value_count
+        delta = other.mean - self.mean
+        self.mean += delta * other.value_count / count
+        self.m2 += other.m2 + delta**2 * self.value_count * other.value_count / count
+        self.value_count = count
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+
+    def to_row(self):
+        """Returns the values of the SUMMARY_COLUMNS; times stay in nanoseconds."""
+        has_values = self.value_count > 0
+        duration = (self.last_time - self.first_time) / 1e9 if self.row_count else 0
+        return (
+            self.row_count,
+            self.value_count,
+            self.first_time,
+            self.last_time,
+            (self.row_count - 1) / duration if duration > 0 else None,
+            self.min_value if has_values else None,
+            self.max_value if has_values else None,
+            self.mean if has_values else None,
+            self.m2 / self.value_count if has_values else None,
+            *(self.sketch.quantile(q) for q in SUMMARY_QUANTILES),
+            self.sketch.to_json(),
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuilds the statistics from the values of the SUMMARY_COLUMNS."""
+        row = dict(zip(SUMMARY_COLUMNS, row))
+        stats = cls()
+        stats.row_count = row["row_count"]
+        stats.value_count = row["value_count"]
+        stats.first_time = row["first_time"]
+        stats.last_time = row["last_time"]
+        if stats.value_count:
+            stats.min_value = row["min_value"]
+            stats.max_value = row["max_value"]
+            stats.mean = row["mean_value"]
+            stats.m2 = row["variance"] * stats.value_count
+        stats.sketch = QuantileSketch.from_json(row["sketch"])
+        return stats
+
+
+def min_or(current, value):
+    if current is None or value is None:
+        return value if current is None else current
+    return min(current, value)
+
+
+def max_or(current, value):
+    if current is None or value is None:
+        return value if current is None else current
+    return max(current, value)
+
+
+class RunSummary:
+    """
+    Accumulates the statistics of every series a writer loads, one batch at a time.
+
+    A series is one value column of one run, per metric for the tables keyed by
+    metric_id. Batches are added as the NumPy columns of a TableBuffer, so the
+    statistics cost a few vectorized operations per batch, not per row. take()
+    hands over the statistics gathered since the last call, to be merged into
+    the run_summary table.
+    """
+
+    def __init__(self):
+        self.series = {}
+
+    def __bool__(self):
+        return bool(self.series)
+
+    def add_batch(self, table, columns):
+        """
+        Adds one batch of a table.
+
+        :param columns: NumPy arrays in TABLE_COLUMNS order, starting with the
+            int64 nanosecond timestamps.
+        """
+        keys, values = TABLE_COLUMNS[table]
+        times = columns[0]
+        groups = [keys.index("run_id")]
+        if "metric_id" in keys:
+            groups.append(keys.index("metric_id"))
+        group_keys, inverse = np.unique(
+            np.stack([columns[i] for i in groups], axis=1), axis=0, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+        for group, key in enumerate(group_keys):
+            mask = inverse == group if len(group_keys) > 1 else slice(None)
+            run_id = int(key[0])
+            metric_id = int(key[1]) if len(key) > 1 else None
+            for offset, column in enumerate(values):
+                series = (run_id, table, metric_id, column)
+                stats = self.series.get(series)
+                if stats is None:
+                    stats = self.series[series] = SeriesStats()
+                stats.add(times[mask], columns[len(keys) + offset][mask])
+
+    def take(self):
+        """Returns the series statistics gathered so far and starts over."""
+        series, self.series = self.series, {}
+        return series
+
+
+def get_series_name(metric_id, column, metric_names):
+    """Names a series by its metric for tables keyed by metric_id, else by its column."""
+    return column if metric_id is None else metric_names[metric_id]
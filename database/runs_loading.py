@@ -1,9 +1,11 @@
 import os
-from rclpy.serialization import deserialize_message
-from rosidl_runtime_py.utilities import get_message
-import rosbag2_py
+import re
+import glob
+import hashlib
 from datetime import datetime, timezone
-from connecting_db import get_db_connection
+from mcap.reader import make_reader
+from mcap.records import Message
+from mcap.stream_reader import StreamReader
 
 RUN_TYPE_MAPPING = {
     "Hard_Course": "Hard Course",
@@ -12,29 +14,132 @@ RUN_TYPE_MAPPING = {
     "Aceleration": "Acceleration",
 }
 
+# Bytes hashed from each end of the bag for its fingerprint. The tail holds the
+# MCAP summary and footer, which index every chunk by offset, size and CRC.
+FINGERPRINT_BLOCK_SIZE = 1024 * 1024
+# The split files of a rosbag2 directory end in _<n>.mcap.
+SPLIT_PATTERN = re.compile(r"_(\d+)\.mcap$")
 
-def get_rosbag_start_end_time(input_bag):
-    """Gets the first and last timestamp in the rosbag."""
-    reader = rosbag2_py.SequentialReader()
-    reader.open(
-        rosbag2_py.StorageOptions(uri=input_bag, storage_id="mcap"),
-        rosbag2_py.ConverterOptions(
-            input_serialization_format="cdr", output_serialization_format="cdr"
-        ),
-    )
 
-    start_time = None
-    last_timestamp = None
+def get_split_index(path):
+    match = SPLIT_PATTERN.search(path)
+    return int(match.group(1)) if match else 0
 
-    while reader.has_next():
-        _, _, timestamp = reader.read_next()
-        if start_time is None:
-            start_time = timestamp
-        last_timestamp = timestamp
 
-    return start_time / 1e9 if start_time else None, (
-        last_timestamp / 1e9 if last_timestamp else None
-    )
+def get_mcap_paths(input_bag):
+    """
+    Returns the .mcap files of a bag given either the file or its rosbag2
+    directory, whose split files are returned in split order.
+    """
+    if os.path.isdir(input_bag):
+        mcap_files = sorted(
+            glob.glob(os.path.join(input_bag, "*.mcap")), key=get_split_index
+        )
+        if not mcap_files:
+            raise FileNotFoundError(f"No .mcap file found in {input_bag}")
+        return mcap_files
+    return [input_bag]
+
+
+def get_mcap_path(input_bag):
+    """Returns the first .mcap file of a bag given either the file or its rosbag2 directory."""
+    return get_mcap_paths(input_bag)[0]
+
+
+def read_mcap_summaries(input_bag):
+    """
+    Reads the MCAP summary of every file of a bag.
+
+    Only the footer and summary section of each file are read, so the cost does
+    not depend on the bag size.
+
+    :return: List of summaries in split order, or None if a file has no summary
+        statistics (e.g. a recording that was cut short) or cannot be read.
+    """
+    summaries = []
+    try:
+        for path in get_mcap_paths(input_bag):
+            with open(path, "rb") as f:
+                summary = make_reader(f).get_summary()
+            if summary is None or summary.statistics is None:
+                return None
+            summaries.append(summary)
+    except Exception as e:
+        print(f"Warning: Could not read the MCAP summary of {input_bag}: {e}")
+        return None
+    return summaries
+
+
+def get_rosbag_summary(input_bag):
+    """
+    Reads start/end time, duration and per-topic message counts from the MCAP
+    summaries of every file of the bag.
+
+    Returns None if a file has no summary statistics (e.g. a recording that was
+    cut short); times are in nanoseconds.
+    """
+    summaries = read_mcap_summaries(input_bag)
+    if summaries is None:
+        return None
+    summaries = [
+        summary for summary in summaries if summary.statistics.message_count > 0
+    ]
+    if not summaries:
+        return None
+
+    topic_counts = {}
+    for summary in summaries:
+        for channel_id, count in summary.statistics.channel_message_counts.items():
+            topic = summary.channels[channel_id].topic
+            topic_counts[topic] = topic_counts.get(topic, 0) + count
+
+    start_time = min(summary.statistics.message_start_time for summary in summaries)
+    end_time = max(summary.statistics.message_end_time for summary in summaries)
+    return {
+        "start_time": start_time,
+        "end_time": end_time,
+        "duration": end_time - start_time,
+        "message_count": sum(summary.statistics.message_count for summary in summaries),
+        "topic_counts": topic_counts,
+    }
+
+
+def get_rosbag_first_timestamp(input_bag):
+    """Gets the timestamp of the first message by reading only up to that message."""
+    with open(get_mcap_path(input_bag), "rb") as f:
+        for record in StreamReader(f).records:
+            if isinstance(record, Message):
+                return record.log_time
+    return None
+
+
+def get_file_fingerprint(path):
+    """Hashes the size of a file with its first and last FINGERPRINT_BLOCK_SIZE bytes."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+        if size > FINGERPRINT_BLOCK_SIZE:
+            f.seek(max(FINGERPRINT_BLOCK_SIZE, size - FINGERPRINT_BLOCK_SIZE))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def get_bag_fingerprint(input_bag):
+    """
+    Computes a content fingerprint of a bag without reading all of it.
+
+    A single file is fingerprinted by get_file_fingerprint(). A bag split into
+    several files is fingerprinted by the name and fingerprint of every file,
+    so bags that only share their first split differ.
+    """
+    paths = get_mcap_paths(input_bag)
+    if len(paths) == 1:
+        return get_file_fingerprint(paths[0])
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f"{os.path.basename(path)}:{get_file_fingerprint(path)}\n".encode())
+    return digest.hexdigest()
 
 
 def get_run_type(run_name):
@@ -45,38 +150,99 @@ def get_run_type(run_name):
     return "Unknown"
 
 
-def insert_run(input_bag, slam_type=None, doc_url=None):
-    """Inserts a new run and returns its run_id."""
-    conn = get_db_connection()
-    cur = conn.cursor()
+def create_run(sink, input_bag, start_time, end_time, slam_type, doc_url, fingerprint):
+    """
+    Inserts a run for a bag with a known time range and returns its run_id.
 
-    run_name = os.path.basename(input_bag).replace(".mcap", "")
+    :param sink: The Sink the run is loaded into.
+    :param start_time: Timestamp (ns) of the first message.
+    :param end_time: Timestamp (ns) of the last message, or None if not known yet.
+    """
+    run_name = os.path.basename(os.path.normpath(input_bag)).replace(".mcap", "")
     rosbag_path = os.path.abspath(input_bag)
-    start_time, end_time = get_rosbag_start_end_time(input_bag)
     run_type = get_run_type(run_name)
 
+    run_id = sink.insert_run(
+        {
+            "run_name": run_name,
+            "start_time": start_time,
+            "end_time": end_time,
+            "slam_type": slam_type,
+            "rosbag_path": rosbag_path,
+            "run_type": run_type,
+            "doc_url": doc_url,
+            "bag_fingerprint": fingerprint,
+        }
+    )
+
+    start_time = datetime.fromtimestamp(start_time / 1e9, tz=timezone.utc)
+    end_time = (
+        datetime.fromtimestamp(end_time / 1e9, tz=timezone.utc) if end_time else None
+    )
+    print(
+        f"Created run {run_id} with name '{run_name}', run type '{run_type}', start time {start_time}, end time {end_time}"
+    )
+    return run_id
+
+
+def insert_run(sink, input_bag, slam_type=None, doc_url=None, fingerprint=None):
+    """
+    Inserts a new run and returns its run_id.
+
+    Start and end time come from the MCAP summary. Without a summary only the start
+    time is read here; the end time is filled in by the sink's complete_run() once the
+    ingestion pass has seen the last message.
+
+    :param sink: The Sink the run is loaded into.
+    """
+    summary = get_rosbag_summary(input_bag)
+    if summary is not None:
+        start_time, end_time = summary["start_time"], summary["end_time"]
+        print(
+            f"Bag summary: {summary['message_count']} messages on {len(summary['topic_counts'])} topics over {summary['duration'] / 1e9:.1f} s"
+        )
+    else:
+        print("Warning: No MCAP summary found, end time will be set after ingestion.")
+        start_time, end_time = get_rosbag_first_timestamp(input_bag), None
+
     if start_time is None:
         print("Error: Could not determine start time from rosbag.")
         return None
 
-    # Convert numeric timestamp to TIMESTAMPTZ format
-    start_time = datetime.fromtimestamp(start_time, tz=timezone.utc)
-    end_time = datetime.fromtimestamp(end_time, tz=timezone.utc) if end_time else None
-
-    cur.execute(
-        """
-        INSERT INTO runs (run_name, start_time, end_time, slam_type, rosbag_path, run_type, doc_url) 
-        VALUES (%s, %s, %s, %s, %s, %s, %s) 
-        RETURNING run_id
-    """,
-        (run_name, start_time, end_time, slam_type, rosbag_path, run_type, doc_url),
+    return create_run(
+        sink, input_bag, start_time, end_time, slam_type, doc_url, fingerprint
     )
 
-    run_id = cur.fetchone()[0]
-    conn.commit()
-    cur.close()
-    conn.close()
+
+def prepare_run(sink, input_bag, slam_type=None, doc_url=None):
+    """
+    Finds the run of a bag that was loaded before, or creates a new one.
+
+    Bags are matched by content fingerprint, so loading the same bag twice never
+    creates a second run.
+
+    :param sink: The Sink the run is loaded into.
+    :return: Tuple of (run_id, per-topic checkpoints of an interrupted load,
+        whether the run is already complete). run_id is None if no run could be
+        created.
+    """
+    fingerprint = get_bag_fingerprint(input_bag)
+    existing = sink.find_run(fingerprint)
+
+    if existing is None:
+        return insert_run(sink, input_bag, slam_type, doc_url, fingerprint), {}, False
+
+    run_id, completed = existing
+    if completed:
+        print(f"Bag {input_bag} is already loaded as run {run_id}, skipping.")
+        return run_id, {}, True
+
+    checkpoints = sink.load_checkpoints(run_id)
+    if not checkpoints:
+        # The bag is loaded again from the start, so statistics of rows an earlier
+        # load committed without checkpoints would be counted twice.
+        sink.reset_run_summary(run_id)
     print(
-        f"Created run {run_id} with name '{run_name}', run type '{run_type}', start time {start_time}, end time {end_time}"
+        f"Resuming run {run_id} for {input_bag} from checkpoints of {len(checkpoints)} topics."
     )
-    return run_id
+    return run_id, checkpoints, False
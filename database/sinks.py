@@ -0,0 +1,134 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+DEFAULT_SINK = "postgres"
+NULL_SINK = "null"
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+class Sink(ABC):
+    """
+    Destination of a load: the run bookkeeping and the rows of every table.
+
+    Sinks are handed to worker processes, so they must be picklable; connections
+    are opened when they are needed, never when the sink is created.
+    """
+
+    # Whether several writers (threads or processes) may load into the sink at once.
+    concurrent_writers = True
+
+    @abstractmethod
+    def find_run(self, fingerprint):
+        """Returns (run_id, completed) of the run of a bag fingerprint, or None."""
+
+    @abstractmethod
+    def insert_run(self, run):
+        """
+        Inserts a new run and returns its run_id.
+
+        :param run: Dict of runs columns; start_time and end_time are in
+            nanoseconds, end_time may be None.
+        """
+
+    @abstractmethod
+    def load_checkpoints(self, run_id):
+        """Returns the last committed message timestamp (ns) of every topic of a run."""
+
+    @abstractmethod
+    def complete_run(self, run_id, end_time, fingerprint=None):
+        """
+        Marks a run as completely loaded, setting its end time (ns) if it had none,
+        and its bag fingerprint if one is given, and builds the run's trajectory
+        index from its rows.
+        """
+
+    @abstractmethod
+    def reset_run_summary(self, run_id):
+        """
+        Deletes the run_summary statistics of a run, before it is loaded again
+        from the start.
+        """
+
+    @abstractmethod
+    def get_metric_id(self, metric_name):
+        """Returns the ID of a metric, adding the metric if it is new."""
+
+    @abstractmethod
+    def open_writer(self, batch_size, flush_interval, metrics=None):
+        """
+        Returns a context manager yielding a writer for the rows of a load.
+
+        The writer has add(table, row), flush() and checkpoint(run_id,
+        checkpoints), which writes the buffered rows and commits them together
+        with the checkpoints. Everything is committed when the block exits
+        normally and discarded since the last checkpoint when it raises. Every
+        flushed batch is recorded in metrics (an IngestMetrics), if given.
+        """
+
+
+class NullWriter:
+    """Writer that counts rows and discards them."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def add(self, table, row):
+        self.rows += 1
+
+    def flush(self):
+        pass
+
+    def checkpoint(self, run_id, checkpoints):
+        pass
+
+
+class NullSink(Sink):
+    """Discards everything, to measure reading, decoding and extraction alone."""
+
+    def __init__(self):
+        self.metric_ids = {}
+
+    def find_run(self, fingerprint):
+        return None
+
+    def insert_run(self, run):
+        return 0
+
+    def load_checkpoints(self, run_id):
+        return {}
+
+    def complete_run(self, run_id, end_time, fingerprint=None):
+        pass
+
+    def reset_run_summary(self, run_id):
+        pass
+
+    def get_metric_id(self, metric_name):
+        return self.metric_ids.setdefault(metric_name, len(self.metric_ids) + 1)
+
+    @contextmanager
+    def open_writer(self, batch_size, flush_interval, metrics=None):
+        yield NullWriter()
+
+
+def get_sink(target=None):
+    """
+    Returns the sink for a --sink argument.
+
+    :param target: "postgres" (the default) for TimescaleDB, the path of a
+        SQLite file (.db, .sqlite or .sqlite3), which is created if needed, or
+        "null" to discard all rows.
+    """
+    if target == NULL_SINK:
+        return NullSink()
+    if target is None or target == DEFAULT_SINK:
+        from postgres_sink import PostgresSink
+
+        return PostgresSink()
+    if target.endswith(SQLITE_EXTENSIONS):
+        from sqlite_sink import SQLiteSink
+
+        return SQLiteSink(target)
+    raise ValueError(
+        f"Unknown sink {target}: use postgres, null or a {'/'.join(SQLITE_EXTENSIONS)} file"
+    )
@@ -0,0 +1,258 @@
+-- SQLite version of the tables in schema.sql that ingestion writes, for loading a
+-- bag into a local file. Times are stored as ISO 8601 UTC text with microseconds,
+-- which sorts chronologically, and the data tables are clustered on their
+-- primary key (WITHOUT ROWID) like a time-ordered hypertable chunk.
+
+-- runs (metadata table)
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_name     TEXT NOT NULL,
+    start_time   TEXT NOT NULL,
+    end_time     TEXT,
+    slam_type    TEXT,
+    rosbag_path  TEXT,
+    run_type     TEXT,
+    doc_url      TEXT,
+    bag_fingerprint TEXT UNIQUE,
+    completed    INTEGER NOT NULL DEFAULT 0
+);
+
+-- metrics (dictionary of the metric names used by the narrow metric tables)
+CREATE TABLE IF NOT EXISTS metrics (
+    metric_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    metric_name  TEXT NOT NULL UNIQUE
+);
+
+-- run_checkpoints (last loaded message time per topic, in ns, for resuming a load)
+CREATE TABLE IF NOT EXISTS run_checkpoints (
+    run_id       INTEGER NOT NULL REFERENCES runs(run_id),
+    topic        TEXT NOT NULL,
+    last_time    INTEGER NOT NULL,
+    PRIMARY KEY (run_id, topic)
+);
+
+-- run_summary (statistics of every series of a run, gathered while loading it:
+-- one row per value column, or per metric for the *_values tables)
+CREATE TABLE IF NOT EXISTS run_summary (
+    run_id       INTEGER NOT NULL REFERENCES runs(run_id),
+    table_name   TEXT NOT NULL,
+    series       TEXT NOT NULL,
+    row_count    INTEGER NOT NULL,
+    value_count  INTEGER NOT NULL,
+    first_time   TEXT,
+    last_time    TEXT,
+    rate_hz      REAL,
+    min_value    REAL,
+    max_value    REAL,
+    mean_value   REAL,
+    variance     REAL,
+    p50          REAL,
+    p95          REAL,
+    p99          REAL,
+    sketch       TEXT NOT NULL,
+    PRIMARY KEY (run_id, table_name, series)
+) WITHOUT ROWID;
+
+-- trajectory_cells (the state_estimation_state trajectory on a grid of
+-- TRAJECTORY_CELL_SIZE squares: one row per stay of the car in a square, with
+-- the times of its first and last sample there)
+CREATE TABLE IF NOT EXISTS trajectory_cells (
+    run_id       INTEGER NOT NULL REFERENCES runs(run_id),
+    cell_x       INTEGER NOT NULL,
+    cell_y       INTEGER NOT NULL,
+    start_time   TEXT NOT NULL,
+    end_time     TEXT NOT NULL,
+    PRIMARY KEY (run_id, start_time, cell_x, cell_y)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trajectory_cells_cell_idx ON trajectory_cells (cell_x, cell_y);
+
+-- lap_crossings (times the car crossed the start/finish line, see run_laps)
+CREATE TABLE IF NOT EXISTS lap_crossings (
+    run_id       INTEGER NOT NULL REFERENCES runs(run_id),
+    time         TEXT NOT NULL,
+    PRIMARY KEY (run_id, time)
+) WITHOUT ROWID;
+
+-- perception_values
+CREATE TABLE IF NOT EXISTS perception_values (
+    time              TEXT NOT NULL,
+    run_id            INTEGER NOT NULL REFERENCES runs(run_id),
+    metric_id         INTEGER NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
+) WITHOUT ROWID;
+
+-- state_estimation_pred_corr_values
+CREATE TABLE IF NOT EXISTS state_estimation_pred_corr_values (
+    time              TEXT NOT NULL,
+    run_id            INTEGER NOT NULL REFERENCES runs(run_id),
+    metric_id         INTEGER NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
+) WITHOUT ROWID;
+
+-- state_estimation_state
+CREATE TABLE IF NOT EXISTS state_estimation_state (
+    time       TEXT NOT NULL,
+    run_id     INTEGER NOT NULL REFERENCES runs(run_id),
+    x          REAL,
+    y          REAL,
+    theta      REAL,
+    linear_velocity          REAL,
+    angular_velocity      REAL,
+    PRIMARY KEY (time, run_id)
+) WITHOUT ROWID;
+
+-- planning_values
+CREATE TABLE IF NOT EXISTS planning_values (
+    time              TEXT NOT NULL,
+    run_id            INTEGER NOT NULL REFERENCES runs(run_id),
+    metric_id         INTEGER NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
+) WITHOUT ROWID;
+
+-- control
+CREATE TABLE IF NOT EXISTS control (
+    time                TEXT NOT NULL,
+    run_id              INTEGER NOT NULL REFERENCES runs(run_id),
+    throttle REAL,
+    steering_angle REAL,
+    PRIMARY KEY (time, run_id)
+) WITHOUT ROWID;
+
+-- control metrics
+CREATE TABLE IF NOT EXISTS control_metrics (
+    time                TEXT NOT NULL,
+    run_id              INTEGER NOT NULL REFERENCES runs(run_id),
+    lookahead_x REAL,
+    lookahead_y REAL,
+    closest_x REAL,
+    closest_y REAL,
+    linear_velocity REAL,
+    closest_velocity REAL,
+    execution_time REAL,
+    PRIMARY KEY (time, run_id)
+) WITHOUT ROWID;
+
+-- sensor data
+CREATE TABLE IF NOT EXISTS sensor_data_values (
+    time              TEXT NOT NULL,
+    run_id            INTEGER NOT NULL REFERENCES runs(run_id),
+    metric_id         INTEGER NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
+) WITHOUT ROWID;
+
+-- IMU acceleration
+CREATE TABLE IF NOT EXISTS imu_acceleration (
+    time                TEXT NOT NULL,
+    run_id              INTEGER NOT NULL REFERENCES runs(run_id),
+    x_acceleration      REAL,
+    y_acceleration      REAL,
+    z_acceleration      REAL,
+    PRIMARY KEY (time, run_id)
+) WITHOUT ROWID;
+
+-- IMU angular velocity
+CREATE TABLE IF NOT EXISTS imu_angular_velocity (
+    time                TEXT NOT NULL,
+    run_id              INTEGER NOT NULL REFERENCES runs(run_id),
+    x_angular_velocity  REAL,
+    y_angular_velocity  REAL,
+    z_angular_velocity  REAL,
+    PRIMARY KEY (time, run_id)
+) WITHOUT ROWID;
+
+-- IMU euler angles
+CREATE TABLE IF NOT EXISTS imu_euler_angles (
+    time                TEXT NOT NULL,
+    run_id              INTEGER NOT NULL REFERENCES runs(run_id),
+    roll                REAL,
+    pitch               REAL,
+    yaw                 REAL,
+    PRIMARY KEY (time, run_id)
+) WITHOUT ROWID;
+
+-- IMU quaternion
+CREATE TABLE IF NOT EXISTS imu_quaternion (
+    time                TEXT NOT NULL,
+    run_id              INTEGER NOT NULL REFERENCES runs(run_id),
+    x                   REAL,
+    y                   REAL,
+    z                   REAL,
+    w                   REAL,
+    PRIMARY KEY (time, run_id)
+) WITHOUT ROWID;
+
+-- Per-run lookups of one metric, e.g. the execution time of a run
+CREATE INDEX IF NOT EXISTS perception_values_run_metric_idx ON perception_values (run_id, metric_id, time);
+CREATE INDEX IF NOT EXISTS state_estimation_pred_corr_values_run_metric_idx ON state_estimation_pred_corr_values (run_id, metric_id, time);
+CREATE INDEX IF NOT EXISTS planning_values_run_metric_idx ON planning_values (run_id, metric_id, time);
+CREATE INDEX IF NOT EXISTS sensor_data_values_run_metric_idx ON sensor_data_values (run_id, metric_id, time);
+
+-- Views with the metric names, under the original table names
+CREATE VIEW IF NOT EXISTS perception AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM perception_values v JOIN metrics m USING (metric_id);
+
+CREATE VIEW IF NOT EXISTS state_estimation_pred_corr AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM state_estimation_pred_corr_values v JOIN metrics m USING (metric_id);
+
+CREATE VIEW IF NOT EXISTS planning AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM planning_values v JOIN metrics m USING (metric_id);
+
+CREATE VIEW IF NOT EXISTS sensor_data AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM sensor_data_values v JOIN metrics m USING (metric_id);
+
+-- Run lists and overviews from run_summary, without touching the data tables.
+-- Every series of a wide table has one value per row, so a table's row count
+-- is that of its largest series; the *_values tables hold one series per
+-- metric, so theirs is the sum of their series.
+CREATE VIEW IF NOT EXISTS run_table_summary AS
+SELECT run_id, table_name,
+       CASE WHEN table_name LIKE '%\_values' ESCAPE '\' THEN sum(row_count) ELSE max(row_count) END AS row_count,
+       min(first_time) AS first_time,
+       max(last_time) AS last_time,
+       CASE WHEN table_name LIKE '%\_values' ESCAPE '\' THEN sum(rate_hz) ELSE max(rate_hz) END AS rate_hz
+FROM run_summary
+GROUP BY run_id, table_name;
+
+CREATE VIEW IF NOT EXISTS run_overview AS
+SELECT r.run_id, r.run_name, r.run_type, r.slam_type, r.start_time, r.end_time,
+       (julianday(r.end_time) - julianday(r.start_time)) * 86400 AS duration_s,
+       r.completed,
+       count(t.table_name) AS table_count,
+       coalesce(sum(t.row_count), 0) AS row_count
+FROM runs r
+LEFT JOIN run_table_summary t USING (run_id)
+GROUP BY r.run_id;
+
+-- Laps of every run: lap 1 starts with the trajectory, every crossing of the
+-- start/finish line ends a lap. Crossings within 5 s of the previous one are
+-- noise around the line and skipped; the part after the last crossing is no lap.
+CREATE VIEW IF NOT EXISTS run_laps AS
+WITH boundaries AS (
+    SELECT run_id, min(start_time) AS time FROM trajectory_cells GROUP BY run_id
+    UNION
+    SELECT run_id, time FROM lap_crossings
+), spaced AS (
+    SELECT run_id, time,
+           (julianday(time) - julianday(lag(time) OVER (PARTITION BY run_id ORDER BY time))) * 86400 AS gap
+    FROM boundaries
+), laps AS (
+    SELECT run_id,
+           row_number() OVER w AS lap,
+           time AS start_time,
+           lead(time) OVER w AS end_time
+    FROM spaced
+    WHERE gap IS NULL OR gap >= 5
+    WINDOW w AS (PARTITION BY run_id ORDER BY time)
+)
+SELECT run_id, lap, start_time, end_time,
+       (julianday(end_time) - julianday(start_time)) * 86400 AS lap_time
+FROM laps
+WHERE end_time IS NOT NULL;
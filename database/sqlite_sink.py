@@ -0,0 +1,308 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+import numpy as np
+from batch_writer import BatchWriter, build_conflict_clause, format_times
+from topic_registry import TABLE_COLUMNS
+from run_summary import SUMMARY_COLUMNS, SeriesStats, get_series_name
+from trajectory_index import TrajectoryIndex, TRAJECTORY_TABLE, TRAJECTORY_COLUMNS
+from sinks import Sink
+
+SQLITE_SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "sqlite_schema.sql")
+BUSY_TIMEOUT = 60.0  # seconds a connection waits for another one's write lock
+FETCH_SIZE = 100000  # rows read at once when indexing a trajectory
+
+
+def to_text_time(timestamp):
+    """Converts a nanosecond timestamp to the ISO 8601 text stored by SQLite."""
+    if timestamp is None:
+        return None
+    return str(format_times(np.array([timestamp], dtype=np.int64))[0])
+
+
+def from_text_time(text):
+    """Converts the ISO 8601 text stored by SQLite back to a nanosecond timestamp."""
+    if text is None:
+        return None
+    return int(np.datetime64(text.rstrip("Z"), "ns").astype(np.int64))
+
+
+def save_run_summary(conn, series):
+    """Merges series statistics into run_summary in the caller's transaction."""
+    if not series:
+        return
+    metric_names = dict(conn.execute("SELECT metric_id, metric_name FROM metrics"))
+    for (run_id, table, metric_id, column), stats in series.items():
+        key = (run_id, table, get_series_name(metric_id, column, metric_names))
+        stored = conn.execute(
+            f"""
+            SELECT {', '.join(SUMMARY_COLUMNS)} FROM run_summary
+            WHERE run_id = ? AND table_name = ? AND series = ?
+        """,
+            key,
+        ).fetchone()
+        if stored is not None:
+            stored = list(stored)
+            stored[2], stored[3] = from_text_time(stored[2]), from_text_time(stored[3])
+            stats.merge(SeriesStats.from_row(stored))
+
+        row = list(stats.to_row())
+        row[2], row[3] = to_text_time(row[2]), to_text_time(row[3])
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO run_summary (run_id, table_name, series, {', '.join(SUMMARY_COLUMNS)})
+            VALUES ({', '.join(['?'] * (3 + len(SUMMARY_COLUMNS)))})
+        """,
+            list(key) + row,
+        )
+
+
+def save_trajectory_index(conn, run_id, visits, crossings):
+    """Replaces the trajectory visits and lap crossings of a run in the caller's transaction."""
+    conn.execute("DELETE FROM trajectory_cells WHERE run_id = ?", (run_id,))
+    conn.execute("DELETE FROM lap_crossings WHERE run_id = ?", (run_id,))
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO trajectory_cells (run_id, cell_x, cell_y, start_time, end_time)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+        [
+            (run_id, cell_x, cell_y, to_text_time(start_time), to_text_time(end_time))
+            for cell_x, cell_y, start_time, end_time in visits
+        ],
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO lap_crossings (run_id, time) VALUES (?, ?)",
+        [(run_id, to_text_time(time)) for time in crossings],
+    )
+
+
+def index_trajectory(conn, run_id):
+    """
+    Builds the trajectory index of a loaded run from its poses read back ordered
+    by time, in the caller's transaction.
+    """
+    index = TrajectoryIndex()
+    cur = conn.execute(
+        f"""
+        SELECT time, {', '.join(TRAJECTORY_COLUMNS)} FROM {TRAJECTORY_TABLE}
+        WHERE run_id = ? ORDER BY time
+    """,
+        (run_id,),
+    )
+    while True:
+        rows = cur.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        times, x, y, theta = zip(*rows)
+        index.add(
+            np.array([time.rstrip("Z") for time in times], dtype="datetime64[ns]").astype(np.int64),
+            *(np.array(values, dtype=np.float64) for values in (x, y, theta)),
+        )
+    save_trajectory_index(conn, run_id, *index.finish())
+
+
+@contextmanager
+def savepoint(conn, name="batch"):
+    """
+    Wraps a block in a savepoint of the open transaction, like
+    connecting_db.savepoint() does for PostgreSQL.
+
+    A transaction is begun first if none is open, since releasing an outermost
+    savepoint would commit.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        raise
+    conn.execute(f"RELEASE SAVEPOINT {name}")
+
+
+def build_sqlite_insert_query(table):
+    """Builds the INSERT of one row, keeping the table's ON CONFLICT behaviour."""
+    keys, values = TABLE_COLUMNS[table]
+    placeholders = ", ".join(["?"] * (len(keys) + len(values)))
+    return f"INSERT INTO {table} ({', '.join(keys + values)}) VALUES ({placeholders}) {build_conflict_clause(table)}"
+
+
+class SQLiteWriter(BatchWriter):
+    """
+    BatchWriter for a SQLite connection.
+
+    Rows are buffered and converted per batch exactly like for PostgreSQL, then
+    written with one executemany() per batch, which SQLite runs in-process. Like
+    for PostgreSQL, each batch is written in its own savepoint, and a failing
+    batch is written again row by row so that a bad row only loses itself.
+    """
+
+    def __init__(self, conn, batch_size, flush_interval, metrics=None):
+        super().__init__(conn, batch_size, flush_interval, metrics)
+        self.queries = {table: build_sqlite_insert_query(table) for table in TABLE_COLUMNS}
+
+    def write_batch(self, table, buffer):
+        rows = buffer.to_rows()
+        try:
+            with savepoint(self.conn):
+                self.conn.executemany(self.queries[table], rows)
+            return len(rows), []
+        except sqlite3.Error as e:
+            self.metrics.errors.report(
+                ("write", table, type(e).__name__),
+                f"Batch insert error for {table}, retrying {len(rows)} rows one by one: {e}",
+            )
+            return self._insert_one_by_one(table, rows)
+
+    def _insert_one_by_one(self, table, rows, query=None):
+        query = query or self.queries[table]
+        failed_rows = []
+        for row in rows:
+            try:
+                with savepoint(self.conn, "batch_row"):
+                    self.conn.execute(query, row)
+            except sqlite3.Error as e:
+                failed_rows.append(row)
+                self.metrics.errors.report(
+                    ("write row", table, type(e).__name__),
+                    f"Database insert error for {table} at {row[0]}: {e}",
+                )
+        return len(rows) - len(failed_rows), failed_rows
+
+    def checkpoint(self, run_id, checkpoints):
+        """
+        Writes the buffered rows and commits them together with the checkpoints
+        and the run_summary statistics of those rows.
+        """
+        self.flush()
+        self.conn.executemany(
+            """
+            INSERT INTO run_checkpoints (run_id, topic, last_time) VALUES (?, ?, ?)
+            ON CONFLICT (run_id, topic) DO UPDATE
+            SET last_time = MAX(run_checkpoints.last_time, excluded.last_time)
+        """,
+            [(run_id, topic, last_time) for topic, last_time in checkpoints.items()],
+        )
+        self.save_summary()
+        self.conn.commit()
+
+    def save_summary(self):
+        save_run_summary(self.conn, self.summary.take())
+
+
+class SQLiteSink(Sink):
+    """
+    Loads into a local SQLite file with the tables of schema.sql, no server needed.
+
+    SQLite has a single writer at a time, so loads into it run one at a time.
+    """
+
+    concurrent_writers = False
+
+    def __init__(self, path):
+        self.path = path
+        # Metric name -> metric_id, filled as metrics are first looked up.
+        self.metric_ids = {}
+
+    def connect(self):
+        """Opens a connection, creating the file and its tables if needed."""
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        with open(SQLITE_SCHEMA_FILE, "r") as f:
+            conn.executescript(f.read())
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Opens a connection for a with block, committing if the block succeeds."""
+        conn = self.connect()
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def find_run(self, fingerprint):
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT run_id, completed FROM runs WHERE bag_fingerprint = ?",
+                (fingerprint,),
+            ).fetchone()
+        return None if row is None else (row[0], bool(row[1]))
+
+    def insert_run(self, run):
+        with self.connection() as conn:
+            cur = conn.execute(
+                """
+                INSERT INTO runs (run_name, start_time, end_time, slam_type, rosbag_path, run_type, doc_url, bag_fingerprint)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    run["run_name"],
+                    to_text_time(run["start_time"]),
+                    to_text_time(run["end_time"]),
+                    run["slam_type"],
+                    run["rosbag_path"],
+                    run["run_type"],
+                    run["doc_url"],
+                    run["bag_fingerprint"],
+                ),
+            )
+            return cur.lastrowid
+
+    def load_checkpoints(self, run_id):
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT topic, last_time FROM run_checkpoints WHERE run_id = ?",
+                (run_id,),
+            ).fetchall()
+        return dict(rows)
+
+    def complete_run(self, run_id, end_time, fingerprint=None):
+        """Also indexes the run's trajectory, in the same transaction."""
+        with self.connection() as conn:
+            index_trajectory(conn, run_id)
+            conn.execute(
+                """
+                UPDATE runs SET end_time = COALESCE(end_time, ?), completed = 1,
+                    bag_fingerprint = COALESCE(?, bag_fingerprint)
+                WHERE run_id = ?
+            """,
+                (to_text_time(end_time), fingerprint, run_id),
+            )
+
+    def reset_run_summary(self, run_id):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM run_summary WHERE run_id = ?", (run_id,))
+
+    def get_metric_id(self, metric_name):
+        metric_id = self.metric_ids.get(metric_name)
+        if metric_id is not None:
+            return metric_id
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT INTO metrics (metric_name) VALUES (?) ON CONFLICT (metric_name) DO NOTHING",
+                (metric_name,),
+            )
+            metric_id = conn.execute(
+                "SELECT metric_id FROM metrics WHERE metric_name = ?", (metric_name,)
+            ).fetchone()[0]
+        self.metric_ids[metric_name] = metric_id
+        return metric_id
+
+    @contextmanager
+    def open_writer(self, batch_size, flush_interval, metrics=None):
+        conn = self.connect()
+        try:
+            with SQLiteWriter(conn, batch_size, flush_interval, metrics) as writer:
+                yield writer
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,222 @@
+import re
+from collections import namedtuple
+from operator import attrgetter
+
+# Table -> (conflict key columns, value columns), in insert order. Rows hold the
+# message timestamp in nanoseconds for "time"; "run_id" and "metric_id" are
+# integers and every other value column is a float.
+TABLE_COLUMNS = {
+    "perception_values": (("time", "run_id", "metric_id"), ("metric_value",)),
+    "state_estimation_pred_corr_values": (
+        ("time", "run_id", "metric_id"),
+        ("metric_value",),
+    ),
+    "state_estimation_state": (
+        ("time", "run_id"),
+        ("x", "y", "theta", "linear_velocity", "angular_velocity"),
+    ),
+    "planning_values": (("time", "run_id", "metric_id"), ("metric_value",)),
+    "control": (("time", "run_id"), ("throttle", "steering_angle")),
+    "control_metrics": (
+        ("time", "run_id"),
+        (
+            "lookahead_x",
+            "lookahead_y",
+            "closest_x",
+            "closest_y",
+            "linear_velocity",
+            "closest_velocity",
+            "execution_time",
+        ),
+    ),
+    "sensor_data_values": (("time", "run_id", "metric_id"), ("metric_value",)),
+    "imu_acceleration": (
+        ("time", "run_id"),
+        ("x_acceleration", "y_acceleration", "z_acceleration"),
+    ),
+    "imu_angular_velocity": (
+        ("time", "run_id"),
+        ("x_angular_velocity", "y_angular_velocity", "z_angular_velocity"),
+    ),
+    "imu_euler_angles": (("time", "run_id"), ("roll", "pitch", "yaw")),
+    "imu_quaternion": (("time", "run_id"), ("x", "y", "z", "w")),
+}
+
+INTEGER_COLUMNS = {"time", "run_id", "metric_id"}
+
+# A mapped topic: the table it is loaded into, the message field path of every
+# value column (in TABLE_COLUMNS order; "len(path)" stores the length of a
+# sequence), the metric name for tables keyed by metric_id, and what happens when a
+# row already exists ("nothing" keeps the first row, "update" overwrites it).
+TopicSpec = namedtuple(
+    "TopicSpec",
+    ["table", "fields", "metric", "on_conflict"],
+    defaults=(None, "nothing"),
+)
+
+REGISTRY = {
+    # Perception
+    "/perception/execution_time": TopicSpec(
+        "perception_values", ("data",), "execution_time"
+    ),
+    "/perception/cones": TopicSpec(
+        "perception_values", ("len(cone_array)",), "num_cones"
+    ),
+    # State estimation
+    "/state_estimation/execution_time/correction_step": TopicSpec(
+        "state_estimation_pred_corr_values", ("data",), "correction_step"
+    ),
+    "/state_estimation/execution_time/prediction_step": TopicSpec(
+        "state_estimation_pred_corr_values", ("data",), "prediction_step"
+    ),
+    "/state_estimation/vehicle_state": TopicSpec(
+        "state_estimation_state",
+        ("position.x", "position.y", "theta", "linear_velocity", "angular_velocity"),
+    ),
+    # Planning
+    "/path_planning/execution_time": TopicSpec(
+        "planning_values", ("data",), "execution_time"
+    ),
+    "/path_planning/yellow_cones": TopicSpec(
+        "planning_values", ("len(markers)",), "num_yellow_cones"
+    ),
+    "/path_planning/blue_cones": TopicSpec(
+        "planning_values", ("len(markers)",), "num_blue_cones"
+    ),
+    "/path_planning/after_rem_yellow_cones": TopicSpec(
+        "planning_values", ("len(markers)",), "num_removed_yellow_cones"
+    ),
+    "/path_planning/after_rem_blue_cones": TopicSpec(
+        "planning_values", ("len(markers)",), "num_removed_blue_cones"
+    ),
+    # Control
+    "/control/evaluator_data": TopicSpec(
+        "control_metrics",
+        (
+            "lookahead_point.x",
+            "lookahead_point.y",
+            "closest_point.x",
+            "closest_point.y",
+            "lookahead_velocity",
+            "closest_point_velocity",
+            "execution_time",
+        ),
+        on_conflict="update",
+    ),
+    "/as_msgs/controls": TopicSpec("control", ("throttle", "steering")),
+    # Sensors
+    "/vehicle/rl_rpm": TopicSpec("sensor_data_values", ("rl_rpm",), "rl_rpm"),
+    "/vehicle/rr_rpm": TopicSpec("sensor_data_values", ("rr_rpm",), "rr_rpm"),
+    "/vehicle/bosch_steering_angle": TopicSpec(
+        "sensor_data_values", ("steering_angle",), "steering_angle"
+    ),
+    # IMU
+    "/imu/acceleration": TopicSpec(
+        "imu_acceleration", ("vector.x", "vector.y", "vector.z")
+    ),
+    "/imu/angular_velocity": TopicSpec(
+        "imu_angular_velocity", ("vector.x", "vector.y", "vector.z")
+    ),
+    "/filter/euler": TopicSpec(
+        "imu_euler_angles", ("vector.x", "vector.y", "vector.z")
+    ),
+    "/filter/quaternion": TopicSpec(
+        "imu_quaternion",
+        ("quaternion.x", "quaternion.y", "quaternion.z", "quaternion.w"),
+    ),
+}
+
+# Tables whose rows overwrite existing ones on conflict; all others keep the first row.
+UPDATE_ON_CONFLICT = {
+    spec.table for spec in REGISTRY.values() if spec.on_conflict == "update"
+}
+
+LENGTH_PATTERN = re.compile(r"^len\((.+)\)$")
+
+
+def validate_registry():
+    """Checks every topic against the columns and conflict policy of its table."""
+    for topic, spec in REGISTRY.items():
+        if spec.table not in TABLE_COLUMNS:
+            raise ValueError(f"Topic {topic} maps to unknown table {spec.table}")
+        keys, values = TABLE_COLUMNS[spec.table]
+        if len(spec.fields) != len(values):
+            raise ValueError(
+                f"Topic {topic} has {len(spec.fields)} fields for the {len(values)} value columns of {spec.table}"
+            )
+        if ("metric_id" in keys) != (spec.metric is not None):
+            raise ValueError(
+                f"Topic {topic} needs a metric name exactly when {spec.table} is keyed by metric"
+            )
+        if spec.on_conflict not in ("nothing", "update"):
+            raise ValueError(
+                f"Topic {topic} has unknown conflict policy {spec.on_conflict}"
+            )
+        if (spec.table in UPDATE_ON_CONFLICT) != (spec.on_conflict == "update"):
+            raise ValueError(f"Topics of {spec.table} disagree on the conflict policy")
+
+
+def compile_field(path):
+    """Compiles one field path into a callable that reads it from a message."""
+    match = LENGTH_PATTERN.match(path)
+    if match is None:
+        return attrgetter(path)
+    getter = attrgetter(match.group(1))
+    return lambda msg: len(getter(msg))
+
+
+def compile_extractor(spec):
+    """
+    Compiles the fields of a topic into one callable returning the row values.
+
+    Plain field paths are read with a single attrgetter, so extracting a row does
+    no per-message branching on the topic.
+    """
+    if not any(LENGTH_PATTERN.match(path) for path in spec.fields):
+        getter = attrgetter(*spec.fields)
+        if len(spec.fields) == 1:
+            return lambda msg: (getter(msg),)
+        return getter
+    getters = [compile_field(path) for path in spec.fields]
+    return lambda msg: tuple(getter(msg) for getter in getters)
+
+
+def compile_loader(spec, metric_id=None):
+    """
+    Compiles a topic's registry entry into its loader.
+
+    :param spec: The TopicSpec of the topic.
+    :param metric_id: The ID of the topic's metric, for tables keyed by metric_id.
+    :return: Callable (writer, run_id, topic, msg, timestamp) that queues the
+        message's row on the writer.
+    """
+    extract = compile_extractor(spec)
+    table = spec.table
+
+    if spec.metric is None:
+
+        def load(writer, run_id, topic, msg, timestamp):
+            writer.add(table, (timestamp, run_id) + extract(msg))
+
+    else:
+
+        def load(writer, run_id, topic, msg, timestamp):
+            writer.add(table, (timestamp, run_id, metric_id) + extract(msg))
+
+    return load
+
+
+def get_fast_path_field(spec):
+    """
+    Returns the top-level message field a topic reads, if it reads only one.
+
+    Such topics can be decoded straight from the CDR buffer, without the full message.
+    """
+    if len(spec.fields) != 1:
+        return None
+    match = LENGTH_PATTERN.match(spec.fields[0])
+    field = match.group(1) if match else spec.fields[0]
+    return None if "." in field else field
+
+
+validate_registry()
@@ -0,0 +1,108 @@
+import math
+import numpy as np
+
+TRAJECTORY_TABLE = "state_estimation_state"
+TRAJECTORY_COLUMNS = ("x", "y", "theta")
+TRAJECTORY_CELL_SIZE = 5.0  # m, side of a square of the trajectory grid
+START_LINE_HALF_WIDTH = 4.0  # m on either side of the start/finish line's center
+
+
+class TrajectoryIndex:
+    """
+    Builds the trajectory grid and the start/finish line crossings of one run.
+
+    The x/y plane is divided into TRAJECTORY_CELL_SIZE squares; every stay of
+    the car in one square is a visit with the time range of its first and last
+    sample there. The start/finish line goes through the run's first pose,
+    perpendicular to its heading, and a crossing is recorded whenever the car
+    passes it in that direction; the run_laps view turns the crossings into laps.
+
+    Samples are added in chunks that must follow each other in time, as read
+    back from the table ordered by time; the last sample and the visit in
+    progress carry over from one chunk to the next.
+    """
+
+    def __init__(self):
+        self.visits = []
+        self.crossings = []
+        self.open_visit = None  # [cell_x, cell_y, start_time, end_time]
+        self.start_line = None  # (x, y, cos, sin) of the first pose
+        self.last_sample = None  # (time, along, across) relative to the start line
+
+    def add(self, times, x, y, theta):
+        """
+        Adds the next chunk of samples.
+
+        :param times: int64 nanosecond timestamps, in increasing order.
+        :param x, y, theta: The pose of every sample; samples without a finite
+            position are left out.
+        """
+        finite = np.isfinite(x) & np.isfinite(y)
+        times, x, y, theta = times[finite], x[finite], y[finite], theta[finite]
+        if not len(times):
+            return
+        if self.start_line is None:
+            heading = float(theta[0]) if np.isfinite(theta[0]) else 0.0
+            self.start_line = (float(x[0]), float(y[0]), math.cos(heading), math.sin(heading))
+        self.add_visits(times, x, y)
+        self.add_crossings(times, x, y)
+
+    def add_visits(self, times, x, y):
+        cell_x = np.floor(x / TRAJECTORY_CELL_SIZE).astype(np.int64)
+        cell_y = np.floor(y / TRAJECTORY_CELL_SIZE).astype(np.int64)
+        changes = np.flatnonzero(
+            (cell_x[1:] != cell_x[:-1]) | (cell_y[1:] != cell_y[:-1])
+        ) + 1
+        starts = np.concatenate(([0], changes))
+        ends = np.concatenate((changes, [len(times)])) - 1
+
+        visits = [
+            [int(cell_x[start]), int(cell_y[start]), int(times[start]), int(times[end])]
+            for start, end in zip(starts, ends)
+        ]
+        if self.open_visit is not None:
+            if self.open_visit[:2] == visits[0][:2]:
+                visits[0][2] = self.open_visit[2]
+            else:
+                self.visits.append(tuple(self.open_visit))
+        self.visits.extend(tuple(visit) for visit in visits[:-1])
+        self.open_visit = visits[-1]
+
+    def add_crossings(self, times, x, y):
+        line_x, line_y, cos, sin = self.start_line
+        along = (x - line_x) * cos + (y - line_y) * sin
+        across = (y - line_y) * cos - (x - line_x) * sin
+        last = self.last_sample
+        self.last_sample = (times[-1], along[-1], across[-1])
+        if last is not None:
+            times = np.concatenate(([last[0]], times))
+            along = np.concatenate(([last[1]], along))
+            across = np.concatenate(([last[2]], across))
+
+        # Samples right before the car moves from behind the line onto or past it.
+        before = np.flatnonzero((along[:-1] < 0) & (along[1:] >= 0))
+        fraction = -along[before] / (along[before + 1] - along[before])
+        crossing_across = across[before] + fraction * (across[before + 1] - across[before])
+        crossing_times = times[before] + fraction * (times[before + 1] - times[before])
+        on_line = np.abs(crossing_across) <= START_LINE_HALF_WIDTH
+        self.crossings.extend(int(time) for time in crossing_times[on_line])
+
+    def finish(self):
+        """
+        Returns every visit and crossing of the run.
+
+        :return: (visits, crossings): a list of (cell_x, cell_y, start_time,
+            end_time) and a list of crossing times, times in ns.
+        """
+        visits = list(self.visits)
+        if self.open_visit is not None:
+            visits.append(tuple(self.open_visit))
+        return visits, list(self.crossings)
+
+
+def get_cell_range(low, high):
+    """Returns the first and last grid cell index covering [low, high] on one axis."""
+    return (
+        math.floor(low / TRAJECTORY_CELL_SIZE),
+        math.floor(high / TRAJECTORY_CELL_SIZE),
+    )
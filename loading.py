@@ -4,6 +4,7 @@ import os
 from rclpy.serialization import deserialize_message
 from rosidl_runtime_py.utilities import get_message
 import rosbag2_py
+from mcap.reader import make_reader
 
 # Database Configuration
 DB_CONFIG = {
@@ -38,7 +39,18 @@ def extract_value(msg, expected_type):
     return None
 
 def get_rosbag_start_end_time(input_bag):
-    """Gets the first and last timestamp in the rosbag."""
+    """Gets the first and last timestamp in the rosbag from its MCAP summary."""
+    try:
+        with open(input_bag, "rb") as f:
+            summary = make_reader(f).get_summary()
+    except Exception:
+        summary = None
+
+    if summary is not None and summary.statistics is not None and summary.statistics.message_count:
+        statistics = summary.statistics
+        return statistics.message_start_time / 1e9, statistics.message_end_time / 1e9
+
+    # No summary (e.g. an interrupted recording): fall back to scanning the bag.
     reader = rosbag2_py.SequentialReader()
     reader.open(
         rosbag2_py.StorageOptions(uri=input_bag, storage_id="mcap"),
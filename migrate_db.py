@@ -0,0 +1,73 @@
+import psycopg2
+import os
+import glob
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+
+def get_migrations():
+    """Returns (version, path) of every migration file, in the order they apply."""
+    paths = sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql")))
+    return [(os.path.splitext(os.path.basename(path))[0], path) for path in paths]
+
+
+def mark_all_applied(cur):
+    """Records every migration as applied, for a database created from schema.sql."""
+    for version, _ in get_migrations():
+        cur.execute(
+            "INSERT INTO schema_migrations (version) VALUES (%s) ON CONFLICT DO NOTHING",
+            (version,),
+        )
+
+
+def migrate():
+    host = "localhost"
+    port = 5432
+    user = "postgres"
+    password = "password"
+    dbname = "autonomous_db"
+
+    conn = psycopg2.connect(
+        dbname=dbname,
+        user=user,
+        password=password,
+        host=host,
+        port=port
+    )
+    cur = conn.cursor()
+
+    # Databases created before migrations were tracked have no table for them yet
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version      TEXT PRIMARY KEY,
+            applied_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    conn.commit()
+
+    cur.execute("SELECT version FROM schema_migrations")
+    applied = {row[0] for row in cur.fetchall()}
+
+    pending = [(version, path) for version, path in get_migrations() if version not in applied]
+    if not pending:
+        print("Database schema is up to date.")
+
+    # Each migration runs in its own transaction, together with its bookkeeping row
+    for version, path in pending:
+        with open(path, "r") as f:
+            sql_script = f.read()
+        try:
+            cur.execute(sql_script)
+            cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Error: Migration {version} failed and was rolled back: {e}")
+            break
+        print(f"Applied migration {version}.")
+
+    cur.close()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,26 @@
+-- Adds the bookkeeping of resumable loads (see schema.sql): the fingerprint of
+-- the bag of every run, whether the run is completely loaded, and the per-topic
+-- checkpoints of an interrupted load. Runs loaded before this migration have no
+-- fingerprint, so loading their bag again creates a new run.
+
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS bag_fingerprint TEXT UNIQUE;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'runs' AND column_name = 'completed'
+    ) THEN
+        ALTER TABLE runs ADD COLUMN completed BOOLEAN NOT NULL DEFAULT FALSE;
+        -- Earlier loads had no checkpoints, so their runs count as complete.
+        UPDATE runs SET completed = TRUE;
+    END IF;
+END $$;
+
+-- run_checkpoints (last loaded message time per topic, in ns, for resuming a load)
+CREATE TABLE IF NOT EXISTS run_checkpoints (
+    run_id       INT NOT NULL REFERENCES runs(run_id),
+    topic        TEXT NOT NULL,
+    last_time    BIGINT NOT NULL,
+    PRIMARY KEY (run_id, topic)
+);
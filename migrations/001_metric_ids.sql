@@ -0,0 +1,96 @@
+-- Moves the narrow metric tables from a TEXT metric name per row to a SMALLINT
+-- metric_id into the metrics dictionary. The data is copied into new
+-- *_values hypertables, and views under the old table names keep the old
+-- columns for existing queries and dashboards.
+
+CREATE TABLE IF NOT EXISTS metrics (
+    metric_id    SMALLSERIAL PRIMARY KEY,
+    metric_name  TEXT NOT NULL UNIQUE
+);
+
+INSERT INTO metrics (metric_name)
+SELECT DISTINCT metric FROM perception
+UNION SELECT DISTINCT metric FROM state_estimation_pred_corr
+UNION SELECT DISTINCT metric FROM planning
+UNION SELECT DISTINCT metric FROM sensor_data
+ORDER BY 1
+ON CONFLICT (metric_name) DO NOTHING;
+
+-- perception
+CREATE TABLE perception_values (
+    time              TIMESTAMPTZ NOT NULL,
+    run_id            INT NOT NULL REFERENCES runs(run_id),
+    metric_id         SMALLINT NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
+);
+SELECT create_hypertable('perception_values', 'time');
+INSERT INTO perception_values (time, run_id, metric_id, metric_value)
+SELECT t.time, t.run_id, m.metric_id, t.metric_value
+FROM perception t JOIN metrics m ON m.metric_name = t.metric;
+DROP TABLE perception;
+
+-- state_estimation_pred_corr
+CREATE TABLE state_estimation_pred_corr_values (
+    time              TIMESTAMPTZ NOT NULL,
+    run_id            INT NOT NULL REFERENCES runs(run_id),
+    metric_id         SMALLINT NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
+);
+SELECT create_hypertable('state_estimation_pred_corr_values', 'time');
+INSERT INTO state_estimation_pred_corr_values (time, run_id, metric_id, metric_value)
+SELECT t.time, t.run_id, m.metric_id, t.metric_value
+FROM state_estimation_pred_corr t JOIN metrics m ON m.metric_name = t.metric;
+DROP TABLE state_estimation_pred_corr;
+
+-- planning
+CREATE TABLE planning_values (
+    time              TIMESTAMPTZ NOT NULL,
+    run_id            INT NOT NULL REFERENCES runs(run_id),
+    metric_id         SMALLINT NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
+);
+SELECT create_hypertable('planning_values', 'time');
+INSERT INTO planning_values (time, run_id, metric_id, metric_value)
+SELECT t.time, t.run_id, m.metric_id, t.metric_value
+FROM planning t JOIN metrics m ON m.metric_name = t.metric;
+DROP TABLE planning;
+
+-- sensor data
+CREATE TABLE sensor_data_values (
+    time              TIMESTAMPTZ NOT NULL,
+    run_id            INT NOT NULL REFERENCES runs(run_id),
+    metric_id         SMALLINT NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
+);
+SELECT create_hypertable('sensor_data_values', 'time');
+INSERT INTO sensor_data_values (time, run_id, metric_id, metric_value)
+SELECT t.time, t.run_id, m.metric_id, t.metric_value
+FROM sensor_data t JOIN metrics m ON m.metric_name = t.metric;
+DROP TABLE sensor_data;
+
+-- Per-run lookups of one metric, e.g. the execution time of a run
+CREATE INDEX perception_values_run_metric_idx ON perception_values (run_id, metric_id, time DESC);
+CREATE INDEX state_estimation_pred_corr_values_run_metric_idx ON state_estimation_pred_corr_values (run_id, metric_id, time DESC);
+CREATE INDEX planning_values_run_metric_idx ON planning_values (run_id, metric_id, time DESC);
+CREATE INDEX sensor_data_values_run_metric_idx ON sensor_data_values (run_id, metric_id, time DESC);
+
+-- Views with the metric names, under the original table names
+CREATE VIEW perception AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM perception_values v JOIN metrics m USING (metric_id);
+
+CREATE VIEW state_estimation_pred_corr AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM state_estimation_pred_corr_values v JOIN metrics m USING (metric_id);
+
+CREATE VIEW planning AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM planning_values v JOIN metrics m USING (metric_id);
+
+CREATE VIEW sensor_data AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM sensor_data_values v JOIN metrics m USING (metric_id);
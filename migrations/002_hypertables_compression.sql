@@ -0,0 +1,43 @@
+-- Converts the IMU tables to hypertables, sets the chunk interval of every
+-- time-series table and enables native compression with a compression policy
+-- (see schema.sql). New chunk intervals only apply to chunks created from now on.
+
+SELECT create_hypertable('imu_acceleration', 'time', chunk_time_interval => INTERVAL '1 hour', migrate_data => TRUE, if_not_exists => TRUE);
+SELECT create_hypertable('imu_angular_velocity', 'time', chunk_time_interval => INTERVAL '1 hour', migrate_data => TRUE, if_not_exists => TRUE);
+SELECT create_hypertable('imu_euler_angles', 'time', chunk_time_interval => INTERVAL '1 hour', migrate_data => TRUE, if_not_exists => TRUE);
+SELECT create_hypertable('imu_quaternion', 'time', chunk_time_interval => INTERVAL '1 hour', migrate_data => TRUE, if_not_exists => TRUE);
+
+SELECT set_chunk_time_interval('perception_values', INTERVAL '1 day');
+SELECT set_chunk_time_interval('state_estimation_pred_corr_values', INTERVAL '1 day');
+SELECT set_chunk_time_interval('state_estimation_state', INTERVAL '1 day');
+SELECT set_chunk_time_interval('state_estimation_map', INTERVAL '1 day');
+SELECT set_chunk_time_interval('planning_values', INTERVAL '1 day');
+SELECT set_chunk_time_interval('control', INTERVAL '1 day');
+SELECT set_chunk_time_interval('control_metrics', INTERVAL '1 day');
+SELECT set_chunk_time_interval('sensor_data_values', INTERVAL '1 day');
+
+ALTER TABLE perception_values SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id, metric_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE state_estimation_pred_corr_values SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id, metric_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE planning_values SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id, metric_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE sensor_data_values SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id, metric_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE state_estimation_state SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE state_estimation_map SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE control SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE control_metrics SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE imu_acceleration SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE imu_angular_velocity SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE imu_euler_angles SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE imu_quaternion SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+
+SELECT add_compression_policy('perception_values', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('state_estimation_pred_corr_values', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('state_estimation_state', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('state_estimation_map', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('planning_values', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('control', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('control_metrics', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('sensor_data_values', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('imu_acceleration', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('imu_angular_velocity', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('imu_euler_angles', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_compression_policy('imu_quaternion', INTERVAL '7 days', if_not_exists => TRUE);
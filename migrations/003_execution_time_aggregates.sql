@@ -0,0 +1,174 @@
+-- Adds the continuous aggregates of the execution times (see schema.sql). The
+-- policies materialize the existing rows in the background.
+
+CREATE EXTENSION IF NOT EXISTS timescaledb_toolkit;
+
+CREATE MATERIALIZED VIEW perception_values_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 second', time) AS bucket, run_id, metric_id,
+       min(metric_value) AS min_value, max(metric_value) AS max_value,
+       sum(metric_value) AS sum_value, count(metric_value) AS sample_count,
+       percentile_agg(metric_value) AS percentiles
+FROM perception_values
+GROUP BY bucket, run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW state_estimation_pred_corr_values_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 second', time) AS bucket, run_id, metric_id,
+       min(metric_value) AS min_value, max(metric_value) AS max_value,
+       sum(metric_value) AS sum_value, count(metric_value) AS sample_count,
+       percentile_agg(metric_value) AS percentiles
+FROM state_estimation_pred_corr_values
+GROUP BY bucket, run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW planning_values_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 second', time) AS bucket, run_id, metric_id,
+       min(metric_value) AS min_value, max(metric_value) AS max_value,
+       sum(metric_value) AS sum_value, count(metric_value) AS sample_count,
+       percentile_agg(metric_value) AS percentiles
+FROM planning_values
+GROUP BY bucket, run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW control_metrics_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 second', time) AS bucket, run_id,
+       min(execution_time) AS min_value, max(execution_time) AS max_value,
+       sum(execution_time) AS sum_value, count(execution_time) AS sample_count,
+       percentile_agg(execution_time) AS percentiles
+FROM control_metrics
+GROUP BY bucket, run_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW perception_values_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 minute', bucket) AS bucket, run_id, metric_id,
+       min(min_value) AS min_value, max(max_value) AS max_value,
+       sum(sum_value) AS sum_value, sum(sample_count) AS sample_count,
+       rollup(percentiles) AS percentiles
+FROM perception_values_1s
+GROUP BY time_bucket(INTERVAL '1 minute', bucket), run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW state_estimation_pred_corr_values_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 minute', bucket) AS bucket, run_id, metric_id,
+       min(min_value) AS min_value, max(max_value) AS max_value,
+       sum(sum_value) AS sum_value, sum(sample_count) AS sample_count,
+       rollup(percentiles) AS percentiles
+FROM state_estimation_pred_corr_values_1s
+GROUP BY time_bucket(INTERVAL '1 minute', bucket), run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW planning_values_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 minute', bucket) AS bucket, run_id, metric_id,
+       min(min_value) AS min_value, max(max_value) AS max_value,
+       sum(sum_value) AS sum_value, sum(sample_count) AS sample_count,
+       rollup(percentiles) AS percentiles
+FROM planning_values_1s
+GROUP BY time_bucket(INTERVAL '1 minute', bucket), run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW control_metrics_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 minute', bucket) AS bucket, run_id,
+       min(min_value) AS min_value, max(max_value) AS max_value,
+       sum(sum_value) AS sum_value, sum(sample_count) AS sample_count,
+       rollup(percentiles) AS percentiles
+FROM control_metrics_1s
+GROUP BY time_bucket(INTERVAL '1 minute', bucket), run_id
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('perception_values_1s', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('perception_values_1m', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('state_estimation_pred_corr_values_1s', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('state_estimation_pred_corr_values_1m', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('planning_values_1s', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('planning_values_1m', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('control_metrics_1s', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('control_metrics_1m', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+
+CREATE OR REPLACE VIEW execution_time_1s AS
+SELECT a.bucket, a.run_id, 'perception' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM perception_values_1s a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+UNION ALL
+SELECT a.bucket, a.run_id, 'state_estimation' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM state_estimation_pred_corr_values_1s a JOIN metrics m USING (metric_id)
+UNION ALL
+SELECT a.bucket, a.run_id, 'planning' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM planning_values_1s a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+UNION ALL
+SELECT a.bucket, a.run_id, 'control' AS subsystem, 'execution_time' AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM control_metrics_1s a;
+
+CREATE OR REPLACE VIEW execution_time_1m AS
+SELECT a.bucket, a.run_id, 'perception' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM perception_values_1m a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+UNION ALL
+SELECT a.bucket, a.run_id, 'state_estimation' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM state_estimation_pred_corr_values_1m a JOIN metrics m USING (metric_id)
+UNION ALL
+SELECT a.bucket, a.run_id, 'planning' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM planning_values_1m a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+UNION ALL
+SELECT a.bucket, a.run_id, 'control' AS subsystem, 'execution_time' AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM control_metrics_1m a;
+
+CREATE OR REPLACE VIEW execution_time_per_run AS
+SELECT a.run_id, 'perception' AS subsystem, m.metric_name AS metric,
+       min(a.min_value) AS min_value, max(a.max_value) AS max_value,
+       sum(a.sum_value) / NULLIF(sum(a.sample_count), 0) AS avg_value,
+       approx_percentile(0.95, rollup(a.percentiles)) AS p95_value,
+       sum(a.sample_count) AS sample_count
+FROM perception_values_1m a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+GROUP BY a.run_id, m.metric_name
+UNION ALL
+SELECT a.run_id, 'state_estimation' AS subsystem, m.metric_name AS metric,
+       min(a.min_value) AS min_value, max(a.max_value) AS max_value,
+       sum(a.sum_value) / NULLIF(sum(a.sample_count), 0) AS avg_value,
+       approx_percentile(0.95, rollup(a.percentiles)) AS p95_value,
+       sum(a.sample_count) AS sample_count
+FROM state_estimation_pred_corr_values_1m a JOIN metrics m USING (metric_id)
+GROUP BY a.run_id, m.metric_name
+UNION ALL
+SELECT a.run_id, 'planning' AS subsystem, m.metric_name AS metric,
+       min(a.min_value) AS min_value, max(a.max_value) AS max_value,
+       sum(a.sum_value) / NULLIF(sum(a.sample_count), 0) AS avg_value,
+       approx_percentile(0.95, rollup(a.percentiles)) AS p95_value,
+       sum(a.sample_count) AS sample_count
+FROM planning_values_1m a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+GROUP BY a.run_id, m.metric_name
+UNION ALL
+SELECT a.run_id, 'control' AS subsystem, 'execution_time' AS metric,
+       min(a.min_value) AS min_value, max(a.max_value) AS max_value,
+       sum(a.sum_value) / NULLIF(sum(a.sample_count), 0) AS avg_value,
+       approx_percentile(0.95, rollup(a.percentiles)) AS p95_value,
+       sum(a.sample_count) AS sample_count
+FROM control_metrics_1m a
+GROUP BY a.run_id;
@@ -0,0 +1,46 @@
+-- Adds the per-run statistics gathered during ingestion (see schema.sql). Runs
+-- loaded before this migration have no summary until they are loaded again.
+
+-- run_summary (statistics of every series of a run, gathered while loading it:
+-- one row per value column, or per metric for the *_values tables)
+CREATE TABLE IF NOT EXISTS run_summary (
+    run_id       INT NOT NULL REFERENCES runs(run_id),
+    table_name   TEXT NOT NULL,
+    series       TEXT NOT NULL,
+    row_count    BIGINT NOT NULL,
+    value_count  BIGINT NOT NULL,
+    first_time   TIMESTAMPTZ,
+    last_time    TIMESTAMPTZ,
+    rate_hz      DOUBLE PRECISION,
+    min_value    DOUBLE PRECISION,
+    max_value    DOUBLE PRECISION,
+    mean_value   DOUBLE PRECISION,
+    variance     DOUBLE PRECISION,
+    p50          DOUBLE PRECISION,
+    p95          DOUBLE PRECISION,
+    p99          DOUBLE PRECISION,
+    sketch       JSONB NOT NULL,
+    PRIMARY KEY (run_id, table_name, series)
+);
+
+-- Run lists and overviews from run_summary, without touching the hypertables.
+-- Every series of a wide table has one value per row, so a table's row count
+-- is that of its largest series; the *_values tables hold one series per
+-- metric, so theirs is the sum of their series.
+CREATE OR REPLACE VIEW run_table_summary AS
+SELECT run_id, table_name,
+       CASE WHEN table_name LIKE '%\_values' THEN sum(row_count) ELSE max(row_count) END AS row_count,
+       min(first_time) AS first_time,
+       max(last_time) AS last_time,
+       CASE WHEN table_name LIKE '%\_values' THEN sum(rate_hz) ELSE max(rate_hz) END AS rate_hz
+FROM run_summary
+GROUP BY run_id, table_name;
+
+CREATE OR REPLACE VIEW run_overview AS
+SELECT r.run_id, r.run_name, r.run_type, r.slam_type, r.start_time, r.end_time,
+       r.end_time - r.start_time AS duration, r.completed,
+       count(t.table_name) AS table_count,
+       coalesce(sum(t.row_count), 0) AS row_count
+FROM runs r
+LEFT JOIN run_table_summary t USING (run_id)
+GROUP BY r.run_id;
@@ -0,0 +1,49 @@
+-- Adds the trajectory grid and the lap crossings built when a run is loaded (see
+-- schema.sql). Runs loaded before this migration are indexed by calling
+-- index_trajectory(run_id) from database/postgres_sink.py.
+
+-- trajectory_cells (the state_estimation_state trajectory on a grid of
+-- TRAJECTORY_CELL_SIZE squares: one row per stay of the car in a square, with
+-- the times of its first and last sample there)
+CREATE TABLE IF NOT EXISTS trajectory_cells (
+    run_id       INT NOT NULL REFERENCES runs(run_id),
+    cell_x       INT NOT NULL,
+    cell_y       INT NOT NULL,
+    start_time   TIMESTAMPTZ NOT NULL,
+    end_time     TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (run_id, start_time, cell_x, cell_y)
+);
+CREATE INDEX IF NOT EXISTS trajectory_cells_cell_idx ON trajectory_cells (cell_x, cell_y);
+
+-- lap_crossings (times the car crossed the start/finish line, see run_laps)
+CREATE TABLE IF NOT EXISTS lap_crossings (
+    run_id       INT NOT NULL REFERENCES runs(run_id),
+    time         TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (run_id, time)
+);
+
+-- Laps of every run: lap 1 starts with the trajectory, every crossing of the
+-- start/finish line ends a lap. Crossings within 5 s of the previous one are
+-- noise around the line and skipped; the part after the last crossing is no lap.
+CREATE OR REPLACE VIEW run_laps AS
+WITH boundaries AS (
+    SELECT run_id, min(start_time) AS time FROM trajectory_cells GROUP BY run_id
+    UNION
+    SELECT run_id, time FROM lap_crossings
+), spaced AS (
+    SELECT run_id, time,
+           time - lag(time) OVER (PARTITION BY run_id ORDER BY time) AS gap
+    FROM boundaries
+), laps AS (
+    SELECT run_id,
+           row_number() OVER w AS lap,
+           time AS start_time,
+           lead(time) OVER w AS end_time
+    FROM spaced
+    WHERE gap IS NULL OR gap >= INTERVAL '5 seconds'
+    WINDOW w AS (PARTITION BY run_id ORDER BY time)
+)
+SELECT run_id, lap, start_time, end_time,
+       EXTRACT(EPOCH FROM end_time - start_time) AS lap_time
+FROM laps
+WHERE end_time IS NOT NULL;
@@ -0,0 +1,16 @@
+-- Replaces the age-based compression policies of 002 with compression of a run's
+-- chunks once the run is completely loaded (see schema.sql). Chunks that are
+-- already compressed stay compressed.
+
+SELECT remove_compression_policy('perception_values', if_exists => TRUE);
+SELECT remove_compression_policy('state_estimation_pred_corr_values', if_exists => TRUE);
+SELECT remove_compression_policy('state_estimation_state', if_exists => TRUE);
+SELECT remove_compression_policy('state_estimation_map', if_exists => TRUE);
+SELECT remove_compression_policy('planning_values', if_exists => TRUE);
+SELECT remove_compression_policy('control', if_exists => TRUE);
+SELECT remove_compression_policy('control_metrics', if_exists => TRUE);
+SELECT remove_compression_policy('sensor_data_values', if_exists => TRUE);
+SELECT remove_compression_policy('imu_acceleration', if_exists => TRUE);
+SELECT remove_compression_policy('imu_angular_velocity', if_exists => TRUE);
+SELECT remove_compression_policy('imu_euler_angles', if_exists => TRUE);
+SELECT remove_compression_policy('imu_quaternion', if_exists => TRUE);
@@ -0,0 +1,12 @@
+-- Turns off real-time aggregation of the continuous aggregates of 003 (see
+-- schema.sql), so that overview queries only read materialized buckets. The
+-- loader refreshes a run's buckets as soon as the run is completely loaded.
+
+ALTER MATERIALIZED VIEW perception_values_1s SET (timescaledb.materialized_only = true);
+ALTER MATERIALIZED VIEW state_estimation_pred_corr_values_1s SET (timescaledb.materialized_only = true);
+ALTER MATERIALIZED VIEW planning_values_1s SET (timescaledb.materialized_only = true);
+ALTER MATERIALIZED VIEW control_metrics_1s SET (timescaledb.materialized_only = true);
+ALTER MATERIALIZED VIEW perception_values_1m SET (timescaledb.materialized_only = true);
+ALTER MATERIALIZED VIEW state_estimation_pred_corr_values_1m SET (timescaledb.materialized_only = true);
+ALTER MATERIALIZED VIEW planning_values_1m SET (timescaledb.materialized_only = true);
+ALTER MATERIALIZED VIEW control_metrics_1m SET (timescaledb.materialized_only = true);
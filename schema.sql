@@ -1,5 +1,7 @@
 -- Enable the TimescaleDB extension
 CREATE EXTENSION IF NOT EXISTS timescaledb;
+-- Percentile sketches for the continuous aggregates
+CREATE EXTENSION IF NOT EXISTS timescaledb_toolkit;
 
 -- runs (metadata table)
 CREATE TABLE IF NOT EXISTS runs (
@@ -10,25 +12,89 @@ CREATE TABLE IF NOT EXISTS runs (
     slam_type    TEXT,
     rosbag_path  TEXT,
     run_type     TEXT,
-    doc_url      TEXT
+    doc_url      TEXT,
+    bag_fingerprint TEXT UNIQUE,
+    completed    BOOLEAN NOT NULL DEFAULT FALSE
 );
 
--- perception
-CREATE TABLE IF NOT EXISTS perception (
+-- schema_migrations (files in migrations/ already applied to this database)
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version      TEXT PRIMARY KEY,
+    applied_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- metrics (dictionary of the metric names used by the narrow metric tables)
+CREATE TABLE IF NOT EXISTS metrics (
+    metric_id    SMALLSERIAL PRIMARY KEY,
+    metric_name  TEXT NOT NULL UNIQUE
+);
+
+-- run_checkpoints (last loaded message time per topic, in ns, for resuming a load)
+CREATE TABLE IF NOT EXISTS run_checkpoints (
+    run_id       INT NOT NULL REFERENCES runs(run_id),
+    topic        TEXT NOT NULL,
+    last_time    BIGINT NOT NULL,
+    PRIMARY KEY (run_id, topic)
+);
+
+-- run_summary (statistics of every series of a run, gathered while loading it:
+-- one row per value column, or per metric for the *_values tables)
+CREATE TABLE IF NOT EXISTS run_summary (
+    run_id       INT NOT NULL REFERENCES runs(run_id),
+    table_name   TEXT NOT NULL,
+    series       TEXT NOT NULL,
+    row_count    BIGINT NOT NULL,
+    value_count  BIGINT NOT NULL,
+    first_time   TIMESTAMPTZ,
+    last_time    TIMESTAMPTZ,
+    rate_hz      DOUBLE PRECISION,
+    min_value    DOUBLE PRECISION,
+    max_value    DOUBLE PRECISION,
+    mean_value   DOUBLE PRECISION,
+    variance     DOUBLE PRECISION,
+    p50          DOUBLE PRECISION,
+    p95          DOUBLE PRECISION,
+    p99          DOUBLE PRECISION,
+    sketch       JSONB NOT NULL,
+    PRIMARY KEY (run_id, table_name, series)
+);
+
+-- trajectory_cells (the state_estimation_state trajectory on a grid of
+-- TRAJECTORY_CELL_SIZE squares: one row per stay of the car in a square, with
+-- the times of its first and last sample there)
+CREATE TABLE IF NOT EXISTS trajectory_cells (
+    run_id       INT NOT NULL REFERENCES runs(run_id),
+    cell_x       INT NOT NULL,
+    cell_y       INT NOT NULL,
+    start_time   TIMESTAMPTZ NOT NULL,
+    end_time     TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (run_id, start_time, cell_x, cell_y)
+);
+CREATE INDEX IF NOT EXISTS trajectory_cells_cell_idx ON trajectory_cells (cell_x, cell_y);
+
+-- lap_crossings (times the car crossed the start/finish line, see run_laps)
+CREATE TABLE IF NOT EXISTS lap_crossings (
+    run_id       INT NOT NULL REFERENCES runs(run_id),
+    time         TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (run_id, time)
+);
+
+-- perception_values
+CREATE TABLE IF NOT EXISTS perception_values (
     time              TIMESTAMPTZ NOT NULL,
     run_id            INT NOT NULL REFERENCES runs(run_id),
-    metric TEXT,
-    metric_value REAL,
-    PRIMARY KEY (time, run_id, metric)
+    metric_id         SMALLINT NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
 );
 
--- state_estimation_pred_corr
-CREATE TABLE IF NOT EXISTS state_estimation_pred_corr (
-    time                TIMESTAMPTZ NOT NULL,
-    run_id              INT NOT NULL REFERENCES runs(run_id),
-    metric TEXT,
-    metric_value REAL,
-    PRIMARY KEY (time, run_id, metric)
+-- state_estimation_pred_corr_values
+CREATE TABLE IF NOT EXISTS state_estimation_pred_corr_values (
+    time              TIMESTAMPTZ NOT NULL,
+    run_id            INT NOT NULL REFERENCES runs(run_id),
+    metric_id         SMALLINT NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
 );
 
 -- state_estimation_state
@@ -52,13 +118,13 @@ CREATE TABLE IF NOT EXISTS state_estimation_map (
     PRIMARY KEY (time, run_id)
 );
 
--- planning
-CREATE TABLE IF NOT EXISTS planning (
+-- planning_values
+CREATE TABLE IF NOT EXISTS planning_values (
     time              TIMESTAMPTZ NOT NULL,
     run_id            INT NOT NULL REFERENCES runs(run_id),
-    metric TEXT,
-    metric_value REAL,
-    PRIMARY KEY (time, run_id, metric)
+    metric_id         SMALLINT NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
 );
 
 -- control
@@ -85,12 +151,12 @@ CREATE TABLE IF NOT EXISTS control_metrics (
 );
 
 -- sensor data
-CREATE TABLE IF NOT EXISTS sensor_data (
-    time                TIMESTAMPTZ NOT NULL,
-    run_id              INT NOT NULL REFERENCES runs(run_id),
-    metric         TEXT,
-    metric_value        REAL,
-    PRIMARY KEY (time, run_id, metric)
+CREATE TABLE IF NOT EXISTS sensor_data_values (
+    time              TIMESTAMPTZ NOT NULL,
+    run_id            INT NOT NULL REFERENCES runs(run_id),
+    metric_id         SMALLINT NOT NULL REFERENCES metrics(metric_id),
+    metric_value      REAL,
+    PRIMARY KEY (time, run_id, metric_id)
 );
 
 -- IMU acceleration
@@ -177,13 +243,287 @@ CREATE TABLE IF NOT EXISTS control_parameters (
     param_2             INT NOT NULL        
 );
 
--- Convert certain tables to hypertables
-SELECT create_hypertable('perception', 'time', if_not_exists => TRUE);
-SELECT create_hypertable('state_estimation_pred_corr', 'time', if_not_exists => TRUE);
-SELECT create_hypertable('state_estimation_state', 'time', if_not_exists => TRUE);
-SELECT create_hypertable('state_estimation_map', 'time', if_not_exists => TRUE);
-SELECT create_hypertable('planning', 'time', if_not_exists => TRUE);
-SELECT create_hypertable('control', 'time', if_not_exists => TRUE);
-SELECT create_hypertable('control_metrics', 'time', if_not_exists => TRUE);
-SELECT create_hypertable('sensor_data', 'time', if_not_exists => TRUE);
+-- Convert every time-series table to a hypertable. A bag covers minutes to an
+-- hour of a single test day, so one-day chunks keep a run in one or two chunks;
+-- the IMU tables get one-hour chunks since they hold the most rows per second.
+SELECT create_hypertable('perception_values', 'time', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT create_hypertable('state_estimation_pred_corr_values', 'time', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT create_hypertable('state_estimation_state', 'time', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT create_hypertable('state_estimation_map', 'time', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT create_hypertable('planning_values', 'time', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT create_hypertable('control', 'time', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT create_hypertable('control_metrics', 'time', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT create_hypertable('sensor_data_values', 'time', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT create_hypertable('imu_acceleration', 'time', chunk_time_interval => INTERVAL '1 hour', if_not_exists => TRUE);
+SELECT create_hypertable('imu_angular_velocity', 'time', chunk_time_interval => INTERVAL '1 hour', if_not_exists => TRUE);
+SELECT create_hypertable('imu_euler_angles', 'time', chunk_time_interval => INTERVAL '1 hour', if_not_exists => TRUE);
+SELECT create_hypertable('imu_quaternion', 'time', chunk_time_interval => INTERVAL '1 hour', if_not_exists => TRUE);
+
+-- Native compression: one segment per run (and metric), ordered by time, so a
+-- per-run scan only decompresses that run's segments. There is no age-based
+-- compression policy: bags are loaded long after they were recorded, so a policy
+-- would compress chunks while they are still being loaded. Instead the loader
+-- compresses a run's chunks once the run is completely loaded (see
+-- postgres_sink.compress_run_chunks), skipping chunks that an incomplete run
+-- still writes into.
+ALTER TABLE perception_values SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id, metric_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE state_estimation_pred_corr_values SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id, metric_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE planning_values SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id, metric_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE sensor_data_values SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id, metric_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE state_estimation_state SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE state_estimation_map SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE control SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE control_metrics SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE imu_acceleration SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE imu_angular_velocity SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE imu_euler_angles SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+ALTER TABLE imu_quaternion SET (timescaledb.compress, timescaledb.compress_segmentby = 'run_id', timescaledb.compress_orderby = 'time');
+
+
+-- Per-run lookups of one metric, e.g. the execution time of a run
+CREATE INDEX IF NOT EXISTS perception_values_run_metric_idx ON perception_values (run_id, metric_id, time DESC);
+CREATE INDEX IF NOT EXISTS state_estimation_pred_corr_values_run_metric_idx ON state_estimation_pred_corr_values (run_id, metric_id, time DESC);
+CREATE INDEX IF NOT EXISTS planning_values_run_metric_idx ON planning_values (run_id, metric_id, time DESC);
+CREATE INDEX IF NOT EXISTS sensor_data_values_run_metric_idx ON sensor_data_values (run_id, metric_id, time DESC);
+
+-- Views with the metric names, under the original table names
+CREATE OR REPLACE VIEW perception AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM perception_values v JOIN metrics m USING (metric_id);
+
+CREATE OR REPLACE VIEW state_estimation_pred_corr AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM state_estimation_pred_corr_values v JOIN metrics m USING (metric_id);
+
+CREATE OR REPLACE VIEW planning AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM planning_values v JOIN metrics m USING (metric_id);
+
+CREATE OR REPLACE VIEW sensor_data AS
+SELECT v.time, v.run_id, m.metric_name AS metric, v.metric_value
+FROM sensor_data_values v JOIN metrics m USING (metric_id);
+
+-- Continuous aggregates of the execution times (and other narrow metrics) per
+-- run and metric, in 1-second buckets and rolled up into 1-minute buckets.
+-- They are materialized only, so queries never read the raw hypertables: a run's
+-- time range is refreshed as soon as the run is completely loaded (see
+-- postgres_sink.refresh_run_aggregates), and until then its buckets are missing.
+-- The policies refresh only invalidated ranges, over the whole history since
+-- bags are often loaded after they were recorded.
+CREATE MATERIALIZED VIEW IF NOT EXISTS perception_values_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 second', time) AS bucket, run_id, metric_id,
+       min(metric_value) AS min_value, max(metric_value) AS max_value,
+       sum(metric_value) AS sum_value, count(metric_value) AS sample_count,
+       percentile_agg(metric_value) AS percentiles
+FROM perception_values
+GROUP BY bucket, run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS state_estimation_pred_corr_values_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 second', time) AS bucket, run_id, metric_id,
+       min(metric_value) AS min_value, max(metric_value) AS max_value,
+       sum(metric_value) AS sum_value, count(metric_value) AS sample_count,
+       percentile_agg(metric_value) AS percentiles
+FROM state_estimation_pred_corr_values
+GROUP BY bucket, run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS planning_values_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 second', time) AS bucket, run_id, metric_id,
+       min(metric_value) AS min_value, max(metric_value) AS max_value,
+       sum(metric_value) AS sum_value, count(metric_value) AS sample_count,
+       percentile_agg(metric_value) AS percentiles
+FROM planning_values
+GROUP BY bucket, run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS control_metrics_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 second', time) AS bucket, run_id,
+       min(execution_time) AS min_value, max(execution_time) AS max_value,
+       sum(execution_time) AS sum_value, count(execution_time) AS sample_count,
+       percentile_agg(execution_time) AS percentiles
+FROM control_metrics
+GROUP BY bucket, run_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS perception_values_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 minute', bucket) AS bucket, run_id, metric_id,
+       min(min_value) AS min_value, max(max_value) AS max_value,
+       sum(sum_value) AS sum_value, sum(sample_count) AS sample_count,
+       rollup(percentiles) AS percentiles
+FROM perception_values_1s
+GROUP BY time_bucket(INTERVAL '1 minute', bucket), run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS state_estimation_pred_corr_values_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 minute', bucket) AS bucket, run_id, metric_id,
+       min(min_value) AS min_value, max(max_value) AS max_value,
+       sum(sum_value) AS sum_value, sum(sample_count) AS sample_count,
+       rollup(percentiles) AS percentiles
+FROM state_estimation_pred_corr_values_1s
+GROUP BY time_bucket(INTERVAL '1 minute', bucket), run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS planning_values_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 minute', bucket) AS bucket, run_id, metric_id,
+       min(min_value) AS min_value, max(max_value) AS max_value,
+       sum(sum_value) AS sum_value, sum(sample_count) AS sample_count,
+       rollup(percentiles) AS percentiles
+FROM planning_values_1s
+GROUP BY time_bucket(INTERVAL '1 minute', bucket), run_id, metric_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS control_metrics_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+SELECT time_bucket(INTERVAL '1 minute', bucket) AS bucket, run_id,
+       min(min_value) AS min_value, max(max_value) AS max_value,
+       sum(sum_value) AS sum_value, sum(sample_count) AS sample_count,
+       rollup(percentiles) AS percentiles
+FROM control_metrics_1s
+GROUP BY time_bucket(INTERVAL '1 minute', bucket), run_id
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('perception_values_1s', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('perception_values_1m', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('state_estimation_pred_corr_values_1s', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('state_estimation_pred_corr_values_1m', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('planning_values_1s', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('planning_values_1m', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('control_metrics_1s', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('control_metrics_1m', start_offset => NULL, end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+
+CREATE OR REPLACE VIEW execution_time_1s AS
+SELECT a.bucket, a.run_id, 'perception' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM perception_values_1s a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+UNION ALL
+SELECT a.bucket, a.run_id, 'state_estimation' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM state_estimation_pred_corr_values_1s a JOIN metrics m USING (metric_id)
+UNION ALL
+SELECT a.bucket, a.run_id, 'planning' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM planning_values_1s a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+UNION ALL
+SELECT a.bucket, a.run_id, 'control' AS subsystem, 'execution_time' AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM control_metrics_1s a;
+
+CREATE OR REPLACE VIEW execution_time_1m AS
+SELECT a.bucket, a.run_id, 'perception' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM perception_values_1m a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+UNION ALL
+SELECT a.bucket, a.run_id, 'state_estimation' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM state_estimation_pred_corr_values_1m a JOIN metrics m USING (metric_id)
+UNION ALL
+SELECT a.bucket, a.run_id, 'planning' AS subsystem, m.metric_name AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM planning_values_1m a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+UNION ALL
+SELECT a.bucket, a.run_id, 'control' AS subsystem, 'execution_time' AS metric,
+       a.min_value, a.max_value, a.sum_value / NULLIF(a.sample_count, 0) AS avg_value,
+       approx_percentile(0.95, a.percentiles) AS p95_value, a.sample_count
+FROM control_metrics_1m a;
+
+CREATE OR REPLACE VIEW execution_time_per_run AS
+SELECT a.run_id, 'perception' AS subsystem, m.metric_name AS metric,
+       min(a.min_value) AS min_value, max(a.max_value) AS max_value,
+       sum(a.sum_value) / NULLIF(sum(a.sample_count), 0) AS avg_value,
+       approx_percentile(0.95, rollup(a.percentiles)) AS p95_value,
+       sum(a.sample_count) AS sample_count
+FROM perception_values_1m a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+GROUP BY a.run_id, m.metric_name
+UNION ALL
+SELECT a.run_id, 'state_estimation' AS subsystem, m.metric_name AS metric,
+       min(a.min_value) AS min_value, max(a.max_value) AS max_value,
+       sum(a.sum_value) / NULLIF(sum(a.sample_count), 0) AS avg_value,
+       approx_percentile(0.95, rollup(a.percentiles)) AS p95_value,
+       sum(a.sample_count) AS sample_count
+FROM state_estimation_pred_corr_values_1m a JOIN metrics m USING (metric_id)
+GROUP BY a.run_id, m.metric_name
+UNION ALL
+SELECT a.run_id, 'planning' AS subsystem, m.metric_name AS metric,
+       min(a.min_value) AS min_value, max(a.max_value) AS max_value,
+       sum(a.sum_value) / NULLIF(sum(a.sample_count), 0) AS avg_value,
+       approx_percentile(0.95, rollup(a.percentiles)) AS p95_value,
+       sum(a.sample_count) AS sample_count
+FROM planning_values_1m a JOIN metrics m USING (metric_id)
+WHERE m.metric_name = 'execution_time'
+GROUP BY a.run_id, m.metric_name
+UNION ALL
+SELECT a.run_id, 'control' AS subsystem, 'execution_time' AS metric,
+       min(a.min_value) AS min_value, max(a.max_value) AS max_value,
+       sum(a.sum_value) / NULLIF(sum(a.sample_count), 0) AS avg_value,
+       approx_percentile(0.95, rollup(a.percentiles)) AS p95_value,
+       sum(a.sample_count) AS sample_count
+FROM control_metrics_1m a
+GROUP BY a.run_id;
+
+-- Run lists and overviews from run_summary, without touching the hypertables.
+-- Every series of a wide table has one value per row, so a table's row count
+-- is that of its largest series; the *_values tables hold one series per
+-- metric, so theirs is the sum of their series.
+CREATE OR REPLACE VIEW run_table_summary AS
+SELECT run_id, table_name,
+       CASE WHEN table_name LIKE '%\_values' THEN sum(row_count) ELSE max(row_count) END AS row_count,
+       min(first_time) AS first_time,
+       max(last_time) AS last_time,
+       CASE WHEN table_name LIKE '%\_values' THEN sum(rate_hz) ELSE max(rate_hz) END AS rate_hz
+FROM run_summary
+GROUP BY run_id, table_name;
+
+CREATE OR REPLACE VIEW run_overview AS
+SELECT r.run_id, r.run_name, r.run_type, r.slam_type, r.start_time, r.end_time,
+       r.end_time - r.start_time AS duration, r.completed,
+       count(t.table_name) AS table_count,
+       coalesce(sum(t.row_count), 0) AS row_count
+FROM runs r
+LEFT JOIN run_table_summary t USING (run_id)
+GROUP BY r.run_id;
 
+-- Laps of every run: lap 1 starts with the trajectory, every crossing of the
+-- start/finish line ends a lap. Crossings within 5 s of the previous one are
+-- noise around the line and skipped; the part after the last crossing is no lap.
+CREATE OR REPLACE VIEW run_laps AS
+WITH boundaries AS (
+    SELECT run_id, min(start_time) AS time FROM trajectory_cells GROUP BY run_id
+    UNION
+    SELECT run_id, time FROM lap_crossings
+), spaced AS (
+    SELECT run_id, time,
+           time - lag(time) OVER (PARTITION BY run_id ORDER BY time) AS gap
+    FROM boundaries
+), laps AS (
+    SELECT run_id,
+           row_number() OVER w AS lap,
+           time AS start_time,
+           lead(time) OVER w AS end_time
+    FROM spaced
+    WHERE gap IS NULL OR gap >= INTERVAL '5 seconds'
+    WINDOW w AS (PARTITION BY run_id ORDER BY time)
+)
+SELECT run_id, lap, start_time, end_time,
+       EXTRACT(EPOCH FROM end_time - start_time) AS lap_time
+FROM laps
+WHERE end_time IS NOT NULL;
@@ -0,0 +1,30 @@
+import numpy as np
+from batch_writer import TableBuffer, format_times
+
+
+def test_format_times_rounds_to_the_microsecond():
+    times = np.array([0, 499, 500, 1_499, 1_500, 1_700_000_000_123_456_789], dtype=np.int64)
+    assert format_times(times).tolist() == [
+        "1970-01-01T00:00:00.000000Z",
+        "1970-01-01T00:00:00.000000Z",
+        "1970-01-01T00:00:00.000001Z",
+        "1970-01-01T00:00:00.000001Z",
+        "1970-01-01T00:00:00.000002Z",
+        "2023-11-14T22:13:20.123457Z",
+    ]
+
+
+def test_format_times_carries_into_the_next_second():
+    times = np.array([1_999_999_500], dtype=np.int64)
+    assert format_times(times).tolist() == ["1970-01-01T00:00:02.000000Z"]
+
+
+def test_copy_text_matches_rows():
+    buffer = TableBuffer("control")
+    buffer.append([1_000, 1, 0.5, -2.0])
+    buffer.append([2_000, 1, 1e-7, float("nan")])
+    arrays = buffer.to_arrays()
+    lines = buffer.to_copy_text(arrays).splitlines()
+    assert lines == ["\t".join(map(str, row)) for row in buffer.to_rows(arrays)]
+    assert lines[0] == "1970-01-01T00:00:00.000001Z\t1\t0.5\t-2.0"
+    assert TableBuffer("control").to_copy_text(TableBuffer("control").to_arrays()) == ""
@@ -0,0 +1,124 @@
+import struct
+import pytest
+from cdr_fast_path import build_fast_decoder
+
+FIELDS = {
+    "name": "string",
+    "flags": "sequence<uint8>",
+    "stamp": "int64",
+    "samples": "sequence<double>",
+    "count": "uint16",
+    "gain": "float",
+    "matrix": "double[2]",
+    "data": "double",
+}
+
+
+class FakeMessage:
+    @staticmethod
+    def get_fields_and_field_types():
+        return FIELDS
+
+
+class CdrBuffer:
+    """Writes CDR the way rmw does, aligned relative to the end of the header."""
+
+    def __init__(self, little_endian=True):
+        self.endian = "<" if little_endian else ">"
+        self.payload = bytearray()
+        self.header = bytes([0, 1 if little_endian else 0, 0, 0])
+
+    def align(self, size):
+        self.payload += bytes(-len(self.payload) % size)
+
+    def put(self, fmt, *values):
+        self.align(struct.calcsize(fmt[0]))
+        self.payload += struct.pack(self.endian + fmt, *values)
+
+    def put_string(self, text):
+        data = text.encode() + b"\0"
+        self.put("I", len(data))
+        self.payload += data
+
+    def put_sequence(self, fmt, values):
+        self.put("I", len(values))
+        if values:
+            self.put(fmt * len(values), *values)
+
+    def to_bytes(self):
+        return self.header + bytes(self.payload)
+
+
+def build_message(little_endian=True):
+    buffer = CdrBuffer(little_endian)
+    buffer.put_string("odd length")
+    buffer.put_sequence("B", [1, 2, 3])
+    buffer.put("q", -123456789012)
+    buffer.put_sequence("d", [0.5, 1.5])
+    buffer.put("H", 65000)
+    buffer.put("f", 0.25)
+    buffer.put("dd", 1.0, 2.0)
+    buffer.put("d", 3.75)
+    return buffer.to_bytes()
+
+
+@pytest.mark.parametrize("little_endian", [True, False])
+@pytest.mark.parametrize(
+    "field, expected",
+    [
+        ("stamp", -123456789012),
+        ("count", 65000),
+        ("gain", 0.25),
+        ("data", 3.75),
+    ],
+)
+def test_reads_scalar_after_skipped_fields(little_endian, field, expected):
+    decoder = build_fast_decoder(FakeMessage, field)
+    assert getattr(decoder(build_message(little_endian)), field) == expected
+
+
+def test_reads_sequence_length():
+    decoder = build_fast_decoder(FakeMessage, "samples")
+    assert len(decoder(build_message()).samples) == 2
+
+
+def test_empty_sequence_is_skipped():
+    buffer = CdrBuffer()
+    buffer.put_string("")
+    buffer.put_sequence("B", [])
+    buffer.put("q", 7)
+    decoder = build_fast_decoder(FakeMessage, "stamp")
+    assert decoder(buffer.to_bytes()).stamp == 7
+
+
+def test_truncated_or_foreign_buffer_returns_none():
+    decoder = build_fast_decoder(FakeMessage, "data")
+    data = build_message()
+    assert decoder(data[:-4]) is None
+    assert decoder(b"\x00\x07" + data[2:]) is None
+    assert decoder(b"\x00") is None
+
+
+def test_unsupported_fields_have_no_decoder():
+    assert build_fast_decoder(FakeMessage, "missing") is None
+    assert build_fast_decoder(FakeMessage, "name") is None
+    assert build_fast_decoder(FakeMessage, "matrix") is None
+
+
+@pytest.mark.parametrize(
+    "type_name, field, values",
+    [
+        ("builtin_interfaces/msg/Time", "nanosec", {"sec": -3, "nanosec": 999}),
+        ("std_msgs/msg/Float64", "data", {"data": -2.5}),
+        ("std_msgs/msg/Int32", "data", {"data": 42}),
+    ],
+)
+def test_matches_deserialize_message(type_name, field, values):
+    serialization = pytest.importorskip("rclpy.serialization")
+    utilities = pytest.importorskip("rosidl_runtime_py.utilities")
+    msg_type = utilities.get_message(type_name)
+    data = serialization.serialize_message(msg_type(**values))
+
+    decoded = build_fast_decoder(msg_type, field)(data)
+    expected = serialization.deserialize_message(data, msg_type)
+    assert getattr(decoded, field) == getattr(expected, field)
@@ -0,0 +1,87 @@
+import io
+import pytest
+from mcap.opcode import Opcode
+from mcap.writer import Writer
+from follow_loading import MCAP_MAGIC, RECORD_HEADER, McapTail, find_next_file
+
+
+def build_mcap(messages=6, use_chunking=True):
+    output = io.BytesIO()
+    writer = Writer(output, chunk_size=64, use_chunking=use_chunking)
+    writer.start()
+    schema_id = writer.register_schema("std_msgs/msg/Float64", "ros2msg", b"float64 data")
+    channel_id = writer.register_channel("/speed", "cdr", schema_id)
+    for i in range(messages):
+        writer.add_message(channel_id, log_time=i * 1000, data=bytes([i]), publish_time=i * 1000)
+    writer.finish()
+    return output.getvalue()
+
+
+def poll_growing_file(path, data, step):
+    tail = McapTail(str(path))
+    messages = []
+    with open(path, "wb") as f:
+        for end in range(0, len(data) + step, step):
+            f.write(data[end - step if end else 0 : end])
+            f.flush()
+            messages.extend(tail.poll())
+    return tail, messages
+
+
+@pytest.mark.parametrize("use_chunking", [True, False])
+@pytest.mark.parametrize("step", [1, 7, 100000])
+def test_reads_every_message_once_as_the_file_grows(tmp_path, use_chunking, step):
+    data = build_mcap(use_chunking=use_chunking)
+    tail, messages = poll_growing_file(tmp_path / "bag.mcap", data, step)
+
+    assert messages == [
+        ("/speed", "std_msgs/msg/Float64", bytes([i]), i * 1000) for i in range(6)
+    ]
+    assert tail.ended
+    assert tail.poll() == []
+
+
+def get_records(data):
+    """Returns the (opcode, start, end) of every record after the magic."""
+    records = []
+    start = len(MCAP_MAGIC)
+    while start + RECORD_HEADER.size <= len(data):
+        opcode, length = RECORD_HEADER.unpack_from(data, start)
+        end = start + RECORD_HEADER.size + length
+        records.append((opcode, start, end))
+        start = end
+    return records
+
+
+def test_stops_at_the_last_whole_record(tmp_path):
+    data = build_mcap(use_chunking=False)
+    _, start, end = [record for record in get_records(data) if record[0] == Opcode.MESSAGE][3]
+    path = tmp_path / "bag.mcap"
+    path.write_bytes(data[: (start + end) // 2])
+    tail = McapTail(str(path))
+
+    assert [message[3] for message in tail.poll()] == [0, 1000, 2000]
+    assert tail.offset == start
+    assert not tail.ended
+    path.write_bytes(data)
+    assert [message[3] for message in tail.poll()] == [3000, 4000, 5000]
+    assert tail.ended
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bag.mcap"
+    path.write_bytes(b"not an mcap file")
+    with pytest.raises(ValueError):
+        McapTail(str(path)).poll()
+
+
+def test_next_file_follows_split_order(tmp_path):
+    for index in (0, 2, 10):
+        (tmp_path / f"bag_{index}.mcap").write_bytes(b"")
+    paths = [str(tmp_path / f"bag_{index}.mcap") for index in (0, 2, 10)]
+
+    assert find_next_file(str(tmp_path), None) == paths[0]
+    assert find_next_file(str(tmp_path), paths[1]) == paths[2]
+    assert find_next_file(str(tmp_path), paths[2]) is None
+    assert find_next_file(paths[0], None) == paths[0]
+    assert find_next_file(paths[0], paths[0]) is None
@@ -0,0 +1,59 @@
+import os
+import numpy as np
+from query_db import RunCache
+
+
+def make_result(size):
+    return {"time": np.zeros(size // 8, dtype=np.int64)}
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = RunCache(max_bytes=2400)
+    cache.put("a", make_result(800))
+    cache.put("b", make_result(800))
+    cache.put("c", make_result(800))
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("d", make_result(800))
+
+    assert list(cache.entries) == ["c", "a", "d"]
+    assert cache.size == 2400
+    assert cache.get("b") is None
+
+
+def test_memory_cache_skips_results_larger_than_the_budget():
+    cache = RunCache(max_bytes=1000)
+    cache.put("small", make_result(800))
+    cache.put("large", make_result(1600))
+    assert list(cache.entries) == ["small"]
+    assert cache.size == 800
+
+
+def test_replacing_a_key_keeps_the_size_right():
+    cache = RunCache(max_bytes=4000)
+    cache.put("a", make_result(800))
+    cache.put("a", make_result(1600))
+    assert cache.size == 1600
+
+
+def test_cached_results_are_read_only():
+    cache = RunCache()
+    cache.put("a", make_result(80))
+    assert not cache.get("a")["time"].flags.writeable
+
+
+def test_disk_cache_survives_memory_and_evicts_oldest_files(tmp_path):
+    cache = RunCache(max_bytes=10_000, cache_dir=str(tmp_path), max_disk_bytes=10_000)
+    cache.put("a", make_result(4000))
+    file_size = os.path.getsize(cache.get_path("a"))
+    cache.max_disk_bytes = 2 * file_size
+
+    cache.put("b", make_result(4000))
+    os.utime(cache.get_path("a"), (1, 1))
+    os.utime(cache.get_path("b"), (2, 2))
+    cache.put("c", make_result(4000))
+
+    assert not os.path.exists(cache.get_path("a"))
+    assert os.path.exists(cache.get_path("b"))
+    cache.clear()
+    assert cache.get("a") is None
+    np.testing.assert_array_equal(cache.get("c")["time"], make_result(4000)["time"])
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from batch_writer import TableBuffer
+from run_summary import SKETCH_ACCURACY, QuantileSketch, RunSummary, SeriesStats
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    return np.concatenate(
+        (rng.lognormal(0, 2, 5000), -rng.lognormal(1, 1, 2000), np.zeros(300))
+    )
+
+
+def test_sketch_quantiles_are_within_the_relative_accuracy(values):
+    sketch = QuantileSketch()
+    sketch.add(values)
+    ordered = np.sort(values)
+    for q in (0.0, 0.1, 0.25, 0.5, 0.95, 0.99, 1.0):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=SKETCH_ACCURACY, abs=1e-9)
+
+
+def test_merged_sketches_equal_one_sketch(values):
+    whole = QuantileSketch()
+    whole.add(values)
+    merged = QuantileSketch()
+    for part in np.array_split(values, 7):
+        sketch = QuantileSketch()
+        sketch.add(part)
+        merged.merge(QuantileSketch.from_json(sketch.to_json()))
+
+    assert (merged.positive, merged.negative, merged.zero) == (
+        whole.positive,
+        whole.negative,
+        whole.zero,
+    )
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_merged_stats_equal_the_exact_statistics(values):
+    values = values.copy()
+    values[::100] = np.nan
+    times = np.arange(len(values), dtype=np.int64) * 10_000_000
+    stats = SeriesStats()
+    for part in np.array_split(np.arange(len(values)), 5):
+        batch = SeriesStats()
+        batch.add(times[part], values[part])
+        stats.merge(SeriesStats.from_row(batch.to_row()))
+
+    finite = values[np.isfinite(values)]
+    assert stats.row_count == len(values)
+    assert stats.value_count == len(finite)
+    assert (stats.first_time, stats.last_time) == (times[0], times[-1])
+    assert stats.min_value == finite.min()
+    assert stats.max_value == finite.max()
+    assert stats.mean == pytest.approx(finite.mean())
+    assert stats.m2 / stats.value_count == pytest.approx(finite.var())
+    assert stats.to_row()[4] == pytest.approx(100.0)
+
+
+def test_stats_without_finite_values():
+    stats = SeriesStats()
+    stats.add(np.array([5, 9], dtype=np.int64), np.array([np.nan, np.inf]))
+    merged = SeriesStats()
+    merged.merge(stats)
+    row = merged.to_row()
+    assert row[:4] == (2, 0, 5, 9)
+    assert row[5:12] == (None,) * 7
+
+
+def test_summary_groups_series_by_run_and_metric():
+    buffer = TableBuffer("control")
+    buffer.append([1_000, 1, 0.5, 1.0])
+    buffer.append([2_000, 2, 1.5, 2.0])
+    buffer.append([3_000, 1, 2.5, 3.0])
+    summary = RunSummary()
+    summary.add_batch("control", buffer.to_numeric_arrays())
+    series = summary.take()
+
+    assert series[(1, "control", None, "throttle")].to_row()[:2] == (2, 2)
+    assert series[(2, "control", None, "throttle")].mean == 1.5
+    assert not summary
+
+
+def test_failed_rows_are_left_out_of_the_statistics():
+    buffer = TableBuffer("control")
+    for time, run_id in ((1_000, 1), (2_000, 999), (3_000, 1)):
+        buffer.append([time, run_id, 1.0, 1.0])
+    failed_rows = [buffer.to_rows()[1]]
+
+    arrays = buffer.to_numeric_arrays(failed_rows)
+    assert arrays[0].tolist() == [1_000, 3_000]
+    assert arrays[1].tolist() == [1, 1]
@@ -0,0 +1,70 @@
+import math
+import numpy as np
+import pytest
+from trajectory_index import TRAJECTORY_CELL_SIZE, TrajectoryIndex, get_cell_range
+
+SECOND = 1_000_000_000
+
+
+def circle(laps=2.5, period=20.0, radius=20.0, rate=50):
+    """Counter-clockwise laps starting at (radius, 0) heading along +y."""
+    seconds = np.arange(0, laps * period, 1 / rate)
+    angle = 2 * math.pi * seconds / period
+    times = (seconds * SECOND).astype(np.int64)
+    return times, radius * np.cos(angle), radius * np.sin(angle), angle + math.pi / 2
+
+
+def index_chunks(samples, chunk_size):
+    index = TrajectoryIndex()
+    for start in range(0, len(samples[0]), chunk_size):
+        index.add(*(column[start : start + chunk_size] for column in samples))
+    return index.finish()
+
+
+def test_crossings_mark_every_completed_lap():
+    _, crossings = index_chunks(circle(), 10**6)
+    assert crossings == [pytest.approx(t * SECOND, abs=SECOND // 50) for t in (20, 40)]
+
+
+def test_chunked_input_gives_the_same_index():
+    samples = circle()
+    assert index_chunks(samples, 1) == index_chunks(samples, 10**6)
+    assert index_chunks(samples, 333) == index_chunks(samples, 10**6)
+
+
+def test_crossings_need_the_start_line_direction_and_width():
+    times = np.arange(6, dtype=np.int64) * SECOND
+    theta = np.zeros(6)
+    index = TrajectoryIndex()
+    # Starts at the origin heading along +x; backs up and passes the line again.
+    index.add(times, np.array([0.0, -1.0, -2.0, 1.0, -1.0, 1.0]), np.zeros(6), theta)
+    index.add(
+        times + 6 * SECOND,
+        np.array([-1.0, 1.0, -1.0, 1.0, 0.0, 0.0]),
+        np.array([10.0, 10.0, 0.0, 0.0, 0.0, 0.0]),
+        theta,
+    )
+    _, crossings = index.finish()
+    assert crossings == [
+        int(2 * SECOND + SECOND * 2 / 3),
+        int(4.5 * SECOND),
+        int(8.5 * SECOND),
+    ]
+
+
+def test_visits_cover_each_stay_in_a_cell():
+    times = np.arange(6, dtype=np.int64)
+    x = np.array([1.0, 2.0, 6.0, np.nan, 7.0, 1.0])
+    y = np.array([1.0, 1.0, 1.0, 1.0, -1.0, -1.0])
+    visits, _ = index_chunks((times, x, y, np.zeros(6)), 2)
+    assert visits == [(0, 0, 0, 1), (1, 0, 2, 2), (1, -1, 4, 4), (0, -1, 5, 5)]
+
+
+def test_no_finite_samples_give_an_empty_index():
+    index = TrajectoryIndex()
+    index.add(np.arange(2, dtype=np.int64), np.full(2, np.nan), np.zeros(2), np.zeros(2))
+    assert index.finish() == ([], [])
+
+
+def test_cell_range():
+    assert get_cell_range(-0.1, TRAJECTORY_CELL_SIZE) == (-1, 1)